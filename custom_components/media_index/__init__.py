@@ -10,8 +10,8 @@ from pathlib import Path
 import voluptuous as vol
 
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.const import Platform
-from homeassistant.core import HomeAssistant, ServiceCall, SupportsResponse
+from homeassistant.const import EVENT_HOMEASSISTANT_STARTED, Platform
+from homeassistant.core import CoreState, HomeAssistant, ServiceCall, SupportsResponse
 from homeassistant.exceptions import HomeAssistantError
 from homeassistant.helpers.typing import ConfigType
 from homeassistant.helpers.event import async_track_time_interval, async_track_time_change
@@ -381,6 +381,22 @@ async def async_setup(hass: HomeAssistant, config: ConfigType) -> bool:
     return True
 
 
+async def _reserve_scan(scan_lock: asyncio.Lock) -> bool:
+    """Take scan_lock if it is free, without queueing behind a running scan.
+    
+    Acquiring an unlocked asyncio.Lock completes without yielding to the event
+    loop, so no other caller can slip in between the check and the acquire.
+    The caller releases the lock once its scan (and burst index) is done.
+    
+    Returns:
+        True if the lock was taken, False if a scan already holds it
+    """
+    if scan_lock.locked():
+        return False
+    await scan_lock.acquire()
+    return True
+
+
 def _setup_scheduled_scan(
     hass: HomeAssistant,
     entry: ConfigEntry,
@@ -433,7 +449,8 @@ def _setup_scheduled_scan(
             )
         
         # Check if scan already in progress
-        if scanner.is_scanning:
+        scan_lock = hass.data[DOMAIN][entry.entry_id]["scan_lock"]
+        if scanner.is_scanning or not await _reserve_scan(scan_lock):
             _LOGGER.warning(
                 "⚠️ Scheduled scan BLOCKED [%s] - scan already running (possible long-running scan or stuck state). "
                 "If scans are taking too long, check for metadata extraction issues.",
@@ -445,19 +462,22 @@ def _setup_scheduled_scan(
             "🔄 TRIGGER: Scheduled scan (%s) starting [instance: %s, folder: %s]", 
             scan_schedule, entry.title or entry.entry_id, base_folder
         )
-        await scanner.scan_folder(base_folder, watched_folders)
+        try:
+            await scanner.scan_folder(base_folder, watched_folders)
 
-        # Optionally re-index burst groups across the full library after scan
-        if auto_burst_index and burst_index_after_scan and cache_manager is not None:
-            _LOGGER.info("Running full-library burst group index after scheduled scan")
-            try:
-                await cache_manager.index_burst_groups(
-                    time_window_seconds=burst_time_window_seconds,
-                    location_tolerance_meters=burst_location_tolerance_meters,
-                    overwrite_existing=True,
-                )
-            except Exception as err:
-                _LOGGER.error("Post-scan burst index failed: %s", err)
+            # Optionally re-index burst groups across the full library after scan
+            if auto_burst_index and burst_index_after_scan and cache_manager is not None:
+                _LOGGER.info("Running full-library burst group index after scheduled scan")
+                try:
+                    await cache_manager.index_burst_groups(
+                        time_window_seconds=burst_time_window_seconds,
+                        location_tolerance_meters=burst_location_tolerance_meters,
+                        overwrite_existing=True,
+                    )
+                except Exception as err:
+                    _LOGGER.error("Post-scan burst index failed: %s", err)
+        finally:
+            scan_lock.release()
     
     # Determine scan interval
     if scan_schedule == SCAN_SCHEDULE_HOURLY:
@@ -755,6 +775,9 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     hass.data[DOMAIN][entry.entry_id]["geocode_service"] = geocode_service
     hass.data[DOMAIN][entry.entry_id]["config"] = config
     hass.data[DOMAIN][entry.entry_id]["cast_session_manager"] = CastSessionManager()
+    # Serializes startup, scheduled and manual scans of this instance
+    scan_lock = asyncio.Lock()
+    hass.data[DOMAIN][entry.entry_id]["scan_lock"] = scan_lock
     
     # Set up platforms BEFORE starting scan so sensor exists
     await hass.config_entries.async_forward_entry_setups(entry, PLATFORMS)
@@ -763,9 +786,6 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     # Use config already constructed above
     watched_folders = config.get(CONF_WATCHED_FOLDERS, [])
 
-    from homeassistant.const import EVENT_HOMEASSISTANT_STARTED
-    from homeassistant.core import CoreState
-
     async def _trigger_startup_scan(_event=None):
         """Trigger scan after Home Assistant has fully started."""
         # Block if pymediainfo not available (unless user opted to scan without it)
@@ -786,24 +806,34 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
                 "proceeding with scan (video metadata will not be extracted)."
             )
 
-        _LOGGER.info(
-            "🔄 TRIGGER: Startup scan beginning [instance: %s, folder: %s, watched: %s, watched_only: %s]",
-            entry.title or entry.entry_id, base_folder, watched_folders, _watched_only
-        )
-        await scanner.scan_folder(base_folder, watched_folders, watched_only=_watched_only)
+        if not await _reserve_scan(scan_lock):
+            _LOGGER.warning(
+                "Startup scan SKIPPED [%s] - another scan is already running",
+                entry.title or entry.entry_id
+            )
+            return
 
-        # Optionally run burst indexing after startup scan — same behaviour as scheduled scans
-        _burst_index_after_scan = config.get(CONF_BURST_INDEX_AFTER_SCAN, DEFAULT_BURST_INDEX_AFTER_SCAN)
-        if auto_burst_index and _burst_index_after_scan and cache_manager is not None:
-            _LOGGER.info("Running full-library burst group index after startup scan")
-            try:
-                await cache_manager.index_burst_groups(
-                    time_window_seconds=burst_time_window_seconds,
-                    location_tolerance_meters=burst_location_tolerance_meters,
-                    overwrite_existing=True,
-                )
-            except Exception as err:
-                _LOGGER.error("Post-startup-scan burst index failed: %s", err)
+        try:
+            _LOGGER.info(
+                "🔄 TRIGGER: Startup scan beginning [instance: %s, folder: %s, watched: %s, watched_only: %s]",
+                entry.title or entry.entry_id, base_folder, watched_folders, _watched_only
+            )
+            await scanner.scan_folder(base_folder, watched_folders, watched_only=_watched_only)
+
+            # Optionally run burst indexing after startup scan — same behaviour as scheduled scans
+            _burst_index_after_scan = config.get(CONF_BURST_INDEX_AFTER_SCAN, DEFAULT_BURST_INDEX_AFTER_SCAN)
+            if auto_burst_index and _burst_index_after_scan and cache_manager is not None:
+                _LOGGER.info("Running full-library burst group index after startup scan")
+                try:
+                    await cache_manager.index_burst_groups(
+                        time_window_seconds=burst_time_window_seconds,
+                        location_tolerance_meters=burst_location_tolerance_meters,
+                        overwrite_existing=True,
+                    )
+                except Exception as err:
+                    _LOGGER.error("Post-startup-scan burst index failed: %s", err)
+        finally:
+            scan_lock.release()
 
     # Check for scans that were interrupted by a previous HA restart or crash.
     # Must be done before the scan-decision block so we can override scan_on_startup.
@@ -842,10 +872,24 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     # Start file system watcher if enabled AND watched_folders are specified
     # Without watched_folders, the watcher would monitor the entire base folder which
     # is resource-intensive for large collections. Use scheduled scans instead.
+    # PollingObserver.start() snapshots every watched tree, so defer it until HA has
+    # finished booting to keep that disk walk out of the startup contention window.
     if config.get(CONF_ENABLE_WATCHER, DEFAULT_ENABLE_WATCHER):
         if watched_folders:
-            _LOGGER.info("Starting file system watcher for folders: %s", watched_folders)
-            await watcher.start_watching(base_folder, watched_folders)
+            async def _start_watcher(_event=None):
+                """Start the file system watcher once Home Assistant is running."""
+                _LOGGER.info("Starting file system watcher for folders: %s", watched_folders)
+                await watcher.start_watching(base_folder, watched_folders)
+
+            if hass.state is CoreState.running:
+                await _start_watcher()
+            else:
+                # Drop the listener if the entry unloads before HA finishes
+                # starting, so no watcher is started for a dead entry
+                entry.async_on_unload(
+                    hass.bus.async_listen_once(EVENT_HOMEASSISTANT_STARTED, _start_watcher)
+                )
+                _LOGGER.info("File system watcher scheduled to start after HA start")
         else:
             _LOGGER.info(
                 "File system watcher disabled: no watched_folders specified. "
@@ -949,19 +993,19 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
                 ) as cursor:
                     rows = await cursor.fetchall()
 
-                stale_count = 0
+                stale_paths = []
                 checked = 0
                 for row in rows:
                     _, file_path = row
                     checked += 1
                     exists = await hass.async_add_executor_job(os.path.exists, file_path)
                     if not exists:
-                        await cache_manager.delete_file(file_path)
-                        stale_count += 1
-                        _LOGGER.debug("Scheduled cleanup: removed stale entry %s", file_path)
+                        stale_paths.append(file_path)
+                        _LOGGER.debug("Scheduled cleanup: removing stale entry %s", file_path)
                     if checked % 50 == 0:
                         await asyncio.sleep(0)
 
+                stale_count = await cache_manager.delete_files(stale_paths)
                 await cache_manager.cleanup_orphaned_exif()
                 await cache_manager.vacuum_database()
 
@@ -1688,15 +1732,16 @@ def _register_services(hass: HomeAssistant):
                 
                 if not exists:
                     stale_files.append({"id": file_id, "path": file_path})
-                    if not dry_run:
-                        # Remove from database
-                        await cache_manager.delete_file(file_path)
-                        _LOGGER.debug("Removed stale entry: %s", file_path)
                 
                 # Yield control every 10 files
                 if checked % 10 == 0:
                     await asyncio.sleep(0)
             
+            if stale_files and not dry_run:
+                # Remove from database in one transaction
+                await cache_manager.delete_files([f["path"] for f in stale_files])
+                _LOGGER.debug("Removed %d stale entries", len(stale_files))
+            
             # Check for orphaned exif_data rows (always check, even in dry_run)
             # Count using optimized query
             async with cache_manager._db.execute(
@@ -2231,6 +2276,14 @@ def _register_services(hass: HomeAssistant):
         folder_path = call.data.get("folder_path", config.get(CONF_BASE_FOLDER, "/media"))
         force_rescan = call.data.get("force_rescan", False)
         watched_folders = config.get(CONF_WATCHED_FOLDERS, [])
+        scan_lock = instance["scan_lock"]
+
+        # Reject re-entrant calls instead of queueing another walk of the same tree.
+        # The lock is taken here, before the task is created, so a second call
+        # arriving before that task runs is rejected too; the task releases it.
+        if scanner.is_scanning or not await _reserve_scan(scan_lock):
+            _LOGGER.warning("Manual scan for %s rejected - a scan is already running", folder_path)
+            return {"status": "scan_already_running", "folder": folder_path}
         
         _LOGGER.info("🔄 TRIGGER: Manual scan service call for %s (force=%s)", folder_path, force_rescan)
 
@@ -2241,21 +2294,28 @@ def _register_services(hass: HomeAssistant):
         cache_manager = instance["cache_manager"]
 
         async def _scan_and_burst():
-            await scanner.scan_folder(folder_path, watched_folders, force=force_rescan)
-            if auto_burst_index and burst_index_after_scan:
-                _LOGGER.info("Running burst group index for %s after manual scan", folder_path)
-                try:
-                    await cache_manager.index_burst_groups(
-                        folder=folder_path,
-                        time_window_seconds=burst_time_window_seconds,
-                        location_tolerance_meters=burst_location_tolerance_meters,
-                        overwrite_existing=False,
-                    )
-                except Exception as err:
-                    _LOGGER.error("Post-scan burst index failed: %s", err)
+            try:
+                await scanner.scan_folder(folder_path, watched_folders, force=force_rescan)
+                if auto_burst_index and burst_index_after_scan:
+                    _LOGGER.info("Running burst group index for %s after manual scan", folder_path)
+                    try:
+                        await cache_manager.index_burst_groups(
+                            folder=folder_path,
+                            time_window_seconds=burst_time_window_seconds,
+                            location_tolerance_meters=burst_location_tolerance_meters,
+                            overwrite_existing=False,
+                        )
+                    except Exception as err:
+                        _LOGGER.error("Post-scan burst index failed: %s", err)
+            finally:
+                scan_lock.release()
 
         # Start scan (+ optional burst index) as background task
-        hass.async_create_task(_scan_and_burst())
+        try:
+            hass.async_create_task(_scan_and_burst())
+        except BaseException:
+            scan_lock.release()
+            raise
 
         return {"status": "scan_started", "folder": folder_path}
     
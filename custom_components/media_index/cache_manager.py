@@ -1,29 +1,951 @@
 """SQLite cache manager for media file indexing."""
 import aiosqlite
+import asyncio
+import json
 import logging
+import math
 import os
+import random
+import re
+import time
+from collections import OrderedDict, defaultdict
 from datetime import datetime, timedelta
+from functools import lru_cache
 from pathlib import Path
-from typing import Optional, Dict, List, Any
+from typing import Optional, Dict, List, Any, Tuple, AsyncIterator, Callable, Sequence
 
 _LOGGER = logging.getLogger(__name__)
 
+# WITHOUT ROWID: the coordinate key is the clustered primary key. The key holds the
+# 3-decimal coordinates as scaled integers (see _geocode_key) so lookups are exact
+# integer matches instead of REAL equality; latitude/longitude keep the rounded
+# values for readability. _migrate_geocode_cache rebuilds older layouts.
+_GEOCODE_CACHE_DEFINITION = """(
+    lat_key INTEGER NOT NULL,
+    lon_key INTEGER NOT NULL,
+    precision_level INTEGER NOT NULL,
+    latitude REAL NOT NULL,
+    longitude REAL NOT NULL,
+    location_name TEXT,
+    location_city TEXT,
+    location_state TEXT,
+    location_country TEXT,
+    cached_at INTEGER NOT NULL,
+    PRIMARY KEY (lat_key, lon_key, precision_level)
+) WITHOUT ROWID"""
+
+# Geocode cache precision: 3 decimals (~110m)
+_GEOCODE_PRECISION = 3
+
+
+# Geocode cache hit/miss counters are kept in memory and written to
+# geocode_stats every this many lookups
+_GEOCODE_STATS_BATCH_SIZE = 100
+
+
+def _geocode_key(latitude: float, longitude: float) -> Tuple[int, int]:
+    """Scale a coordinate pair to its integer geocode_cache key (degrees * 1000)."""
+    scale = 10 ** _GEOCODE_PRECISION
+    return int(round(latitude * scale)), int(round(longitude * scale))
+
+
+# Per-file statements on the scan/geocoding hot path. Kept as module constants so
+# every call hands sqlite3 the identical string and hits its statement cache.
+_HAS_GEOCODED_LOCATION_SQL = "SELECT location_city FROM exif_data WHERE file_id = ?"
+
+_SELECT_GEOCODE_SQL = """
+    SELECT location_name, location_city, location_state, location_country
+    FROM geocode_cache
+    WHERE lat_key = ? AND lon_key = ? AND precision_level = ?
+"""
+
+_INSERT_GEOCODE_SQL = """
+    INSERT OR REPLACE INTO geocode_cache
+    (lat_key, lon_key, precision_level, latitude, longitude, location_name,
+     location_city, location_state, location_country, cached_at)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+_UPDATE_EXIF_LOCATION_SQL = """
+    UPDATE exif_data
+    SET location_name = ?, location_city = ?, location_state = ?, location_country = ?
+    WHERE file_id = ?
+"""
+
+# update_burst_metadata: every burst member in one statement, the paths bound
+# as a single JSON array
+_UPDATE_BURST_METADATA_SQL = """
+    UPDATE exif_data
+    SET burst_favorites = ?, burst_count = ?
+    WHERE file_id IN (
+        SELECT id FROM media_files WHERE path IN (SELECT value FROM json_each(?))
+    )
+"""
+
+# update_favorites_bulk: copy the just-written media_files favorite columns to
+# exif_data in one statement, joined on file_id, the paths bound as a JSON array
+_SYNC_EXIF_FAVORITES_SQL = """
+    UPDATE exif_data
+    SET is_favorited = m.is_favorited, rating = m.rating
+    FROM media_files m
+    WHERE m.path IN (SELECT value FROM json_each(?)) AND exif_data.file_id = m.id
+"""
+
+# Stored in PRAGMA user_version once _run_migrations has brought a database up
+# to date. Bump whenever a migration is added so existing databases re-run them.
+_SCHEMA_VERSION = 9
+
+# media_files.folder_class: 0 = normal, 1 = inside a _Junk folder, 2 = inside an
+# _Edit folder. A generated column, so it can't drift from folder; slideshow
+# queries test folder_class = 0 instead of two substring LIKEs per row.
+_FOLDER_CLASS_SQL = (
+    "CASE WHEN folder LIKE '%/_Junk%' THEN 1"
+    " WHEN folder LIKE '%/_Edit%' THEN 2 ELSE 0 END"
+)
+
+# sqlite3 caches 128 prepared statements by default; the filter combinations in the
+# random/ordered queries produce many distinct strings, so allow more
+_STATEMENT_CACHE_SIZE = 256
+
+# Query_only connections opened beside the writer for pure reads (see _reader)
+_READ_CONNECTIONS = 2
+
+# Entries kept by the single-row lookup cache (file by path/id, exif by id,
+# geocode_cache by key, has_geocoded_location by file id)
+_LOOKUP_CACHE_SIZE = 2048
+
+# Random sampling (see _sample_random_files): probe random ids instead of sorting
+# every match by RANDOM(). Below this id span the sort is cheap enough to keep.
+_RANDOM_PROBE_MIN_SPAN = 1000
+_RANDOM_PROBE_OVERSAMPLE = 2  # ids probed per wanted row (deleted ids, filter misses)
+_RANDOM_PROBE_ROUNDS = 3
+
+# Standard-mode get_random_files calls with identical filters that arrive within
+# this many seconds of each other share one sampling query (see _RandomBatcher)
+_RANDOM_BATCH_WINDOW = 0.01
+
+# Id lists longer than this are bound as one JSON array read through json_each()
+# instead of one placeholder per id (see _id_list_sql)
+_INLINE_ID_LIST_MAX = 50
+
+# Rows pulled per fetchmany() when streaming results (see iter_ordered_files)
+_FETCH_CHUNK_SIZE = 256
+
+# Upsert for media_files keyed on path. ON CONFLICT ... DO UPDATE keeps the row id
+# (and with it the exif_data FK), unlike INSERT OR REPLACE. last_scanned only moves
+# forward when the file is new or its modified_time changed.
+_UPSERT_MEDIA_FILE_SQL = """
+    INSERT INTO media_files
+    (path, filename, folder, file_type, file_size, modified_time,
+     created_time, duration, last_scanned, width, height, orientation,
+     is_favorited, rating, rated_at)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(path) DO UPDATE SET
+        filename = excluded.filename,
+        folder = excluded.folder,
+        file_type = excluded.file_type,
+        file_size = excluded.file_size,
+        modified_time = excluded.modified_time,
+        created_time = excluded.created_time,
+        duration = excluded.duration,
+        last_scanned = CASE
+            WHEN media_files.modified_time = excluded.modified_time
+            THEN media_files.last_scanned
+            ELSE excluded.last_scanned
+        END,
+        width = excluded.width,
+        height = excluded.height,
+        orientation = excluded.orientation,
+        is_favorited = COALESCE(NULLIF(excluded.is_favorited, 0), media_files.is_favorited),
+        rating = COALESCE(NULLIF(excluded.rating, 0), media_files.rating),
+        rated_at = COALESCE(excluded.rated_at, media_files.rated_at)
+"""
+
+
+# add_file's single round trip: upsert and get the (stable) row id back
+_UPSERT_MEDIA_FILE_RETURNING_SQL = _UPSERT_MEDIA_FILE_SQL + " RETURNING id"
+
+
+def _media_file_row(file_data: Dict[str, Any], last_scanned: int) -> tuple:
+    """Build the _UPSERT_MEDIA_FILE_SQL parameter tuple for one file."""
+    return (
+        file_data['path'],
+        file_data['filename'],
+        file_data['folder'],
+        file_data['file_type'],
+        file_data.get('file_size'),
+        file_data['modified_time'],
+        file_data.get('created_time'),
+        file_data.get('duration'),
+        last_scanned,
+        file_data.get('width'),
+        file_data.get('height'),
+        file_data.get('orientation'),
+        file_data.get('is_favorited', 0),
+        file_data.get('rating', 0),
+        file_data.get('rated_at'),
+    )
+
+# Upsert for exif_data (named parameters, see _exif_params). Rescans must not wipe
+# what later passes own: geocoded location (kept once location_city is set), burst
+# columns (written by index_burst_groups), and rating/is_favorited when the file
+# carries no value of its own. The DO UPDATE's WHERE skips re-extractions that
+# change nothing, so they write no page and leave total_changes (and the lookup
+# and stats caches) alone.
+_UPSERT_EXIF_SQL = """
+    INSERT INTO exif_data
+    (file_id, camera_make, camera_model, date_taken, latitude, longitude, altitude,
+     rating, is_favorited)
+    VALUES (:file_id, :camera_make, :camera_model, :date_taken, :latitude, :longitude, :altitude,
+            :rating, COALESCE(:is_favorited, 0))
+    ON CONFLICT(file_id) DO UPDATE SET
+        camera_make = excluded.camera_make,
+        camera_model = excluded.camera_model,
+        date_taken = excluded.date_taken,
+        latitude = excluded.latitude,
+        longitude = excluded.longitude,
+        altitude = excluded.altitude,
+        location_name = CASE WHEN COALESCE(exif_data.location_city, '') = '' THEN NULL ELSE exif_data.location_name END,
+        location_state = CASE WHEN COALESCE(exif_data.location_city, '') = '' THEN NULL ELSE exif_data.location_state END,
+        location_country = CASE WHEN COALESCE(exif_data.location_city, '') = '' THEN NULL ELSE exif_data.location_country END,
+        location_city = NULLIF(exif_data.location_city, ''),
+        rating = COALESCE(excluded.rating, exif_data.rating),
+        is_favorited = COALESCE(:is_favorited, exif_data.is_favorited)
+    WHERE (exif_data.camera_make, exif_data.camera_model, exif_data.date_taken,
+           exif_data.latitude, exif_data.longitude, exif_data.altitude)
+          IS NOT (excluded.camera_make, excluded.camera_model, excluded.date_taken,
+                  excluded.latitude, excluded.longitude, excluded.altitude)
+       OR COALESCE(excluded.rating, exif_data.rating) IS NOT exif_data.rating
+       OR COALESCE(:is_favorited, exif_data.is_favorited) IS NOT exif_data.is_favorited
+       OR (COALESCE(exif_data.location_city, '') = ''
+           AND (exif_data.location_name, exif_data.location_city,
+                exif_data.location_state, exif_data.location_country)
+               IS NOT (NULL, NULL, NULL, NULL))
+"""
+
+# Camera settings nobody filters or sorts on live in exif_data_extended, so the
+# slideshow queries' exif_data rows stay small. Same file_id key; always overwritten.
+_EXIF_EXTENDED_COLUMNS = (
+    'iso', 'aperture', 'shutter_speed', 'focal_length', 'focal_length_35mm',
+    'exposure_compensation', 'metering_mode', 'white_balance', 'flash',
+)
+
+_EXIF_EXTENDED_DEFINITION = """(
+    file_id INTEGER PRIMARY KEY,
+    iso INTEGER,
+    aperture REAL,
+    shutter_speed TEXT,
+    focal_length REAL,
+    focal_length_35mm INTEGER,
+    exposure_compensation TEXT,
+    metering_mode TEXT,
+    white_balance TEXT,
+    flash TEXT,
+    FOREIGN KEY (file_id) REFERENCES media_files(id) ON DELETE CASCADE
+)"""
+
+_UPSERT_EXIF_EXTENDED_SQL = f"""
+    INSERT INTO exif_data_extended (file_id, {', '.join(_EXIF_EXTENDED_COLUMNS)})
+    VALUES (:file_id, {', '.join(':' + col for col in _EXIF_EXTENDED_COLUMNS)})
+    ON CONFLICT(file_id) DO UPDATE SET
+        {', '.join(f'{col} = excluded.{col}' for col in _EXIF_EXTENDED_COLUMNS)}
+    WHERE ({', '.join(f'exif_data_extended.{col}' for col in _EXIF_EXTENDED_COLUMNS)})
+          IS NOT ({', '.join(f'excluded.{col}' for col in _EXIF_EXTENDED_COLUMNS)})
+"""
+
+# Every table, index and seed row _create_schema guarantees, run as one script:
+# a single hop to the aiosqlite thread and one transaction. Older databases may
+# lack some columns these indexes need until migrations add them, so anything
+# on a migrated column is created in _run_migrations instead.
+_SCHEMA_SQL = f"""
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS media_files (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    path TEXT UNIQUE NOT NULL,
+    filename TEXT NOT NULL,
+    folder TEXT NOT NULL,
+    file_type TEXT NOT NULL,
+    file_size INTEGER,
+    modified_time INTEGER NOT NULL,
+    created_time INTEGER,
+    duration REAL,
+    width INTEGER,
+    height INTEGER,
+    orientation TEXT,
+    last_scanned INTEGER NOT NULL,
+    is_favorited INTEGER DEFAULT 0,
+    rating INTEGER DEFAULT 0,
+    rated_at INTEGER,
+    folder_class INTEGER GENERATED ALWAYS AS ({_FOLDER_CLASS_SQL}) VIRTUAL,
+    taken_month INTEGER,
+    taken_day INTEGER,
+    taken_time INTEGER
+);
+
+CREATE INDEX IF NOT EXISTS idx_folder ON media_files(folder);
+-- Case-insensitive folder filters (m.folder = ? COLLATE NOCASE and the NOCASE
+-- subfolder range) can only seek on an index with NOCASE collation
+CREATE INDEX IF NOT EXISTS idx_folder_nocase ON media_files(folder COLLATE NOCASE);
+
+CREATE INDEX IF NOT EXISTS idx_modified ON media_files(modified_time);
+
+-- Rescans read (path, id, modified_time) for a whole folder subtree through
+-- load_scan_index; with modified_time beside path (id is the rowid) that
+-- range is answered from this index without touching the wide table rows
+CREATE INDEX IF NOT EXISTS idx_media_path_covering
+ON media_files(path, modified_time);
+
+-- Priority-new-files queries filter on file_type and last_scanned and order
+-- by last_scanned DESC; this lets SQLite seek and stream rows in order
+-- instead of scanning and sorting. Its file_type prefix also replaces idx_type.
+CREATE INDEX IF NOT EXISTS idx_scanned_type_folder
+ON media_files(file_type, last_scanned DESC, folder);
+DROP INDEX IF EXISTS idx_type;
+
+-- favorites_only filters on media_files.is_favorited (update_favorite keeps
+-- it in step with exif_data); favorites are a small slice of the library
+CREATE INDEX IF NOT EXISTS idx_media_favorited
+ON media_files(id) WHERE is_favorited = 1;
+
+CREATE TABLE IF NOT EXISTS exif_data (
+    file_id INTEGER PRIMARY KEY,
+    camera_make TEXT,
+    camera_model TEXT,
+    date_taken INTEGER,
+    latitude REAL,
+    longitude REAL,
+    altitude REAL,
+    location_name TEXT,
+    location_city TEXT,
+    location_state TEXT,
+    location_country TEXT,
+    rating INTEGER,
+    is_favorited INTEGER DEFAULT 0,
+    burst_id TEXT,
+    FOREIGN KEY (file_id) REFERENCES media_files(id) ON DELETE CASCADE
+);
+
+-- Indexes for commonly queried EXIF fields
+CREATE INDEX IF NOT EXISTS idx_exif_date_taken ON exif_data(date_taken);
+CREATE INDEX IF NOT EXISTS idx_exif_location_city ON exif_data(location_city);
+CREATE INDEX IF NOT EXISTS idx_exif_location_country ON exif_data(location_country);
+CREATE INDEX IF NOT EXISTS idx_exif_location_name ON exif_data(location_name);
+
+-- Composite index for location + date queries (e.g., "photos from Paris in 2023")
+CREATE INDEX IF NOT EXISTS idx_exif_location_date
+ON exif_data(location_city, date_taken);
+
+-- Index for GPS coordinate queries (nearby photos)
+CREATE INDEX IF NOT EXISTS idx_exif_gps_coords
+ON exif_data(latitude, longitude);
+
+-- Index for favorites filtering
+CREATE INDEX IF NOT EXISTS idx_exif_favorited ON exif_data(is_favorited);
+
+CREATE TABLE IF NOT EXISTS exif_data_extended {_EXIF_EXTENDED_DEFINITION};
+
+-- Lookups are always by (latitude, longitude, precision_level), so the key
+-- is the clustered primary key; no separate rowid table + unique index
+CREATE TABLE IF NOT EXISTS geocode_cache {_GEOCODE_CACHE_DEFINITION};
+
+CREATE TABLE IF NOT EXISTS scan_history (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    folder_path TEXT NOT NULL,
+    scan_type TEXT NOT NULL,
+    start_time INTEGER NOT NULL,
+    end_time INTEGER,
+    files_added INTEGER DEFAULT 0,
+    files_updated INTEGER DEFAULT 0,
+    files_removed INTEGER DEFAULT 0,
+    status TEXT
+);
+
+-- Move history table for tracking file moves (e.g., to _Edit folder)
+CREATE TABLE IF NOT EXISTS move_history (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    original_path TEXT NOT NULL,
+    new_path TEXT NOT NULL,
+    moved_at INTEGER NOT NULL,
+    move_reason TEXT,
+    restored INTEGER DEFAULT 0,
+    restored_at INTEGER,
+    dest_folder TEXT
+);
+
+CREATE INDEX IF NOT EXISTS idx_move_history_new_path
+ON move_history(new_path);
+
+-- Geocode stats table for tracking cache hit rate
+-- Uses singleton pattern: CHECK (id = 1) ensures only one row exists for global statistics
+CREATE TABLE IF NOT EXISTS geocode_stats (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    cache_hits INTEGER DEFAULT 0,
+    cache_misses INTEGER DEFAULT 0
+);
+
+-- Initialize stats row if it doesn't exist
+INSERT OR IGNORE INTO geocode_stats (id, cache_hits, cache_misses)
+VALUES (1, 0, 0);
+
+-- Sync state table for cross-device queue sharing (media_card shared_queue_id feature)
+CREATE TABLE IF NOT EXISTS sync_state (
+    sync_group TEXT PRIMARY KEY NOT NULL,
+    queue_json TEXT NOT NULL,
+    current_index INTEGER NOT NULL DEFAULT 0,
+    updated_at INTEGER NOT NULL
+);
+
+COMMIT;
+"""
+
+# media_files columns a file record carries. Listed instead of * so the
+# derived query helpers (folder_class, taken_month/taken_day/taken_time) stay internal
+_MEDIA_FILE_COLUMNS = (
+    'id', 'path', 'filename', 'folder', 'file_type', 'file_size',
+    'modified_time', 'created_time', 'duration', 'width', 'height',
+    'orientation', 'last_scanned', 'is_favorited', 'rating', 'rated_at',
+)
+
+# get_file_by_path in one round trip: the media_files row, then (after the
+# exif_file_id marker column, NULL when the file has no EXIF) its full EXIF record
+_SELECT_FILE_WITH_EXIF_SQL = f"""
+    SELECT {', '.join('m.' + col for col in _MEDIA_FILE_COLUMNS)},
+           e.file_id AS exif_file_id, e.*,
+           {', '.join('x.' + col for col in _EXIF_EXTENDED_COLUMNS)}
+    FROM media_files m
+    LEFT JOIN exif_data e ON e.file_id = m.id
+    LEFT JOIN exif_data_extended x ON x.file_id = m.id
+    WHERE m.path = ?
+"""
+
+# Full EXIF record for one file (hot + extended columns)
+_SELECT_EXIF_SQL = f"""
+    SELECT e.*, {', '.join('x.' + col for col in _EXIF_EXTENDED_COLUMNS)}
+    FROM exif_data e
+    LEFT JOIN exif_data_extended x ON x.file_id = e.file_id
+"""
+
+_EXIF_FIELDS = (
+    'camera_make', 'camera_model', 'date_taken', 'latitude', 'longitude', 'altitude',
+    'rating', 'is_favorited',
+) + _EXIF_EXTENDED_COLUMNS
+
+
+def _exif_params(file_id: int, exif_data: Dict[str, Any]) -> Dict[str, Any]:
+    """Build the _UPSERT_EXIF_SQL / _UPSERT_EXIF_EXTENDED_SQL parameter mapping for one file."""
+    params = {field: exif_data.get(field) for field in _EXIF_FIELDS}
+    params['file_id'] = file_id
+    return params
+
+
+# media_files.taken_time: the effective capture time used by date filters and
+# date sorting (EXIF date_taken, else the earlier of the file's created/modified
+# times), stored so those compare one indexed column instead of joining
+# exif_data and evaluating the fallback per row. taken_month/taken_day: its
+# local calendar month and day, so anniversary filters compare stored integers
+# (and seek idx_media_taken) instead of formatting a date for every row. Kept
+# current by triggers (see _migrate_taken_dates); like the filters they
+# replace, month and day use the server's timezone as of the write.
+_TAKEN_TIME_SQL = """COALESCE(
+    (SELECT e.date_taken FROM exif_data e WHERE e.file_id = media_files.id),
+    MIN(unixepoch(media_files.created_time), unixepoch(media_files.modified_time))
+)"""
+
+_UPDATE_TAKEN_DATE_SQL = f"""
+    UPDATE media_files SET
+        taken_time = {_TAKEN_TIME_SQL},
+        taken_month = CAST(strftime('%m', {_TAKEN_TIME_SQL}, 'unixepoch', 'localtime') AS INTEGER),
+        taken_day = CAST(strftime('%d', {_TAKEN_TIME_SQL}, 'unixepoch', 'localtime') AS INTEGER)
+"""
+
+
+# Shape of a date filter value; strptime still rejects impossible dates (2024-13-45)
+_DATE_RE = re.compile(r"\d{4}-\d{1,2}-\d{1,2}")
+
+
+def _parse_filter_date(name: str, value: Any) -> Optional[datetime]:
+    """Parse a YYYY-MM-DD filter date as server local midnight; log and return None if invalid."""
+    text = str(value)
+    if not _DATE_RE.fullmatch(text):
+        # Fast reject without going through strptime's exception path
+        _LOGGER.warning("Invalid %s parameter: %s - expected YYYY-MM-DD", name, value)
+        return None
+    try:
+        return datetime.strptime(text, "%Y-%m-%d")
+    except ValueError as err:
+        _LOGGER.warning("Invalid %s parameter: %s - %s", name, value, err)
+        return None
+
+
+def _resolve_time_bounds(
+    timestamp_from: Optional[int],
+    timestamp_to: Optional[int],
+    date_from: Optional[str],
+    date_to: Optional[str],
+) -> Tuple[Optional[int], Optional[int]]:
+    """Turn the timestamp/date filter arguments into integer epoch bounds.
+    
+    Timestamps take precedence over dates. Dates are YYYY-MM-DD in server local
+    time (matching how EXIF timestamps are stored); date_to covers the whole day.
+    Invalid dates are logged and ignored. The SQL side then compares integers
+    instead of evaluating date functions per row.
+    """
+    ts_from = timestamp_from
+    if ts_from is None and date_from is not None:
+        ts_from = _date_bound("date_from", str(date_from), False)
+    
+    ts_to = timestamp_to
+    if ts_to is None and date_to is not None:
+        ts_to = _date_bound("date_to", str(date_to), True)
+    
+    return ts_from, ts_to
+
+
+@lru_cache(maxsize=256)
+def _date_bound(name: str, value: str, end_of_day: bool) -> Optional[int]:
+    """Epoch bound for a filter date: its local midnight, or the day's last second.
+    
+    Slideshows repeat the same few dates, so each is parsed once; an invalid
+    value is therefore also only logged the first time it is seen.
+    """
+    dt = _parse_filter_date(name, value)
+    if dt is None:
+        return None
+    if end_of_day:
+        # End of local day = start of next day minus 1
+        return int((dt + timedelta(days=1)).timestamp()) - 1
+    return int(dt.timestamp())
+
+
+@lru_cache(maxsize=64)
+def _file_filter_sql(
+    folder_mode: Optional[str],
+    has_file_type: bool,
+    favorites_only: bool,
+    auto_select_burst_favorite: bool,
+    has_ts_from: bool,
+    has_ts_to: bool,
+    day_mode: Optional[str],
+    has_month: bool,
+) -> str:
+    """Build the WHERE fragment for one combination of file filters.
+    
+    Only the shape of the filters affects the SQL text, so each shape is built
+    once and reused; stable text also keeps hitting sqlite3's statement cache.
+    """
+    parts = []
+    if folder_mode == "recursive":
+        # Recursive: match folder and all subfolders (exact OR subpath). The
+        # subpath test is the range ['folder/', 'folder0') rather than LIKE, whose
+        # '_' wildcard both matches the wrong folders and ends the index range
+        # early on names like _Edit; '0' is the character after '/'
+        parts.append(
+            " AND (m.folder = ? COLLATE NOCASE"
+            " OR (m.folder >= ? COLLATE NOCASE AND m.folder < ? COLLATE NOCASE))"
+        )
+    elif folder_mode == "exact":
+        # Non-recursive: exact folder match only
+        parts.append(" AND m.folder = ? COLLATE NOCASE")
+    if has_file_type:
+        parts.append(" AND m.file_type = ?")
+    if favorites_only:
+        parts.append(" AND m.is_favorited = 1")
+    if auto_select_burst_favorite:
+        # Exclude non-favorite members of burst groups that have a known favorite.
+        # Items with burst_count IS NULL are not part of any burst — returned as normal.
+        # Items in a burst group with no favorites (burst_favorites IS NULL) are also
+        # returned normally (nothing better to show).
+        parts.append(
+            " AND NOT (COALESCE(e.burst_count, 0) > 0"
+            " AND COALESCE(m.is_favorited, 0) = 0"
+            " AND e.burst_favorites IS NOT NULL)"
+        )
+    if has_ts_from:
+        parts.append(" AND m.taken_time >= ?")
+    if has_ts_to:
+        parts.append(" AND m.taken_time <= ?")
+    
+    ann_conditions = []
+    if day_mode == "window":
+        ann_conditions.append("m.taken_day BETWEEN ? AND ?")
+    elif day_mode == "exact":
+        ann_conditions.append("m.taken_day = ?")
+    if has_month:
+        ann_conditions.append("m.taken_month = ?")
+    elif day_mode:
+        # idx_media_taken leads with the month; listing every month turns a
+        # day-only filter into twelve (month, day) seeks instead of a scan
+        ann_conditions.append("m.taken_month IN (1,2,3,4,5,6,7,8,9,10,11,12)")
+    if ann_conditions:
+        parts.append(" AND (" + " AND ".join(ann_conditions) + ")")
+    
+    return "".join(parts)
+
+
+def _file_filters(
+    folder: Optional[str],
+    recursive: bool,
+    file_type: Optional[str],
+    ts_from: Optional[int],
+    ts_to: Optional[int],
+    anniversary_month: Optional[str] = None,
+    anniversary_day: Optional[str] = None,
+    anniversary_window_days: int = 0,
+    favorites_only: bool = False,
+    auto_select_burst_favorite: bool = False,
+) -> Tuple[str, list]:
+    """Return the WHERE fragment and parameters for the shared file filters.
+    
+    Used by the random, priority and ordered file queries. Time bounds come
+    from _resolve_time_bounds.
+    """
+    params: list = []
+    
+    folder_mode = None
+    if folder:
+        if recursive:
+            folder_mode = "recursive"
+            base = folder.rstrip('/')
+            params.extend([base, base + '/', base + '0'])
+        else:
+            folder_mode = "exact"
+            params.append(folder)
+    
+    if file_type:
+        params.append(file_type.lower())
+    
+    if ts_from is not None:
+        params.append(ts_from)
+    if ts_to is not None:
+        params.append(ts_to)
+    
+    # Anniversary filtering: Match month/day across years ("*" = any)
+    day_mode = None
+    if anniversary_day and anniversary_day != "*":
+        try:
+            day_int = int(anniversary_day)
+            if anniversary_window_days > 0:
+                # Apply window to day (e.g., day 7 ±3 = days 4-10)
+                day_mode = "window"
+                params.extend([
+                    max(1, day_int - anniversary_window_days),
+                    min(31, day_int + anniversary_window_days),
+                ])
+            else:
+                day_mode = "exact"
+                params.append(day_int)
+        except ValueError:
+            _LOGGER.warning("Invalid anniversary_day parameter: %s", anniversary_day)
+    
+    # Month matching (no window for month)
+    has_month = False
+    if anniversary_month and anniversary_month != "*":
+        try:
+            params.append(int(anniversary_month))
+            has_month = True
+        except ValueError:
+            _LOGGER.warning("Invalid anniversary_month parameter: %s", anniversary_month)
+    
+    sql = _file_filter_sql(
+        folder_mode, bool(file_type), favorites_only, auto_select_burst_favorite,
+        ts_from is not None, ts_to is not None, day_mode, has_month,
+    )
+    return sql, params
+
+
+# Column list shared by the random/ordered file queries (alias m = media_files,
+# e = exif_data). Spelled out rather than m.* so each row carries only what the
+# card uses, and so media_files.is_favorited is the single is_favorited key.
+# The progressive-geocoding flags are computed by SQLite alongside the row.
+_FILE_ROW_COLUMNS = """
+    m.id, m.path, m.filename, m.folder, m.file_type, m.file_size,
+    m.modified_time, m.created_time, m.duration, m.width, m.height,
+    m.orientation, m.last_scanned, m.is_favorited, m.rating, m.rated_at,
+    e.date_taken,
+    e.latitude,
+    e.longitude,
+    e.location_name,
+    e.location_city,
+    e.location_state,
+    e.location_country,
+    e.burst_count,
+    e.burst_favorites,
+    e.camera_make,
+    e.camera_model,
+    (e.latitude IS NOT NULL AND e.longitude IS NOT NULL) AS has_coordinates,
+    (e.location_city IS NOT NULL) AS is_geocoded
+"""
+
+
+# FROM/WHERE head shared by the random and ordered file queries; the
+# _file_filters fragment is appended to it
+_ACTIVE_FILES_FROM = """
+    FROM media_files m
+    LEFT JOIN exif_data e ON m.id = e.file_id
+    WHERE m.folder_class = 0
+"""
+
+# get_ordered_files sort fields. Keep these in step with the expressions in
+# _create_sort_indexes; unknown fields sort by effective capture time.
+_ORDER_SORT_FIELDS = {
+    "date_taken": "m.taken_time",
+    "filename": "m.filename",
+    "path": "m.folder || '/' || m.filename",
+    "modified_time": "unixepoch(m.modified_time)",
+}
+
+
+@lru_cache(maxsize=128)
+def _ordered_files_sql(
+    filter_sql: str,
+    order_by: str,
+    direction: str,
+    cursor_mode: Optional[str],
+) -> str:
+    """Build the full get_ordered_files statement for one filter/sort/cursor shape.
+    
+    Parameters follow the filter parameters: the cursor values (after_value,
+    after_value, after_id for "compound"; after_value for "simple"), then LIMIT.
+    """
+    sort_field = _ORDER_SORT_FIELDS.get(order_by, "m.taken_time")
+    query = f"SELECT {_FILE_ROW_COLUMNS} {_ACTIVE_FILES_FROM}{filter_sql}"
+    
+    # v1.5.10: Compound cursor pagination using (sort_field, id)
+    # This handles cases where multiple files have the same date_taken
+    op = "<" if direction == "DESC" else ">"
+    if cursor_mode == "compound":
+        # Items past after_value, or tied on it with an id past after_id, so
+        # items already seen are skipped even with duplicate sort values. The
+        # row value plus the redundant plain bound let SQLite seek the sort
+        # index (expression indexes only seek on the plain bound); an OR of the
+        # two cases walks the index from the first page and filters instead
+        query += f" AND {sort_field} {op}= ? AND ({sort_field}, m.id) {op} (?, ?)"
+    elif cursor_mode == "simple":
+        # Fallback to simple cursor if no after_id provided
+        query += f" AND {sort_field} {op} ?"
+    
+    # Order by sort_field, then by id for stable ordering
+    return query + f" ORDER BY {sort_field} {direction}, m.id {direction} LIMIT ?"
+
+
+def _row_dicts(rows: Sequence[aiosqlite.Row]) -> List[Dict[str, Any]]:
+    """Convert execute_fetchall rows to dicts.
+    
+    Column names are read once from the first row rather than per row, as
+    dict(row) would.
+    """
+    if not rows:
+        return []
+    columns = rows[0].keys()
+    return [dict(zip(columns, row)) for row in rows]
+
+
+def _file_dict_factory(cursor) -> Callable[[tuple], Dict[str, Any]]:
+    """Turn off the Row factory on a _FILE_ROW_COLUMNS cursor and return a row -> dict converter."""
+    cursor.row_factory = None
+    return _file_row_converter([col[0] for col in cursor.description])
+
+
+def _file_row_converter(columns: Sequence[str]) -> Callable[[Sequence[Any]], Dict[str, Any]]:
+    """Return a converter from _FILE_ROW_COLUMNS rows (tuples or Row objects) to dicts.
+    
+    Hot read paths fetch with execute_fetchall, which executes, fetches and
+    drops the cursor in one trip to the connection's thread where "async with
+    execute() as cursor" plus a fetch takes three; its rows are aiosqlite.Row,
+    so columns come from the first row's keys(). The geocoding flags come back
+    from SQLite as 0/1 and are kept as bools.
+    """
+    coords_idx = columns.index('has_coordinates')
+    geocoded_idx = columns.index('is_geocoded')
+    
+    def to_dict(row: Sequence[Any]) -> Dict[str, Any]:
+        return dict(
+            zip(columns, row),
+            has_coordinates=bool(row[coords_idx]),
+            is_geocoded=bool(row[geocoded_idx]),
+        )
+    
+    return to_dict
+
+
+def _id_list_sql(ids) -> Tuple[str, List[Any]]:
+    """Build the right-hand side of an "IN ..." test over integer ids.
+    
+    Short lists get one placeholder per id. Long ones are bound as a single
+    JSON array so the statement text stays the same size (and cacheable) and
+    never nears SQLITE_MAX_VARIABLE_NUMBER. The ids come from SQLite or
+    random.sample, so they are ints already and go in unchecked.
+    """
+    if len(ids) > _INLINE_ID_LIST_MAX:
+        return "(SELECT value FROM json_each(?))", [json.dumps(list(ids))]
+    return f"({','.join('?' * len(ids))})", list(ids)
+
+
+def _bounding_box(latitude: float, longitude: float, radius_meters: float) -> Tuple[float, float, float, float]:
+    """(min_lat, max_lat, min_lon, max_lon) of a box reaching radius_meters around a point."""
+    lat_delta = radius_meters / 111_320.0
+    lon_delta = radius_meters / max(111_320.0 * math.cos(math.radians(latitude)), 1e-6)
+    return (
+        latitude - lat_delta, latitude + lat_delta,
+        longitude - lon_delta, longitude + lon_delta,
+    )
+
+
+def _move_dest_folder(new_path: str) -> str:
+    """Name of the folder a moved file landed in, e.g. "_Edit" or "_Junk"."""
+    return os.path.basename(os.path.dirname(new_path))
+
+
+def _copy_record(record: Optional[dict]) -> Optional[dict]:
+    """Copy a cached lookup result so callers can't mutate the cached one."""
+    if record is None:
+        return None
+    record = dict(record)
+    if record.get('exif') is not None:
+        record['exif'] = dict(record['exif'])
+    return record
+
+
+class _RandomBatcher:
+    """Coalesce concurrent random-file requests that share a filter.
+    
+    Dashboards often ask several slideshow entities for random files at once.
+    The first request for a key waits _RANDOM_BATCH_WINDOW for others with the
+    same key, then one sample of the combined count is drawn and split between
+    them. Each caller gets its own slice, so nobody sees another's files unless
+    the filter matched fewer rows than were asked for in total.
+    
+    A lone request also waits out the window rather than flushing at once: a
+    priority-mode fill only reaches the batcher after its own recent-files
+    query, so callers refreshing together arrive a few milliseconds apart and
+    an immediate flush would split them. The 10 ms is small next to the
+    sampling query itself and the seconds between slideshow refreshes.
+    """
+    
+    def __init__(self, fetch, window: float = _RANDOM_BATCH_WINDOW):
+        """Initialize the batcher.
+        
+        Args:
+            fetch: Coroutine function (key, count) -> list of rows
+            window: Seconds to collect requests before fetching
+        """
+        self._fetch = fetch
+        self._window = window
+        self._pending: Dict[Any, List[Tuple[int, asyncio.Future]]] = {}
+        self._tasks: set = set()
+    
+    async def get(self, key: Any, count: int) -> List[Dict[str, Any]]:
+        """Return count random rows for key, sharing the query with concurrent callers."""
+        if count <= 0:
+            return []
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        waiters = self._pending.get(key)
+        if waiters is None:
+            waiters = self._pending[key] = []
+            loop.call_later(self._window, self._flush, key)
+        waiters.append((count, future))
+        return await future
+    
+    def _flush(self, key: Any) -> None:
+        """Close the batch for key and run its query in the background."""
+        waiters = self._pending.pop(key)
+        task = asyncio.get_running_loop().create_task(self._run(key, waiters))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+    
+    async def _run(self, key: Any, waiters: List[Tuple[int, asyncio.Future]]) -> None:
+        """Fetch one combined sample and hand each waiter its share."""
+        # Callers cancelled while waiting don't count towards the sample
+        waiters = [(count, future) for count, future in waiters if not future.done()]
+        if not waiters:
+            return
+        total = sum(count for count, _ in waiters)
+        try:
+            rows = await self._fetch(key, total)
+        except Exception as err:  # pylint: disable=broad-except
+            for _, future in waiters:
+                if not future.done():
+                    future.set_exception(err)
+            return
+        except BaseException:
+            # Cancelled (e.g. at unload): don't leave callers awaiting forever
+            for _, future in waiters:
+                future.cancel()
+            raise
+        
+        short = len(rows) < total
+        offset = 0
+        for count, future in waiters:
+            if future.done():
+                continue
+            if short:
+                # Not enough rows to go round; rows is the whole matching set,
+                # so give each caller its own random pick from it
+                share = [dict(row) for row in random.sample(rows, min(count, len(rows)))]
+            else:
+                share = rows[offset:offset + count]
+                offset += count
+            future.set_result(share)
+
+
 class CacheManager:
     """Manage SQLite cache for media files."""
     
-    def __init__(self, db_path: str):
+    def __init__(
+        self,
+        db_path: str,
+        auto_commit: bool = True,
+        read_connections: int = _READ_CONNECTIONS,
+    ):
         """Initialize cache manager.
         
         Args:
             db_path: Path to SQLite database file
+            auto_commit: Commit after each write call. When False, writes stay
+                in the open transaction until commit_batch()
+            read_connections: Extra query_only connections for stats, geocode
+                and slideshow reads (0 keeps every query on the writer).
+                In-memory databases never open them.
         """
         self.db_path = db_path
+        self._auto_commit = auto_commit
         self._db: Optional[aiosqlite.Connection] = None
         
+        # Read-only connections handed out round-robin by _reader()
+        self._read_connections = read_connections
+        self._readers: List[aiosqlite.Connection] = []
+        self._next_reader = 0
+        
         # Geocoding stats batching
         self._geocode_stats_cache_hits = 0
         self._geocode_stats_cache_misses = 0
         self._geocode_stats_counter = 0
+        self._geocode_stats_task: Optional[asyncio.Task] = None
+        
+        # get_cache_stats() result, reused until this connection writes again
+        # (tracked via total_changes, which every INSERT/UPDATE/DELETE bumps)
+        self._stats_cache: Optional[Dict[str, Any]] = None
+        self._stats_changes = -1
+        
+        # Single-row lookups (file by path/id, exif by id, geocode key, geocoded
+        # flag) keyed by (kind, key), least recently used first; dropped
+        # wholesale on the same total_changes test
+        self._lookup_cache: "OrderedDict[tuple, Optional[dict]]" = OrderedDict()
+        self._lookup_changes = -1
+        
+        # Set while a scan holds an explicit write transaction (see begin_batch)
+        self._in_batch = False
+        
+        # Serializes execute+commit write paths sharing the single connection
+        self._write_lock = asyncio.Lock()
+        
+        # Shares standard-mode get_random_files queries between concurrent
+        # callers; keyed by (query, params)
+        self._random_batcher = _RandomBatcher(
+            lambda key, count: self._sample_random_files(key[0], list(key[1]), count)
+        )
         
         _LOGGER.info("CacheManager initialized with database: %s", db_path)
     
@@ -33,21 +955,60 @@ class CacheManager:
         Returns:
             True if setup successful
         """
+        # In-memory databases (tests, tooling) have no file, directory, or WAL
+        in_memory = self.db_path == ":memory:" or self.db_path.startswith("file::memory:")
         try:
             # Ensure directory exists
-            os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+            if not in_memory and os.path.dirname(self.db_path):
+                os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
             
             # Connect to database
-            self._db = await aiosqlite.connect(self.db_path)
+            self._db = await aiosqlite.connect(
+                self.db_path, cached_statements=_STATEMENT_CACHE_SIZE
+            )
             self._db.row_factory = aiosqlite.Row
             
             # CRITICAL: Enable foreign key constraints
             # Without this, ON DELETE CASCADE doesn't work and orphaned exif_data accumulates!
             await self._db.execute("PRAGMA foreign_keys = ON")
-            
+
+            # WAL + relaxed sync: scans issue thousands of small writes, and the
+            # default rollback journal with synchronous=FULL fsyncs on every commit.
+            # journal_mode is persistent in the file; the rest are per-connection.
+            if not in_memory:
+                await self._db.execute("PRAGMA journal_mode = WAL")
+            await self._db.execute("PRAGMA synchronous = NORMAL")
+            await self._db.execute("PRAGMA temp_store = MEMORY")
+            await self._db.execute("PRAGMA cache_size = -64000")  # 64 MB
+            await self._db.execute("PRAGMA mmap_size = 536870912")  # 512 MB
+            await self._db.execute("PRAGMA busy_timeout = 5000")
+            # A full scan can grow the -wal file to hundreds of MB; truncate it back
+            # after checkpoints instead of keeping it at its high-water mark
+            await self._db.execute("PRAGMA journal_size_limit = 67108864")  # 64 MB
+            # Bound the sampling PRAGMA optimize/ANALYZE do on large tables
+            await self._db.execute("PRAGMA analysis_limit = 400")
+
             # Create schema
             await self._create_schema()
             
+            # Refresh planner statistics for anything migrations just changed.
+            # PRAGMA optimize only re-analyzes tables this connection's queries
+            # used, so right after opening it can't help a database that has
+            # never been analyzed; give that one a full (analysis_limit) pass.
+            async with self._db.execute(
+                "SELECT 1 FROM sqlite_master WHERE name = 'sqlite_stat1'"
+            ) as cursor:
+                has_stats = await cursor.fetchone() is not None
+            if has_stats:
+                await self.optimize()
+            else:
+                await self.analyze()
+            
+            # Readers need WAL to run beside the writer, and a :memory: database
+            # is private to the connection that opened it
+            if not in_memory:
+                await self._open_readers()
+            
             # Run one-time migration to sanitize Unicode location names
             # DISABLED - sanitization may not be needed, see CHANGELOG
             # await self._sanitize_location_names()
@@ -59,187 +1020,46 @@ class CacheManager:
             _LOGGER.error("Failed to initialize cache database: %s", e)
             return False
     
-    async def _create_schema(self) -> None:
-        """Create database schema if it doesn't exist."""
-        await self._db.execute("""
-            CREATE TABLE IF NOT EXISTS media_files (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                path TEXT UNIQUE NOT NULL,
-                filename TEXT NOT NULL,
-                folder TEXT NOT NULL,
-                file_type TEXT NOT NULL,
-                file_size INTEGER,
-                modified_time INTEGER NOT NULL,
-                created_time INTEGER,
-                duration REAL,
-                width INTEGER,
-                height INTEGER,
-                orientation TEXT,
-                last_scanned INTEGER NOT NULL,
-                is_favorited INTEGER DEFAULT 0,
-                rating INTEGER DEFAULT 0,
-                rated_at INTEGER
-            )
-        """)
-        
-        await self._db.execute("""
-            CREATE INDEX IF NOT EXISTS idx_folder ON media_files(folder)
-        """)
-        
-        await self._db.execute("""
-            CREATE INDEX IF NOT EXISTS idx_modified ON media_files(modified_time)
-        """)
-        
-        await self._db.execute("""
-            CREATE INDEX IF NOT EXISTS idx_type ON media_files(file_type)
-        """)
-        
-        await self._db.execute("""
-            CREATE TABLE IF NOT EXISTS exif_data (
-                file_id INTEGER PRIMARY KEY,
-                camera_make TEXT,
-                camera_model TEXT,
-                date_taken INTEGER,
-                latitude REAL,
-                longitude REAL,
-                altitude REAL,
-                location_name TEXT,
-                location_city TEXT,
-                location_state TEXT,
-                location_country TEXT,
-                rating INTEGER,
-                is_favorited INTEGER DEFAULT 0,
-                iso INTEGER,
-                aperture REAL,
-                shutter_speed TEXT,
-                focal_length REAL,
-                focal_length_35mm INTEGER,
-                exposure_compensation TEXT,
-                metering_mode TEXT,
-                white_balance TEXT,
-                flash TEXT,
-                burst_id TEXT,
-                FOREIGN KEY (file_id) REFERENCES media_files(id) ON DELETE CASCADE
-            )
-        """)
-        
-        # Create indexes for commonly queried EXIF fields
-        await self._db.execute("""
-            CREATE INDEX IF NOT EXISTS idx_exif_date_taken ON exif_data(date_taken)
-        """)
-        
-        await self._db.execute("""
-            CREATE INDEX IF NOT EXISTS idx_exif_location_city ON exif_data(location_city)
-        """)
-        
-        await self._db.execute("""
-            CREATE INDEX IF NOT EXISTS idx_exif_location_country ON exif_data(location_country)
-        """)
-        
-        await self._db.execute("""
-            CREATE INDEX IF NOT EXISTS idx_exif_location_name ON exif_data(location_name)
-        """)
-        
-        # Composite index for location + date queries (e.g., "photos from Paris in 2023")
-        await self._db.execute("""
-            CREATE INDEX IF NOT EXISTS idx_exif_location_date 
-            ON exif_data(location_city, date_taken)
-        """)
-        
-        # Index for GPS coordinate queries (nearby photos)
-        await self._db.execute("""
-            CREATE INDEX IF NOT EXISTS idx_exif_gps_coords 
-            ON exif_data(latitude, longitude)
-        """)
-        
-        # Index for favorites filtering
-        await self._db.execute("""
-            CREATE INDEX IF NOT EXISTS idx_exif_favorited ON exif_data(is_favorited)
-        """)
-
-        await self._db.execute("""
-            CREATE TABLE IF NOT EXISTS geocode_cache (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                latitude REAL NOT NULL,
-                longitude REAL NOT NULL,
-                precision_level INTEGER NOT NULL,
-                location_name TEXT,
-                location_city TEXT,
-                location_state TEXT,
-                location_country TEXT,
-                cached_at INTEGER NOT NULL,
-                UNIQUE(latitude, longitude, precision_level)
+    async def _open_readers(self) -> None:
+        """Open the query_only reader connections (see _reader)."""
+        await self._close_readers()
+        for _ in range(self._read_connections):
+            reader = await aiosqlite.connect(
+                self.db_path, cached_statements=_STATEMENT_CACHE_SIZE
             )
-        """)
-        
-        await self._db.execute("""
-            CREATE INDEX IF NOT EXISTS idx_geocode_coords 
-            ON geocode_cache(latitude, longitude, precision_level)
-        """)
-        
-        await self._db.execute("""
-            CREATE TABLE IF NOT EXISTS scan_history (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                folder_path TEXT NOT NULL,
-                scan_type TEXT NOT NULL,
-                start_time INTEGER NOT NULL,
-                end_time INTEGER,
-                files_added INTEGER DEFAULT 0,
-                files_updated INTEGER DEFAULT 0,
-                files_removed INTEGER DEFAULT 0,
-                status TEXT
-            )
-        """)
-        
-        # Move history table for tracking file moves (e.g., to _Edit folder)
-        await self._db.execute("""
-            CREATE TABLE IF NOT EXISTS move_history (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                original_path TEXT NOT NULL,
-                new_path TEXT NOT NULL,
-                moved_at INTEGER NOT NULL,
-                move_reason TEXT,
-                restored INTEGER DEFAULT 0,
-                restored_at INTEGER
-            )
-        """)
-        
-        await self._db.execute("""
-            CREATE INDEX IF NOT EXISTS idx_move_history_new_path 
-            ON move_history(new_path)
-        """)
-        
-        await self._db.execute("""
-            CREATE INDEX IF NOT EXISTS idx_move_history_restored 
-            ON move_history(restored)
-        """)
-        
-        # Geocode stats table for tracking cache hit rate
-        # Uses singleton pattern: CHECK (id = 1) ensures only one row exists for global statistics
-        await self._db.execute("""
-            CREATE TABLE IF NOT EXISTS geocode_stats (
-                id INTEGER PRIMARY KEY CHECK (id = 1),
-                cache_hits INTEGER DEFAULT 0,
-                cache_misses INTEGER DEFAULT 0
-            )
-        """)
+            reader.row_factory = aiosqlite.Row
+            await reader.execute("PRAGMA query_only = 1")
+            await reader.execute("PRAGMA temp_store = MEMORY")
+            # Smaller than the writer's: reads are mostly served through mmap,
+            # and this cache is per reader
+            await reader.execute("PRAGMA cache_size = -16000")  # 16 MB
+            await reader.execute("PRAGMA mmap_size = 536870912")  # 512 MB
+            await reader.execute("PRAGMA busy_timeout = 5000")
+            self._readers.append(reader)
+    
+    async def _close_readers(self) -> None:
+        """Close any reader connections."""
+        readers, self._readers = self._readers, []
+        for reader in readers:
+            await reader.close()
+    
+    def _reader(self) -> aiosqlite.Connection:
+        """Pick the connection for a pure read.
         
-        # Initialize stats row if it doesn't exist
-        await self._db.execute("""
-            INSERT OR IGNORE INTO geocode_stats (id, cache_hits, cache_misses)
-            VALUES (1, 0, 0)
-        """)
-
-        # Sync state table for cross-device queue sharing (media_card shared_queue_id feature)
-        await self._db.execute("""
-            CREATE TABLE IF NOT EXISTS sync_state (
-                sync_group TEXT PRIMARY KEY NOT NULL,
-                queue_json TEXT NOT NULL,
-                current_index INTEGER NOT NULL DEFAULT 0,
-                updated_at INTEGER NOT NULL
-            )
-        """)
-
+        Readers run on their own threads, so sensor polls and slideshow queries
+        don't queue behind scan writes. They only see committed data, so while
+        the writer holds uncommitted changes (a scan batch, auto_commit off)
+        reads stay on the writer to see them.
+        """
+        if not self._readers or self._db.in_transaction:
+            return self._db
+        reader = self._readers[self._next_reader % len(self._readers)]
+        self._next_reader += 1
+        return reader
+    
+    async def _create_schema(self) -> None:
+        """Create database schema if it doesn't exist."""
+        await self._db.executescript(_SCHEMA_SQL)
         await self._db.commit()
         _LOGGER.debug("Database schema created/verified")
         
@@ -248,18 +1068,39 @@ class CacheManager:
     
     async def _run_migrations(self) -> None:
         """Run database migrations for schema updates."""
+        # Skip the table introspection entirely once the database is current
+        async with self._db.execute("PRAGMA user_version") as cursor:
+            schema_version = (await cursor.fetchone())[0]
+        if schema_version >= _SCHEMA_VERSION:
+            return
+        
+        # All steps share one transaction: a single fsync on upgrade, and a
+        # step that fails leaves the old user_version so the next start retries
+        if self._db.in_transaction:
+            await self._db.commit()
+        await self._db.execute("BEGIN IMMEDIATE")
+        try:
+            await self._apply_migrations()
+        except Exception:
+            await self._db.rollback()
+            raise
+        await self._db.commit()
+        _LOGGER.debug("Database migrations completed (schema version %d)", _SCHEMA_VERSION)
+        
+        # Indexes the migrations just built have no statistics yet
+        await self.analyze()
+    
+    async def _apply_migrations(self) -> None:
+        """Apply every schema step up to _SCHEMA_VERSION inside the caller's transaction."""
         # Check if new columns exist in exif_data table
         async with self._db.execute("PRAGMA table_info(exif_data)") as cursor:
             columns = await cursor.fetchall()
             column_names = [col[1] for col in columns]
         
         # Add new EXIF columns if they don't exist
+        # (camera-setting columns now live in exif_data_extended)
         new_columns = {
             'altitude': 'REAL',
-            'focal_length_35mm': 'INTEGER',
-            'exposure_compensation': 'TEXT',
-            'metering_mode': 'TEXT',
-            'white_balance': 'TEXT',
             'burst_favorites': 'TEXT',
             'burst_count': 'INTEGER',
             'burst_id': 'TEXT',
@@ -278,13 +1119,38 @@ class CacheManager:
                 _LOGGER.info("Adding column '%s' to exif_data table", col_name)
                 await self._db.execute(f"ALTER TABLE exif_data ADD COLUMN {col_name} {col_type}")
         
+        await self._migrate_folder_class()
+        await self._create_sort_indexes()
+        
+        # Priority-new-files picks filter on last_scanned alone when no file_type
+        # is given, which idx_scanned_type_folder (file_type first) can't seek
+        await self._db.execute("""
+            CREATE INDEX IF NOT EXISTS idx_media_recent
+            ON media_files(last_scanned) WHERE folder_class = 0
+        """)
+        await self._migrate_exif_extended(column_names)
+        await self._migrate_geocode_cache()
+        await self._migrate_move_history()
+        await self._migrate_taken_dates()
+        
+        # Favorite filters moved from exif_data to media_files; exif_data is what
+        # the filters used to read, so it wins where the two disagree
+        await self._db.execute("""
+            UPDATE media_files
+            SET is_favorited = (SELECT e.is_favorited FROM exif_data e WHERE e.file_id = media_files.id)
+            WHERE EXISTS (
+                SELECT 1 FROM exif_data e
+                WHERE e.file_id = media_files.id
+                  AND e.is_favorited IS NOT NULL
+                  AND e.is_favorited IS NOT media_files.is_favorited
+            )
+        """)
+        
         # Add index for burst_id fast-path lookups (after column is guaranteed to exist)
         await self._db.execute("""
             CREATE INDEX IF NOT EXISTS idx_exif_burst_id ON exif_data(burst_id)
         """)
 
-        await self._db.commit()
-
         # Add session_override_json and config_fields_json to sync_state
         async with self._db.execute("PRAGMA table_info(sync_state)") as cursor:
             sync_columns = [col[1] for col in await cursor.fetchall()]
@@ -302,8 +1168,175 @@ class CacheManager:
                 _LOGGER.info("Adding column '%s' to sync_state table", col_name)
                 await self._db.execute(f"ALTER TABLE sync_state ADD COLUMN {col_name} {col_type}")
 
-        await self._db.commit()
-        _LOGGER.debug("Database migrations completed")
+        await self._db.execute(f"PRAGMA user_version = {_SCHEMA_VERSION}")
+    
+    async def _migrate_folder_class(self) -> None:
+        """Add media_files.folder_class and the partial idx_media_active index over it."""
+        # Generated columns only show up in table_xinfo
+        async with self._db.execute("PRAGMA table_xinfo(media_files)") as cursor:
+            media_columns = [col[1] for col in await cursor.fetchall()]
+        if 'folder_class' not in media_columns:
+            _LOGGER.info("Adding column 'folder_class' to media_files table")
+            await self._db.execute(
+                "ALTER TABLE media_files ADD COLUMN folder_class INTEGER"
+                f" GENERATED ALWAYS AS ({_FOLDER_CLASS_SQL}) VIRTUAL"
+            )
+        
+        # Partial index over the rows slideshow queries can return: its WHERE is
+        # the folder_class = 0 test every query carries, so folder + file_type
+        # filters seek on it and unfiltered/file_type-only queries scan only
+        # active rows. Older databases have it keyed on the LIKE predicates.
+        async with self._db.execute(
+            "SELECT sql FROM sqlite_master WHERE type = 'index' AND name = 'idx_media_active'"
+        ) as cursor:
+            row = await cursor.fetchone()
+        if row and "folder_class" in (row[0] or ""):
+            return
+        await self._db.execute("DROP INDEX IF EXISTS idx_media_active")
+        await self._db.execute("""
+            CREATE INDEX idx_media_active
+            ON media_files(folder COLLATE NOCASE, file_type)
+            WHERE folder_class = 0
+        """)
+    
+    async def _create_sort_indexes(self) -> None:
+        """Index the get_ordered_files sort keys over active rows.
+        
+        Each index is on the exact sort expression get_ordered_files uses, so
+        an unfiltered (or loosely filtered) ordered page is an index walk that
+        stops at LIMIT instead of a sort of every active row. Ties break on
+        m.id, which every index carries as its rowid. The date_taken sort key,
+        m.taken_time, is indexed by _migrate_taken_dates once the column exists.
+        """
+        await self._db.execute("""
+            CREATE INDEX IF NOT EXISTS idx_media_sort_filename
+            ON media_files(filename) WHERE folder_class = 0
+        """)
+        await self._db.execute("""
+            CREATE INDEX IF NOT EXISTS idx_media_sort_path
+            ON media_files((folder || '/' || filename)) WHERE folder_class = 0
+        """)
+        await self._db.execute("""
+            CREATE INDEX IF NOT EXISTS idx_media_sort_modified
+            ON media_files(unixepoch(modified_time)) WHERE folder_class = 0
+        """)
+    
+    async def _migrate_exif_extended(self, column_names: List[str]) -> None:
+        """Move camera-setting columns from an older exif_data into exif_data_extended.
+        
+        Copies whichever of those columns the old table has, then drops them so
+        exif_data rows shrink back to the columns the slideshow queries read.
+        """
+        legacy = [col for col in _EXIF_EXTENDED_COLUMNS if col in column_names]
+        if not legacy:
+            return
+        
+        _LOGGER.info("Moving %d camera-setting columns to exif_data_extended", len(legacy))
+        await self._db.execute(f"""
+            INSERT OR IGNORE INTO exif_data_extended (file_id, {', '.join(legacy)})
+            SELECT file_id, {', '.join(legacy)} FROM exif_data
+            WHERE {' OR '.join(f'{col} IS NOT NULL' for col in legacy)}
+        """)
+        for col in legacy:
+            try:
+                await self._db.execute(f"ALTER TABLE exif_data DROP COLUMN {col}")
+            except aiosqlite.OperationalError as err:
+                # SQLite < 3.35 has no DROP COLUMN; the copy is done and nothing
+                # writes the old column anymore, so it is just dead weight
+                _LOGGER.debug("Could not drop exif_data.%s: %s", col, err)
+    
+    async def _migrate_move_history(self) -> None:
+        """Add move_history.dest_folder, backfill it, and index pending restores by it."""
+        async with self._db.execute("PRAGMA table_info(move_history)") as cursor:
+            move_columns = [col[1] for col in await cursor.fetchall()]
+        if 'dest_folder' not in move_columns:
+            _LOGGER.info("Adding column 'dest_folder' to move_history table")
+            await self._db.execute("ALTER TABLE move_history ADD COLUMN dest_folder TEXT")
+        
+        async with self._db.execute(
+            "SELECT id, new_path FROM move_history WHERE dest_folder IS NULL"
+        ) as cursor:
+            rows = await cursor.fetchall()
+        if rows:
+            await self._db.executemany(
+                "UPDATE move_history SET dest_folder = ? WHERE id = ?",
+                [(_move_dest_folder(row[1]), row[0]) for row in rows]
+            )
+        
+        # Only pending rows are ever listed, newest first; restored ones just
+        # accumulate, so leave them out of both indexes
+        await self._db.execute("DROP INDEX IF EXISTS idx_move_history_restored")
+        await self._db.execute("""
+            CREATE INDEX IF NOT EXISTS idx_pending_restores
+            ON move_history(moved_at DESC) WHERE restored = 0
+        """)
+        await self._db.execute("""
+            CREATE INDEX IF NOT EXISTS idx_pending_restores_folder
+            ON move_history(dest_folder, moved_at DESC) WHERE restored = 0
+        """)
+    
+    async def _migrate_taken_dates(self) -> None:
+        """Add media_files.taken_time/taken_month/taken_day, the triggers that maintain them, and their indexes."""
+        async with self._db.execute("PRAGMA table_xinfo(media_files)") as cursor:
+            media_columns = [col[1] for col in await cursor.fetchall()]
+        for col in ('taken_month', 'taken_day', 'taken_time'):
+            if col not in media_columns:
+                _LOGGER.info("Adding column '%s' to media_files table", col)
+                await self._db.execute(f"ALTER TABLE media_files ADD COLUMN {col} INTEGER")
+        
+        # Recompute whenever an input of the effective capture time changes:
+        # the file's own times, or its EXIF date_taken appearing/changing/going
+        for name, event, key in (
+            ("trg_media_taken_insert", "INSERT ON media_files", "NEW.id"),
+            ("trg_media_taken_update", "UPDATE OF created_time, modified_time ON media_files", "NEW.id"),
+            ("trg_exif_taken_insert", "INSERT ON exif_data", "NEW.file_id"),
+            ("trg_exif_taken_update", "UPDATE OF date_taken ON exif_data", "NEW.file_id"),
+            ("trg_exif_taken_delete", "DELETE ON exif_data", "OLD.file_id"),
+        ):
+            # Recreated rather than kept: older bodies predate taken_time
+            await self._db.execute(f"DROP TRIGGER IF EXISTS {name}")
+            await self._db.execute(f"""
+                CREATE TRIGGER {name} AFTER {event}
+                BEGIN
+                    {_UPDATE_TAKEN_DATE_SQL} WHERE id = {key};
+                END
+            """)
+        
+        _LOGGER.info("Computing capture times for indexed files")
+        await self._db.execute(_UPDATE_TAKEN_DATE_SQL)
+        await self._db.execute("""
+            CREATE INDEX IF NOT EXISTS idx_media_taken
+            ON media_files(taken_month, taken_day) WHERE folder_class = 0
+        """)
+        await self._db.execute("""
+            CREATE INDEX IF NOT EXISTS idx_media_sort_taken
+            ON media_files(taken_time) WHERE folder_class = 0
+        """)
+    
+    async def _migrate_geocode_cache(self) -> None:
+        """Rebuild an older geocode_cache (rowid or REAL-keyed) with integer keys, keeping its rows."""
+        async with self._db.execute(
+            "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'geocode_cache'"
+        ) as cursor:
+            row = await cursor.fetchone()
+        if not row or "lat_key" in (row[0] or ""):
+            return
+        
+        _LOGGER.info("Migrating geocode_cache to integer-keyed WITHOUT ROWID layout")
+        await self._db.execute("DROP TABLE IF EXISTS geocode_cache_new")
+        await self._db.execute(f"CREATE TABLE geocode_cache_new {_GEOCODE_CACHE_DEFINITION}")
+        await self._db.execute(f"""
+            INSERT OR IGNORE INTO geocode_cache_new
+            (lat_key, lon_key, precision_level, latitude, longitude, location_name,
+             location_city, location_state, location_country, cached_at)
+            SELECT CAST(ROUND(latitude * {10 ** _GEOCODE_PRECISION}) AS INTEGER),
+                   CAST(ROUND(longitude * {10 ** _GEOCODE_PRECISION}) AS INTEGER),
+                   precision_level, latitude, longitude, location_name,
+                   location_city, location_state, location_country, cached_at
+            FROM geocode_cache
+        """)
+        await self._db.execute("DROP TABLE geocode_cache")
+        await self._db.execute("ALTER TABLE geocode_cache_new RENAME TO geocode_cache")
     
     async def _sanitize_location_names(self) -> None:
         """One-time migration to sanitize Unicode location names to ASCII.
@@ -364,9 +1397,7 @@ class CacheManager:
         Returns:
             Total file count
         """
-        async with self._db.execute("SELECT COUNT(*) FROM media_files") as cursor:
-            row = await cursor.fetchone()
-            return row[0] if row else 0
+        return (await self.get_cache_stats())["total_files"]
     
     async def get_total_by_type(self, file_type: str) -> int:
         """Get total files of specific type.
@@ -377,6 +1408,9 @@ class CacheManager:
         Returns:
             Count of files
         """
+        # image/video are part of the consolidated stats row
+        if file_type in ("image", "video"):
+            return (await self.get_cache_stats())[f"total_{file_type}s"]
         async with self._db.execute(
             "SELECT COUNT(*) FROM media_files WHERE file_type = ?",
             (file_type,)
@@ -390,11 +1424,7 @@ class CacheManager:
         Returns:
             Folder count
         """
-        async with self._db.execute(
-            "SELECT COUNT(DISTINCT folder) FROM media_files"
-        ) as cursor:
-            row = await cursor.fetchone()
-            return row[0] if row else 0
+        return (await self.get_cache_stats())["total_folders"]
     
     async def get_cache_stats(self) -> Dict[str, Any]:
         """Get cache statistics.
@@ -402,51 +1432,61 @@ class CacheManager:
         Returns:
             Dictionary with cache stats
         """
-        total_files = await self.get_total_files()
-        total_images = await self.get_total_by_type('image')
-        total_videos = await self.get_total_by_type('video')
-        total_folders = await self.get_total_folders()
+        # Sensors poll this; skip the aggregate scan when nothing was written
+        if self._stats_cache is not None and self._db.total_changes == self._stats_changes:
+            return dict(self._stats_cache)
+        changes_at_start = self._db.total_changes
+        
+        # One round-trip: media_files is aggregated in a single pass and the
+        # remaining counters come from scalar subqueries
+        async with self._reader().execute("""
+            SELECT
+                f.total_files, f.total_images, f.total_videos, f.total_folders,
+                (SELECT COUNT(*) FROM exif_data
+                 WHERE location_city IS NOT NULL AND location_city != '') AS files_with_location,
+                (SELECT COUNT(*) FROM geocode_cache) AS geocode_cache_entries,
+                gs.cache_hits, gs.cache_misses,
+                (SELECT MAX(end_time) FROM scan_history WHERE status = 'completed') AS last_scan_end
+            FROM (
+                SELECT COUNT(*) AS total_files,
+                       SUM(file_type = 'image') AS total_images,
+                       SUM(file_type = 'video') AS total_videos,
+                       -- GROUP BY walks idx_folder's distinct keys in order;
+                       -- COUNT(DISTINCT folder) de-dups through a temp B-tree
+                       (SELECT COUNT(*) FROM (SELECT folder FROM media_files GROUP BY folder))
+                           AS total_folders
+                FROM media_files
+            ) AS f
+            LEFT JOIN geocode_stats gs ON gs.id = 1
+        """) as cursor:
+            row = await cursor.fetchone()
+        
+        total_files = row['total_files'] or 0
+        total_images = row['total_images'] or 0
+        total_videos = row['total_videos'] or 0
+        total_folders = row['total_folders'] or 0
+        files_with_location = row['files_with_location'] or 0
+        geocode_cache_entries = row['geocode_cache_entries'] or 0
         
         # Get database file size
         cache_size_mb = 0.0
         if os.path.exists(self.db_path):
             cache_size_mb = os.path.getsize(self.db_path) / (1024 * 1024)
         
-        # Get files with geocoded location data (location_city indicates geocoding completed)
-        async with self._db.execute(
-            "SELECT COUNT(*) FROM exif_data WHERE location_city IS NOT NULL AND location_city != ''"
-        ) as cursor:
-            row = await cursor.fetchone()
-            files_with_location = row[0] if row else 0
-        
-        # Get geocode cache stats
-        async with self._db.execute("SELECT COUNT(*) FROM geocode_cache") as cursor:
-            row = await cursor.fetchone()
-            geocode_cache_entries = row[0] if row else 0
-        
         # Get geocode hit rate
         geocode_hit_rate = 0.0
-        async with self._db.execute(
-            "SELECT cache_hits, cache_misses FROM geocode_stats WHERE id = 1"
-        ) as cursor:
-            row = await cursor.fetchone()
-            if row:
-                cache_hits = row[0] or 0
-                cache_misses = row[1] or 0
-                total_lookups = cache_hits + cache_misses
-                if total_lookups > 0:
-                    geocode_hit_rate = (cache_hits / total_lookups) * 100
+        cache_hits = row['cache_hits'] or 0
+        cache_misses = row['cache_misses'] or 0
+        total_lookups = cache_hits + cache_misses
+        if total_lookups > 0:
+            geocode_hit_rate = (cache_hits / total_lookups) * 100
         
         # Get last scan time
         last_scan_time = None
-        async with self._db.execute(
-            "SELECT MAX(end_time) FROM scan_history WHERE status = 'completed'"
-        ) as cursor:
-            row = await cursor.fetchone()
-            if row and row[0]:
-                last_scan_time = datetime.fromtimestamp(row[0]).isoformat()
+        if row['last_scan_end']:
+            last_scan_time = datetime.fromtimestamp(row['last_scan_end']).isoformat()
         
-        return {
+        stats = {
             "total_files": total_files,
             "total_images": total_images,
             "total_videos": total_videos,
@@ -457,92 +1497,107 @@ class CacheManager:
             "geocode_hit_rate": round(geocode_hit_rate, 1),
             "last_scan_time": last_scan_time,
         }
+        
+        self._stats_cache = stats
+        self._stats_changes = changes_at_start
+        return dict(stats)
     
-    async def add_file(self, file_data: Dict[str, Any]) -> int:
+    async def begin_batch(self) -> None:
+        """Open an explicit write transaction for a run of scan writes.
+
+        While a batch is open, add_file/add_exif_data/add_geocode_cache and
+        friends skip their per-call commit; everything lands in one fsync at
+        commit_batch(). Nested calls are no-ops.
+        """
+        if self._in_batch:
+            return
+        if self._db.in_transaction:
+            await self._db.commit()
+        await self._db.execute("BEGIN IMMEDIATE")
+        self._in_batch = True
+
+    async def commit_batch(self) -> None:
+        """Commit the transaction opened by begin_batch() (or, with auto_commit off, any pending writes)."""
+        if not self._in_batch and not self._db.in_transaction:
+            return
+        self._in_batch = False
+        await self._db.commit()
+
+    async def _commit(self) -> None:
+        """Commit unless a scan batch is open or auto_commit is off (commit_batch will do it)."""
+        if self._auto_commit and not self._in_batch:
+            await self._db.commit()
+
+    async def add_files_bulk(self, files: List[Dict[str, Any]]) -> Dict[str, int]:
+        """Add or update many files in a single transaction.
+
+        Uses the same ON CONFLICT(path) upsert as add_file so existing rows keep
+        their id (and therefore their exif_data), just with one executemany.
+
+        Args:
+            files: List of file metadata dictionaries (same shape as add_file)
+
+        Returns:
+            Dictionary mapping path -> file ID for every row written
+        """
+        if not files:
+            return {}
+
+        current_time = int(time.time())
+        rows = [_media_file_row(f, current_time) for f in files]
+
+        async with self._write_lock:
+            own_batch = not self._in_batch
+            if own_batch:
+                await self.begin_batch()
+            try:
+                await self._db.executemany(_UPSERT_MEDIA_FILE_SQL, rows)
+
+                path_to_id: Dict[str, int] = {}
+                paths = [f['path'] for f in files]
+                # Stay well under SQLITE_MAX_VARIABLE_NUMBER on older builds
+                for start in range(0, len(paths), 500):
+                    chunk = paths[start:start + 500]
+                    placeholders = ','.join('?' * len(chunk))
+                    async with self._db.execute(
+                        f"SELECT path, id FROM media_files WHERE path IN ({placeholders})",
+                        chunk
+                    ) as cursor:
+                        for row in await cursor.fetchall():
+                            path_to_id[row[0]] = row[1]
+            finally:
+                if own_batch:
+                    await self.commit_batch()
+
+        return path_to_id
+
+    async def add_file(self, file_data: Dict[str, Any], commit: bool = True) -> int:
         """Add file to cache.
         
         Args:
             file_data: File metadata dictionary
+            commit: Commit after the write. Pass False when an add_exif_data
+                for the same file follows, so both land in one commit
             
         Returns:
             File ID
         """
-        # Check if file exists and if modified_time has changed
-        # Only update last_scanned if file is new OR modified_time changed
-        current_time = int(datetime.now().timestamp())
-        
-        async with self._db.execute(
-            "SELECT modified_time, last_scanned FROM media_files WHERE path = ?",
-            (file_data['path'],)
-        ) as cursor:
-            existing_row = await cursor.fetchone()
-        
-        # Determine last_scanned value:
-        # - If file doesn't exist: use current_time (new file)
-        # - If modified_time changed: use current_time (file was modified)
-        # - If modified_time unchanged: preserve existing last_scanned (file hasn't changed)
-        if existing_row is None:
-            # New file - use current timestamp
-            last_scanned_value = current_time
-        elif existing_row[0] != file_data['modified_time']:
-            # File modified - use current timestamp
-            last_scanned_value = current_time
-        else:
-            # File unchanged - preserve existing last_scanned
-            last_scanned_value = existing_row[1]
-        
-        # Use INSERT ... ON CONFLICT DO UPDATE to preserve file_id and foreign key relationships
-        # This prevents orphaning exif_data when re-scanning existing files
-        await self._db.execute("""
-            INSERT INTO media_files 
-            (path, filename, folder, file_type, file_size, modified_time, 
-             created_time, duration, last_scanned, width, height, orientation,
-             is_favorited, rating, rated_at)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ON CONFLICT(path) DO UPDATE SET
-                filename = excluded.filename,
-                folder = excluded.folder,
-                file_type = excluded.file_type,
-                file_size = excluded.file_size,
-                modified_time = excluded.modified_time,
-                created_time = excluded.created_time,
-                duration = excluded.duration,
-                last_scanned = excluded.last_scanned,
-                width = excluded.width,
-                height = excluded.height,
-                orientation = excluded.orientation,
-                is_favorited = COALESCE(NULLIF(excluded.is_favorited, 0), media_files.is_favorited),
-                rating = COALESCE(NULLIF(excluded.rating, 0), media_files.rating),
-                rated_at = COALESCE(excluded.rated_at, media_files.rated_at)
-        """, (
-            file_data['path'],
-            file_data['filename'],
-            file_data['folder'],
-            file_data['file_type'],
-            file_data.get('file_size'),
-            file_data['modified_time'],
-            file_data.get('created_time'),
-            file_data.get('duration'),
-            last_scanned_value,
-            file_data.get('width'),
-            file_data.get('height'),
-            file_data.get('orientation'),
-            file_data.get('is_favorited', 0),
-            file_data.get('rating', 0),
-            file_data.get('rated_at'),
-        ))
-        
-        await self._db.commit()
-        
-        # Get the file ID
-        async with self._db.execute(
-            "SELECT id FROM media_files WHERE path = ?",
-            (file_data['path'],)
-        ) as cursor:
-            row = await cursor.fetchone()
+        current_time = int(time.time())
+        
+        async with self._write_lock:
+            async with self._db.execute(
+                _UPSERT_MEDIA_FILE_RETURNING_SQL,
+                _media_file_row(file_data, current_time)
+            ) as cursor:
+                row = await cursor.fetchone()
+            
+            if commit:
+                await self._commit()
             return row[0] if row else 0
     
-    async def add_exif_data(self, file_id: int, exif_data: Dict[str, Any]) -> None:
+    async def add_exif_data(
+        self, file_id: int, exif_data: Dict[str, Any], commit: bool = True
+    ) -> None:
         """Add or update EXIF data for a file.
         
         Preserves existing geocoded location data to avoid re-geocoding on every scan.
@@ -550,75 +1605,42 @@ class CacheManager:
         Args:
             file_id: ID of the file in media_files table
             exif_data: Dictionary with EXIF metadata
+            commit: Commit after the write (see add_file)
         """
         # Skip if no EXIF data provided
         if not exif_data:
             return
         
-        # Check if EXIF data already exists - preserve geocoded location, favorite, and burst data
-        existing_data = None
-        async with self._db.execute("""
-            SELECT location_name, location_city, location_state, location_country,
-                   rating, is_favorited, burst_count, burst_favorites, burst_id
-            FROM exif_data
-            WHERE file_id = ?
-        """, (file_id,)) as cursor:
-            row = await cursor.fetchone()
-            if row:
-                existing_data = {
-                    'location_name': row[0],
-                    'location_city': row[1],
-                    'location_state': row[2],
-                    'location_country': row[3],
-                    'rating': row[4],
-                    'is_favorited': row[5],
-                    'burst_count': row[6],
-                    'burst_favorites': row[7],
-                    'burst_id': row[8],
-                }
+        params = _exif_params(file_id, exif_data)
+        async with self._write_lock:
+            await self._db.execute(_UPSERT_EXIF_SQL, params)
+            await self._db.execute(_UPSERT_EXIF_EXTENDED_SQL, params)
+            if commit:
+                await self._commit()
+    
+    async def add_exif_bulk(self, rows: List[tuple]) -> None:
+        """Add or update EXIF data for many files in a single transaction.
         
-        await self._db.execute("""
-            INSERT OR REPLACE INTO exif_data 
-            (file_id, camera_make, camera_model, date_taken, latitude, longitude, altitude,
-             location_name, location_city, location_state, location_country,
-             rating, is_favorited,
-             iso, aperture, shutter_speed, focal_length, focal_length_35mm,
-             exposure_compensation, metering_mode, white_balance, flash,
-             burst_count, burst_favorites, burst_id)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """, (
-            file_id,
-            exif_data.get('camera_make'),
-            exif_data.get('camera_model'),
-            exif_data.get('date_taken'),
-            exif_data.get('latitude'),
-            exif_data.get('longitude'),
-            exif_data.get('altitude'),
-            # Preserve existing geocoded location if available, otherwise use None
-            existing_data['location_name'] if existing_data and existing_data.get('location_city') else None,
-            existing_data['location_city'] if existing_data and existing_data.get('location_city') else None,
-            existing_data['location_state'] if existing_data and existing_data.get('location_city') else None,
-            existing_data['location_country'] if existing_data and existing_data.get('location_city') else None,
-            # Use rating from EXIF if present, otherwise preserve existing
-            exif_data.get('rating') if exif_data.get('rating') is not None else (existing_data.get('rating') if existing_data else None),
-            # Use is_favorited from EXIF if present, otherwise preserve existing
-            exif_data.get('is_favorited') if exif_data.get('is_favorited') is not None else (existing_data.get('is_favorited') if existing_data else 0),
-            exif_data.get('iso'),
-            exif_data.get('aperture'),
-            exif_data.get('shutter_speed'),
-            exif_data.get('focal_length'),
-            exif_data.get('focal_length_35mm'),
-            exif_data.get('exposure_compensation'),
-            exif_data.get('metering_mode'),
-            exif_data.get('white_balance'),
-            exif_data.get('flash'),
-            # Preserve existing burst data - never cleared by a rescan
-            existing_data['burst_count'] if existing_data else None,
-            existing_data['burst_favorites'] if existing_data else None,
-            existing_data['burst_id'] if existing_data else None,
-        ))
+        Same preservation rules as add_exif_data, but the statement is prepared
+        once and bound per row via executemany.
         
-        await self._db.commit()
+        Args:
+            rows: List of (file_id, exif_data) tuples; empty exif_data is skipped
+        """
+        params = [_exif_params(file_id, exif) for file_id, exif in rows if exif]
+        if not params:
+            return
+        
+        async with self._write_lock:
+            own_batch = not self._in_batch
+            if own_batch:
+                await self.begin_batch()
+            try:
+                await self._db.executemany(_UPSERT_EXIF_SQL, params)
+                await self._db.executemany(_UPSERT_EXIF_EXTENDED_SQL, params)
+            finally:
+                if own_batch:
+                    await self.commit_batch()
     
     async def has_geocoded_location(self, file_id: int) -> bool:
         """Check if a file already has geocoded location data.
@@ -629,11 +1651,65 @@ class CacheManager:
         Returns:
             True if location_city is populated, False otherwise
         """
-        async with self._db.execute("""
-            SELECT location_city FROM exif_data WHERE file_id = ?
-        """, (file_id,)) as cursor:
-            row = await cursor.fetchone()
-            return row is not None and row[0] is not None
+        hit, record = self._lookup_cache_get(('geocoded', file_id))
+        if not hit:
+            changes_at_start = self._db.total_changes
+            rows = await self._reader().execute_fetchall(_HAS_GEOCODED_LOCATION_SQL, (file_id,))
+            record = {'location_city': rows[0][0]} if rows else None
+            self._lookup_cache_put(('geocoded', file_id), record, changes_at_start)
+        return record is not None and record['location_city'] is not None
+    
+    async def load_scan_index(self, folder: str) -> Dict[str, Tuple[int, Any, Optional[int]]]:
+        """Load what a rescan needs to know about every indexed file under folder.
+        
+        One range scan over the path index replaces a get_file_by_path per
+        walked file; unchanged files can then be skipped from the dict.
+        
+        Args:
+            folder: Folder being scanned (subfolders included)
+            
+        Returns:
+            Dictionary mapping path -> (file_id, modified_time, date_taken),
+            date_taken None when the file has no EXIF date yet
+        """
+        prefix = folder.rstrip('/') + '/'
+        # Every path under prefix sorts in [prefix, prefix with '/' bumped to '0')
+        async with self._db.execute(
+            """
+            SELECT m.path, m.id, m.modified_time, e.date_taken
+            FROM media_files m
+            LEFT JOIN exif_data e ON e.file_id = m.id
+            WHERE m.path >= ? AND m.path < ?
+            """,
+            (prefix, prefix[:-1] + '0')
+        ) as cursor:
+            cursor.row_factory = None
+            return {row[0]: row[1:] for row in await cursor.fetchall()}
+    
+    async def get_geocoded_file_ids(self, file_ids: List[int]) -> set:
+        """Return which of file_ids already have geocoded location data.
+        
+        Bulk form of has_geocoded_location for a scan batch: one query
+        instead of one per file.
+        """
+        if not file_ids:
+            return set()
+        id_sql, id_params = _id_list_sql(file_ids)
+        async with self._db.execute(
+            f"SELECT file_id FROM exif_data WHERE file_id IN {id_sql}"
+            " AND location_city IS NOT NULL",
+            id_params
+        ) as cursor:
+            return {row[0] for row in await cursor.fetchall()}
+    
+    @staticmethod
+    def geocode_key(latitude: float, longitude: float) -> Tuple[int, int]:
+        """Return the geocode_cache key for a coordinate.
+        
+        Coordinates with equal keys share one cache entry, so callers can use
+        it to de-duplicate lookups without rounding floats themselves.
+        """
+        return _geocode_key(latitude, longitude)
     
     async def get_geocode_cache(self, latitude: float, longitude: float) -> Optional[Dict[str, str]]:
         """Get cached geocoding data for coordinates.
@@ -645,39 +1721,96 @@ class CacheManager:
         Returns:
             Dictionary with location data or None if not cached
         """
-        from .const import GEOCODE_STATS_BATCH_SIZE
+        # Photos from one place share a key, so scans repeat the same lookups
+        key = ('geocode', *_geocode_key(latitude, longitude))
+        hit, location = self._lookup_cache_get(key)
+        if not hit:
+            changes_at_start = self._db.total_changes
+            rows = await self._reader().execute_fetchall(
+                _SELECT_GEOCODE_SQL, (key[1], key[2], _GEOCODE_PRECISION)
+            )
+            row = rows[0] if rows else None
+            location = {
+                'location_name': row[0],
+                'location_city': row[1],
+                'location_state': row[2],
+                'location_country': row[3]
+            } if row else None
+            self._lookup_cache_put(key, location, changes_at_start)
+        
+        if location is not None:
+            self._count_geocode_lookups(1, 0)
+        else:
+            self._count_geocode_lookups(0, 1)
+        return location
+    
+    def _count_geocode_lookups(self, hits: int, misses: int) -> None:
+        """Record cache lookups in memory, persisting them in the background.
         
-        async with self._db.execute("""
-            SELECT location_name, location_city, location_state, location_country
-            FROM geocode_cache
-            WHERE latitude = ? AND longitude = ? AND precision_level = ?
-        """, (round(latitude, 3), round(longitude, 3), 3)) as cursor:
-            row = await cursor.fetchone()
-            if row:
-                # Increment in-memory cache hit counter
-                self._geocode_stats_cache_hits += 1
-                self._geocode_stats_counter += 1
-                
-                # Flush to database every GEOCODE_STATS_BATCH_SIZE lookups
-                if self._geocode_stats_counter >= GEOCODE_STATS_BATCH_SIZE:
-                    await self._flush_geocode_stats()
-                
-                return {
-                    'location_name': row[0],
-                    'location_city': row[1],
-                    'location_state': row[2],
-                    'location_country': row[3]
-                }
-            else:
-                # Increment in-memory cache miss counter
-                self._geocode_stats_cache_misses += 1
-                self._geocode_stats_counter += 1
-                
-                # Flush to database every GEOCODE_STATS_BATCH_SIZE lookups
-                if self._geocode_stats_counter >= GEOCODE_STATS_BATCH_SIZE:
-                    await self._flush_geocode_stats()
-                    
-            return None
+        Lookups never wait on a database write: once _GEOCODE_STATS_BATCH_SIZE
+        lookups have accumulated a single writeback task is scheduled, and
+        close() and the end of each scan flush whatever is left.
+        """
+        self._geocode_stats_cache_hits += hits
+        self._geocode_stats_cache_misses += misses
+        self._geocode_stats_counter += hits + misses
+        if (
+            self._geocode_stats_counter >= _GEOCODE_STATS_BATCH_SIZE
+            and (self._geocode_stats_task is None or self._geocode_stats_task.done())
+        ):
+            self._geocode_stats_task = asyncio.get_running_loop().create_task(
+                self._flush_geocode_stats()
+            )
+    
+    async def get_geocode_cache_many(
+        self, coords: List[Tuple[float, float]]
+    ) -> Dict[Tuple[float, float], Dict[str, str]]:
+        """Get cached geocoding data for many coordinates at once.
+        
+        Bulk form of get_geocode_cache for a scan batch: coordinates are keyed
+        and de-duplicated in Python (photos from one place share a key), then
+        looked up with one query per few hundred distinct keys. Hit/miss stats
+        count every coordinate passed in, as per-file lookups would.
+        
+        Args:
+            coords: (latitude, longitude) pairs
+            
+        Returns:
+            Dictionary mapping each cached (latitude, longitude) pair, exactly
+            as passed in, to its location data; uncached pairs are absent
+        """
+        if not coords:
+            return {}
+        
+        keys = {coord: _geocode_key(*coord) for coord in coords}
+        distinct = list(set(keys.values()))
+        locations: Dict[Tuple[int, int], Dict[str, str]] = {}
+        # Two parameters per key; stay under SQLITE_MAX_VARIABLE_NUMBER on older builds
+        for start in range(0, len(distinct), 400):
+            chunk = distinct[start:start + 400]
+            async with self._db.execute(
+                "SELECT lat_key, lon_key, location_name, location_city, location_state,"
+                " location_country FROM geocode_cache"
+                " WHERE precision_level = ? AND (lat_key, lon_key) IN"
+                f" (VALUES {', '.join(['(?, ?)'] * len(chunk))})",
+                [_GEOCODE_PRECISION, *(value for key in chunk for value in key)]
+            ) as cursor:
+                for row in await cursor.fetchall():
+                    locations[(row[0], row[1])] = {
+                        'location_name': row[2],
+                        'location_city': row[3],
+                        'location_state': row[4],
+                        'location_country': row[5]
+                    }
+        
+        result = {
+            coord: dict(locations[key])
+            for coord, key in keys.items()
+            if key in locations
+        }
+        hits = sum(1 for coord in coords if coord in result)
+        self._count_geocode_lookups(hits, len(coords) - hits)
+        return result
     
     async def add_geocode_cache(
         self, 
@@ -692,48 +1825,56 @@ class CacheManager:
             longitude: Longitude in decimal degrees
             location_data: Dictionary with location_name, location_city, location_state, location_country
         """
-        await self._db.execute("""
-            INSERT OR REPLACE INTO geocode_cache
-            (latitude, longitude, precision_level, location_name, location_city, location_state, location_country, cached_at)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-        """, (
-            round(latitude, 3),
-            round(longitude, 3),
-            3,  # precision level (3 decimal places)
-            location_data.get('location_name', ''),
-            location_data.get('location_city', ''),
-            location_data.get('location_state', ''),
-            location_data.get('location_country', ''),
-            int(datetime.now().timestamp())
-        ))
-        
-        await self._db.commit()
+        lat_key, lon_key = _geocode_key(latitude, longitude)
+        scale = 10 ** _GEOCODE_PRECISION
+        async with self._write_lock:
+            await self._db.execute(_INSERT_GEOCODE_SQL, (
+                lat_key,
+                lon_key,
+                _GEOCODE_PRECISION,
+                lat_key / scale,
+                lon_key / scale,
+                location_data.get('location_name', ''),
+                location_data.get('location_city', ''),
+                location_data.get('location_state', ''),
+                location_data.get('location_country', ''),
+                int(time.time())
+            ))
+        
+            await self._commit()
     
     async def _flush_geocode_stats(self) -> None:
         """Flush in-memory geocoding stats counters to database.
         
-        Called automatically every GEOCODE_STATS_BATCH_SIZE lookups
-        or manually when scan completes.
+        Runs as a background task every _GEOCODE_STATS_BATCH_SIZE lookups
+        and directly when a scan completes or the database is closed.
         """
-        if self._geocode_stats_cache_hits > 0 or self._geocode_stats_cache_misses > 0:
-            await self._db.execute("""
-                UPDATE geocode_stats 
-                SET cache_hits = cache_hits + ?,
-                    cache_misses = cache_misses + ?
-                WHERE id = 1
-            """, (self._geocode_stats_cache_hits, self._geocode_stats_cache_misses))
-            await self._db.commit()
-            
-            _LOGGER.debug(
-                "Flushed geocoding stats: +%d hits, +%d misses",
-                self._geocode_stats_cache_hits,
-                self._geocode_stats_cache_misses
-            )
-            
-            # Reset counters
-            self._geocode_stats_cache_hits = 0
-            self._geocode_stats_cache_misses = 0
-            self._geocode_stats_counter = 0
+        hits = self._geocode_stats_cache_hits
+        misses = self._geocode_stats_cache_misses
+        if hits == 0 and misses == 0:
+            return
+        
+        # Take the counts before awaiting so lookups made during the write
+        # are kept for the next flush instead of being reset away
+        self._geocode_stats_cache_hits = 0
+        self._geocode_stats_cache_misses = 0
+        self._geocode_stats_counter = 0
+        try:
+            async with self._write_lock:
+                await self._db.execute("""
+                    UPDATE geocode_stats 
+                    SET cache_hits = cache_hits + ?,
+                        cache_misses = cache_misses + ?
+                    WHERE id = 1
+                """, (hits, misses))
+                await self._commit()
+        except Exception:
+            self._geocode_stats_cache_hits += hits
+            self._geocode_stats_cache_misses += misses
+            self._geocode_stats_counter += hits + misses
+            raise
+        
+        _LOGGER.debug("Flushed geocoding stats: +%d hits, +%d misses", hits, misses)
     
     async def update_exif_location(
         self,
@@ -746,19 +1887,40 @@ class CacheManager:
             file_id: ID of the file
             location_data: Dictionary with location_name, location_city, location_state, location_country
         """
-        await self._db.execute("""
-            UPDATE exif_data
-            SET location_name = ?, location_city = ?, location_state = ?, location_country = ?
-            WHERE file_id = ?
-        """, (
-            location_data.get('location_name', ''),
-            location_data.get('location_city', ''),
-            location_data.get('location_state', ''),
-            location_data.get('location_country', ''),
-            file_id
-        ))
+        async with self._write_lock:
+            await self._db.execute(_UPDATE_EXIF_LOCATION_SQL, (
+                location_data.get('location_name', ''),
+                location_data.get('location_city', ''),
+                location_data.get('location_state', ''),
+                location_data.get('location_country', ''),
+                file_id
+            ))
+        
+            await self._commit()
+    
+    async def update_exif_locations_bulk(self, updates: List[tuple]) -> None:
+        """Update location fields for many files with one executemany.
         
-        await self._db.commit()
+        Args:
+            updates: List of (file_id, location_data) tuples, location_data
+                shaped as for update_exif_location
+        """
+        if not updates:
+            return
+        
+        params = [
+            (
+                location_data.get('location_name', ''),
+                location_data.get('location_city', ''),
+                location_data.get('location_state', ''),
+                location_data.get('location_country', ''),
+                file_id,
+            )
+            for file_id, location_data in updates
+        ]
+        async with self._write_lock:
+            await self._db.executemany(_UPDATE_EXIF_LOCATION_SQL, params)
+            await self._commit()
     
     async def remove_file(self, file_path: str) -> bool:
         """Remove a file from the cache.
@@ -769,18 +1931,19 @@ class CacheManager:
         Returns:
             True if file was removed, False otherwise
         """
-        try:
-            # Remove from media_files table
-            await self._db.execute(
-                "DELETE FROM media_files WHERE path = ?",
-                (file_path,)
-            )
+        async with self._write_lock:
+            try:
+                # Remove from media_files table
+                await self._db.execute(
+                    "DELETE FROM media_files WHERE path = ?",
+                    (file_path,)
+                )
             
-            await self._db.commit()
-            return True
-        except Exception as err:
-            _LOGGER.error("Failed to remove file %s from cache: %s", file_path, err)
-            return False
+                await self._commit()
+                return True
+            except Exception as err:
+                _LOGGER.error("Failed to remove file %s from cache: %s", file_path, err)
+                return False
     
     async def record_scan(self, folder_path: str, scan_type: str) -> int:
         """Record start of scan.
@@ -792,18 +1955,16 @@ class CacheManager:
         Returns:
             Scan history ID
         """
-        await self._db.execute("""
-            INSERT INTO scan_history 
-            (folder_path, scan_type, start_time, status)
-            VALUES (?, ?, ?, 'running')
-        """, (folder_path, scan_type, int(datetime.now().timestamp())))
-        
-        await self._db.commit()
-        
-        async with self._db.execute(
-            "SELECT last_insert_rowid()"
-        ) as cursor:
-            row = await cursor.fetchone()
+        async with self._write_lock:
+            async with self._db.execute("""
+                INSERT INTO scan_history 
+                (folder_path, scan_type, start_time, status)
+                VALUES (?, ?, ?, 'running')
+                RETURNING id
+            """, (folder_path, scan_type, int(time.time()))) as cursor:
+                row = await cursor.fetchone()
+        
+            await self._commit()
             return row[0] if row else 0
     
     async def update_scan(self, scan_id: int, files_added: int = 0, 
@@ -816,19 +1977,20 @@ class CacheManager:
             files_updated: Number of files updated
             status: Final status
         """
-        await self._db.execute("""
-            UPDATE scan_history 
-            SET end_time = ?, files_added = ?, files_updated = ?, status = ?
-            WHERE id = ?
-        """, (
-            int(datetime.now().timestamp()),
-            files_added,
-            files_updated,
-            status,
-            scan_id
-        ))
+        async with self._write_lock:
+            await self._db.execute("""
+                UPDATE scan_history 
+                SET end_time = ?, files_added = ?, files_updated = ?, status = ?
+                WHERE id = ?
+            """, (
+                int(time.time()),
+                files_added,
+                files_updated,
+                status,
+                scan_id
+            ))
         
-        await self._db.commit()
+            await self._commit()
 
     async def check_and_mark_interrupted_scans(self) -> bool:
         """Check for scans interrupted by a previous HA restart or crash.
@@ -846,10 +2008,11 @@ class CacheManager:
             count = row[0] if row else 0
 
         if count > 0:
-            await self._db.execute(
-                "UPDATE scan_history SET status = 'interrupted' WHERE status = 'running'"
-            )
-            await self._db.commit()
+            async with self._write_lock:
+                await self._db.execute(
+                    "UPDATE scan_history SET status = 'interrupted' WHERE status = 'running'"
+                )
+                await self._commit()
             _LOGGER.warning(
                 "Found %d interrupted scan(s) from previous run — will resume on startup", count
             )
@@ -903,498 +2066,188 @@ class CacheManager:
             - location_name, location_city, location_country: str (if is_geocoded)
             - date_taken: timestamp (if available)
         """
-        import time
+        
+        # Shared folder/type/favorite/date/anniversary filters, built once and
+        # reused by both priority-queue queries (timestamps take precedence over dates)
+        ts_from, ts_to = _resolve_time_bounds(timestamp_from, timestamp_to, date_from, date_to)
+        filter_sql, filter_params = _file_filters(
+            folder, recursive, file_type, ts_from, ts_to,
+            anniversary_month, anniversary_day, anniversary_window_days,
+            favorites_only, auto_select_burst_favorite,
+        )
+        where = _ACTIVE_FILES_FROM + filter_sql
         
         if priority_new_files:
             # Priority queue mode: Get new files first, then fill with random
             current_time = int(time.time())
             threshold_time = current_time - new_files_threshold_seconds
             
-            # Query 1: Get newly scanned files (last_scanned > threshold)
-            new_files_query = """
-                SELECT 
-                    m.*,
-                    e.date_taken,
-                    e.latitude,
-                    e.longitude,
-                    e.location_name,
-                    e.location_city,
-                    e.location_state,
-                    e.location_country,
-                    e.is_favorited,
-                    e.burst_count,
-                    e.burst_favorites,
-                    e.camera_make,
-                    e.camera_model
-                FROM media_files m
-                LEFT JOIN exif_data e ON m.id = e.file_id
-                WHERE m.last_scanned > ?
-                  AND m.folder NOT LIKE '%/_Junk%'
-                  AND m.folder NOT LIKE '%/_Edit%'
-            """
-            params = [threshold_time]
-            
-            if folder:
-                if recursive:
-                    # Recursive: match folder and all subfolders (exact OR subpath)
-                    new_files_query += " AND (LOWER(m.folder) = LOWER(?) OR LOWER(m.folder) LIKE LOWER(?))"
-                    params.extend([folder.rstrip('/'), folder.rstrip('/') + '/%'])
-                else:
-                    # Non-recursive: exact folder match only
-                    new_files_query += " AND LOWER(m.folder) = LOWER(?)"
-                    params.append(folder)
-            
-            if file_type:
-                new_files_query += " AND m.file_type = ?"
-                params.append(file_type.lower())
-            
-            if favorites_only:
-                new_files_query += " AND e.is_favorited = 1"
-
-            if auto_select_burst_favorite:
-                # Exclude non-favorite members of burst groups that have a known favorite.
-                # Items with burst_count IS NULL are not part of any burst — returned as normal.
-                # Items in a burst group with no favorites (burst_favorites IS NULL) are also
-                # returned normally (nothing better to show).
-                new_files_query += (
-                    " AND NOT (COALESCE(e.burst_count, 0) > 0"
-                    " AND COALESCE(e.is_favorited, 0) = 0"
-                    " AND e.burst_favorites IS NOT NULL)"
-                )
-            
-            # Timestamp filtering (takes precedence over date filtering)
-            if timestamp_from is not None:
-                new_files_query += " AND COALESCE(e.date_taken, MIN(unixepoch(m.created_time), unixepoch(m.modified_time))) >= ?"
-                params.append(timestamp_from)
-            elif date_from is not None:
-                # Validate date_from is a valid date string using datetime.strptime
-                try:
-                    date_from_str = str(date_from) if not isinstance(date_from, str) else date_from
-                    # Proper validation with datetime.strptime - prevents invalid dates like 2024-13-45
-                    dt = datetime.strptime(date_from_str, "%Y-%m-%d")
-                    # Convert to Unix timestamp using server local time (matches how EXIF timestamps are stored)
-                    timestamp = int(dt.timestamp())
-                    new_files_query += " AND COALESCE(e.date_taken, MIN(unixepoch(m.created_time), unixepoch(m.modified_time))) >= ?"
-                    params.append(timestamp)
-                except (ValueError, TypeError) as e:
-                    _LOGGER.warning("Invalid date_from parameter: %s - %s", date_from, e)
-            
-            if timestamp_to is not None:
-                new_files_query += " AND COALESCE(e.date_taken, MIN(unixepoch(m.created_time), unixepoch(m.modified_time))) <= ?"
-                params.append(timestamp_to)
-            elif date_to is not None:
-                # Validate date_to is a valid date string using datetime.strptime
-                try:
-                    date_to_str = str(date_to) if not isinstance(date_to, str) else date_to
-                    # Proper validation with datetime.strptime - prevents invalid dates like 2024-13-45
-                    dt = datetime.strptime(date_to_str, "%Y-%m-%d")
-                    # Convert to Unix timestamp using server local time (end of local day = start of next day minus 1)
-                    timestamp = int((dt + timedelta(days=1)).timestamp()) - 1
-                    new_files_query += " AND COALESCE(e.date_taken, MIN(unixepoch(m.created_time), unixepoch(m.modified_time))) <= ?"
-                    params.append(timestamp)
-                except (ValueError, TypeError) as e:
-                    _LOGGER.warning("Invalid date_to parameter: %s - %s", date_to, e)
-            
-            # Anniversary filtering: Match month/day across years (supports wildcards)
-            if anniversary_month is not None or anniversary_day is not None:
-                ann_conditions = []
-                
-                # Apply window to day if specified (e.g., day 7 ±3 = days 4-10)
-                if anniversary_day and anniversary_day != "*":
-                    try:
-                        day_int = int(anniversary_day)
-                        if anniversary_window_days > 0:
-                            # Generate day range with window
-                            day_min = max(1, day_int - anniversary_window_days)
-                            day_max = min(31, day_int + anniversary_window_days)
-                            ann_conditions.append("CAST(strftime('%d', COALESCE(e.date_taken, MIN(unixepoch(m.created_time), unixepoch(m.modified_time))), 'unixepoch', 'localtime') AS INTEGER) BETWEEN ? AND ?")
-                            params.extend([day_min, day_max])
-                        else:
-                            # Exact day match
-                            ann_conditions.append("CAST(strftime('%d', COALESCE(e.date_taken, MIN(unixepoch(m.created_time), unixepoch(m.modified_time))), 'unixepoch', 'localtime') AS INTEGER) = ?")
-                            params.append(day_int)
-                    except ValueError:
-                        _LOGGER.warning("Invalid anniversary_day parameter: %s", anniversary_day)
-                # else: wildcard "*" means any day - no condition added
-                
-                # Month matching (no window for month)
-                if anniversary_month and anniversary_month != "*":
-                    try:
-                        month_int = int(anniversary_month)
-                        ann_conditions.append("CAST(strftime('%m', COALESCE(e.date_taken, MIN(unixepoch(m.created_time), unixepoch(m.modified_time))), 'unixepoch', 'localtime') AS INTEGER) = ?")
-                        params.append(month_int)
-                    except ValueError:
-                        _LOGGER.warning("Invalid anniversary_month parameter: %s", anniversary_month)
-                # else: wildcard "*" means any month - no condition added
-                
-                if ann_conditions:
-                    new_files_query += " AND (" + " AND ".join(ann_conditions) + ")"
-            
-            # V5 IMPROVEMENT: Get ALL recent files, then randomly sample
-            # This ensures even distribution - all recent files have equal chance
-            # Fixes "last 20" problem where only first 20 recent files were returned
-            new_files_query += " ORDER BY m.last_scanned DESC"
-            # Note: No LIMIT here - we get all recent files, then sample below
-            
-            # Debug logging removed to prevent excessive logs during slideshow
-            
-            async with self._db.execute(new_files_query, tuple(params)) as cursor:
-                new_files_rows = await cursor.fetchall()
-            
-            all_new_files = [dict(row) for row in new_files_rows]
-            # Debug: Found X total recent files (logging removed)
-            
-            # Randomly sample from recent files (up to count requested)
-            import random
-            if len(all_new_files) > count:
-                new_files = random.sample(all_new_files, count)
-                # Debug: Randomly sampled X from Y recent files (logging removed)
-            else:
-                new_files = all_new_files
+            # Query 1: Get newly scanned files (last_scanned > threshold)
+            # V5 IMPROVEMENT: Randomly sample across ALL recent files
+            # This ensures even distribution - all recent files have equal chance
+            # Fixes "last 20" problem where only first 20 recent files were returned
+            # Sampling happens inside SQLite so discarded rows are never marshalled
+            new_files = await self._order_by_random(
+                self._reader(),
+                where + " AND m.last_scanned > ?",
+                [*filter_params, threshold_time],
+                int(count),
+            )
+            # Debug: Randomly sampled X recent files (logging removed)
             
-            # Query 2: Fill remaining slots with random non-recent files
+            # Query 2: Fill remaining slots with random non-recent files.
+            # Getting fewer than count recent files means all of them were taken,
+            # so "not already selected" is just last_scanned <= threshold. Goes
+            # through the batcher like standard mode, so cards refreshing together
+            # (same filters, same second) share one sample.
             remaining = count - len(new_files)
             if remaining > 0:
-                exclude_ids = [f['id'] for f in new_files]
-                random_files = await self._get_random_excluding(
-                    count=remaining,
-                    exclude_ids=exclude_ids,
-                    folder=folder,
-                    recursive=recursive,
-                    file_type=file_type,
-                    date_from=date_from,
-                    date_to=date_to,
-                    timestamp_from=timestamp_from,
-                    timestamp_to=timestamp_to,
-                    anniversary_month=anniversary_month,
-                    anniversary_day=anniversary_day,
-                    anniversary_window_days=anniversary_window_days,
-                    favorites_only=favorites_only,
-                    auto_select_burst_favorite=auto_select_burst_favorite
+                random_files = await self._random_batcher.get(
+                    (where + " AND m.last_scanned <= ?", (*filter_params, threshold_time)),
+                    int(remaining),
                 )
                 result = new_files + random_files
             else:
                 result = new_files[:count]
             
-            # Add geocoding status flags
-            for item in result:
-                item['has_coordinates'] = item.get('latitude') is not None and item.get('longitude') is not None
-                item['is_geocoded'] = item.get('location_city') is not None
-            
             # Debug: Priority queue returned X new files + Y random files (logging removed)
             return result
         
-        else:
-            # Standard random mode (backward compatible)
-            query = """
-                SELECT 
-                    m.*,
-                    e.date_taken,
-                    e.latitude,
-                    e.longitude,
-                    e.location_name,
-                    e.location_city,
-                    e.location_state,
-                    e.location_country,
-                    e.is_favorited,
-                    e.burst_count,
-                    e.burst_favorites,
-                    e.camera_make,
-                    e.camera_model
-                FROM media_files m
-                LEFT JOIN exif_data e ON m.id = e.file_id
-                WHERE 1=1
-                    AND m.folder NOT LIKE '%/_Junk%'
-                    AND m.folder NOT LIKE '%/_Edit%'
-            """
-            params = []
-            
-            if folder:
-                # Use case-insensitive matching for folder paths (handles /media/Photo vs /media/photo)
-                if recursive:
-                    # Recursive: match folder and all subfolders (exact OR subpath)
-                    query += " AND (LOWER(m.folder) = LOWER(?) OR LOWER(m.folder) LIKE LOWER(?))"
-                    params.extend([folder.rstrip('/'), folder.rstrip('/') + '/%'])
-                else:
-                    # Non-recursive: exact folder match only
-                    query += " AND LOWER(m.folder) = LOWER(?)"
-                    params.append(folder)
-            
-            if file_type:
-                query += " AND m.file_type = ?"
-                params.append(file_type.lower())
-            
-            if favorites_only:
-                query += " AND e.is_favorited = 1"
-
-            if auto_select_burst_favorite:
-                # Exclude non-favorite members of burst groups that have a known favorite.
-                # Items with burst_count IS NULL are not part of any burst — returned as normal.
-                # Items in a burst group with no favorites (burst_favorites IS NULL) are also
-                # returned normally (nothing better to show).
-                query += (
-                    " AND NOT (COALESCE(e.burst_count, 0) > 0"
-                    " AND COALESCE(e.is_favorited, 0) = 0"
-                    " AND e.burst_favorites IS NOT NULL)"
+        # Standard random mode (backward compatible)
+        # Debug logging removed to prevent excessive logs during slideshow
+        return await self._random_batcher.get((where, tuple(filter_params)), int(count))
+    
+    async def _sample_random_files(self, where: str, params: list, count: int) -> list[dict]:
+        """Return up to count random rows of a filtered file query.
+        
+        ORDER BY RANDOM() draws a key for every matching row and sorts them all,
+        which grows with the library. Instead, probe random ids across the id range
+        and let the query's own filters reject misses; each probe is a primary key
+        lookup. When probing comes up short (small library, sparse ids, or a very
+        selective filter) the remainder falls back to _order_by_random.
+        
+        Args:
+            where: FROM media_files m LEFT JOIN exif_data e ... WHERE conditions
+            params: Parameters for where
+            count: Number of rows wanted
+        """
+        count = int(count)
+        if count <= 0:
+            return []
+        
+        # Pure reads: a reader connection unless the writer holds uncommitted rows
+        db = self._reader()
+        min_id, max_id = (await db.execute_fetchall("SELECT MIN(id), MAX(id) FROM media_files"))[0]
+        if min_id is None:
+            return []
+        
+        # Probe hits stay raw rows (id first) until the sample is drawn
+        found: dict[int, Any] = {}
+        span = max_id - min_id + 1
+        if span >= _RANDOM_PROBE_MIN_SPAN:
+            tried: set[int] = set()
+            for _ in range(_RANDOM_PROBE_ROUNDS):
+                wanted = (count - len(found)) * _RANDOM_PROBE_OVERSAMPLE
+                probe = [
+                    file_id
+                    for file_id in random.sample(range(min_id, max_id + 1), min(wanted, span))
+                    if file_id not in tried
+                ]
+                tried.update(probe)
+                if not probe:
+                    break
+                id_sql, id_params = _id_list_sql(probe)
+                rows = await db.execute_fetchall(
+                    f"SELECT {_FILE_ROW_COLUMNS} {where} AND m.id IN {id_sql}",
+                    (*params, *id_params)
                 )
-            
-            # Timestamp filtering (takes precedence over date filtering)
-            if timestamp_from is not None:
-                query += " AND COALESCE(e.date_taken, MIN(unixepoch(m.created_time), unixepoch(m.modified_time))) >= ?"
-                params.append(timestamp_from)
-            elif date_from is not None:
-                # Validate date_from is a valid date string using datetime.strptime
-                try:
-                    date_from_str = str(date_from) if not isinstance(date_from, str) else date_from
-                    # Proper validation with datetime.strptime - prevents invalid dates like 2024-13-45
-                    dt = datetime.strptime(date_from_str, "%Y-%m-%d")
-                    # Convert to Unix timestamp using server local time (matches how EXIF timestamps are stored)
-                    timestamp = int(dt.timestamp())
-                    query += " AND COALESCE(e.date_taken, MIN(unixepoch(m.created_time), unixepoch(m.modified_time))) >= ?"
-                    params.append(timestamp)
-                except (ValueError, TypeError) as e:
-                    _LOGGER.warning("Invalid date_from parameter: %s - %s", date_from, e)
-            
-            if timestamp_to is not None:
-                query += " AND COALESCE(e.date_taken, MIN(unixepoch(m.created_time), unixepoch(m.modified_time))) <= ?"
-                params.append(timestamp_to)
-            elif date_to is not None:
-                # Validate date_to is a valid date string using datetime.strptime
-                try:
-                    date_to_str = str(date_to) if not isinstance(date_to, str) else date_to
-                    # Proper validation with datetime.strptime - prevents invalid dates like 2024-13-45
-                    dt = datetime.strptime(date_to_str, "%Y-%m-%d")
-                    # Convert to Unix timestamp using server local time (end of local day = start of next day minus 1)
-                    timestamp = int((dt + timedelta(days=1)).timestamp()) - 1
-                    query += " AND COALESCE(e.date_taken, MIN(unixepoch(m.created_time), unixepoch(m.modified_time))) <= ?"
-                    params.append(timestamp)
-                except (ValueError, TypeError) as e:
-                    _LOGGER.warning("Invalid date_to parameter: %s - %s", date_to, e)
-            
-            # Anniversary filtering: Match month/day across years (supports wildcards)
-            if anniversary_month is not None or anniversary_day is not None:
-                ann_conditions = []
-                
-                # Apply window to day if specified (e.g., day 7 ±3 = days 4-10)
-                if anniversary_day and anniversary_day != "*":
-                    try:
-                        day_int = int(anniversary_day)
-                        if anniversary_window_days > 0:
-                            # Generate day range with window
-                            day_min = max(1, day_int - anniversary_window_days)
-                            day_max = min(31, day_int + anniversary_window_days)
-                            ann_conditions.append("CAST(strftime('%d', COALESCE(e.date_taken, MIN(unixepoch(m.created_time), unixepoch(m.modified_time))), 'unixepoch', 'localtime') AS INTEGER) BETWEEN ? AND ?")
-                            params.extend([day_min, day_max])
-                        else:
-                            # Exact day match
-                            ann_conditions.append("CAST(strftime('%d', COALESCE(e.date_taken, MIN(unixepoch(m.created_time), unixepoch(m.modified_time))), 'unixepoch', 'localtime') AS INTEGER) = ?")
-                            params.append(day_int)
-                    except ValueError:
-                        _LOGGER.warning("Invalid anniversary_day parameter: %s", anniversary_day)
-                # else: wildcard "*" means any day - no condition added
-                
-                # Month matching (no window for month)
-                if anniversary_month and anniversary_month != "*":
-                    try:
-                        month_int = int(anniversary_month)
-                        ann_conditions.append("CAST(strftime('%m', COALESCE(e.date_taken, MIN(unixepoch(m.created_time), unixepoch(m.modified_time))), 'unixepoch', 'localtime') AS INTEGER) = ?")
-                        params.append(month_int)
-                    except ValueError:
-                        _LOGGER.warning("Invalid anniversary_month parameter: %s", anniversary_month)
-                # else: wildcard "*" means any month - no condition added
-                
-                if ann_conditions:
-                    query += " AND (" + " AND ".join(ann_conditions) + ")"
-            
-            query += " ORDER BY RANDOM() LIMIT ?"
-            params.append(int(count))
-            
-            # Debug logging removed to prevent excessive logs during slideshow
-            
-            async with self._db.execute(query, tuple(params)) as cursor:
-                rows = await cursor.fetchall()
-            
-            # Convert rows to dicts and add geocoding status
-            result = []
-            for row in rows:
-                item = dict(row)
-                # Add progressive geocoding flags
-                item['has_coordinates'] = item.get('latitude') is not None and item.get('longitude') is not None
-                item['is_geocoded'] = item.get('location_city') is not None
-                result.append(item)
-            
-            return result
+                if rows:
+                    to_dict = _file_row_converter(rows[0].keys())
+                for row in rows:
+                    found[row[0]] = row
+                if len(found) >= count:
+                    # Sample before converting so only returned rows become dicts
+                    return [to_dict(row) for row in random.sample(list(found.values()), count)]
+        
+        # Probing came up short: keep every hit and draw the rest by sorting
+        result = [to_dict(row) for row in found.values()] if found else []
+        fallback_where = where
+        fallback_params = list(params)
+        if found:
+            id_sql, id_params = _id_list_sql(found)
+            fallback_where += f" AND m.id NOT IN {id_sql}"
+            fallback_params.extend(id_params)
+        result.extend(await self._order_by_random(
+            db, fallback_where, fallback_params, count - len(found)
+        ))
+        
+        # IN (...) returns rows in id order
+        random.shuffle(result)
+        return result
+    
+    async def _order_by_random(
+        self, db: aiosqlite.Connection, where: str, params: list, count: int
+    ) -> list[dict]:
+        """Return up to count random rows matching where, via ORDER BY RANDOM().
+        
+        Only ids go through the sort: SQLite builds a sorter record for every
+        matching row before LIMIT discards it, so sorting full result rows would
+        assemble every column of the whole match set. The chosen ids are then
+        read by primary key.
+        """
+        rows = await db.execute_fetchall(f"""
+            SELECT {_FILE_ROW_COLUMNS}
+            FROM media_files m
+            LEFT JOIN exif_data e ON m.id = e.file_id
+            WHERE m.id IN (SELECT m.id {where} ORDER BY RANDOM() LIMIT ?)
+        """, (*params, count))
+        if not rows:
+            return []
+        to_dict = _file_row_converter(rows[0].keys())
+        result = [to_dict(row) for row in rows]
+        # IN (...) returns rows in id order
+        random.shuffle(result)
+        return result
     
-    async def _get_random_excluding(
+    async def get_ordered_files(
         self,
-        count: int,
-        exclude_ids: list[int],
+        count: int = 50,
         folder: str | None = None,
         recursive: bool = True,
         file_type: str | None = None,
+        order_by: str = "date_taken",
+        order_direction: str = "desc",
+        after_value: str | int | float | None = None,
+        after_id: int | None = None,
         date_from: str | None = None,
         date_to: str | None = None,
         timestamp_from: int | None = None,
         timestamp_to: int | None = None,
-        anniversary_month: str | None = None,
-        anniversary_day: str | None = None,
-        anniversary_window_days: int = 0,
-        favorites_only: bool = False,
-        auto_select_burst_favorite: bool = False
     ) -> list[dict]:
-        """Get random files excluding specified IDs (helper for priority queue).
+        """Get ordered media files as a list (see iter_ordered_files for the arguments).
         
-        Args:
-            count: Number of files to return
-            exclude_ids: List of file IDs to exclude
-            folder: Optional folder filter
-            recursive: If False, only match exact folder (no subfolders)
-            file_type: Optional file type filter
-            date_from: Optional date from filter
-            date_to: Optional date to filter
-            timestamp_from: Optional timestamp from filter (takes precedence)
-            timestamp_to: Optional timestamp to filter (takes precedence)
-            anniversary_month: Filter by month (1-12) or "*" for any
-            anniversary_day: Filter by day (1-31) or "*" for any
-            anniversary_window_days: Expand anniversary match by ±N days
-            
         Returns:
-            List of random file records excluding specified IDs
-        """
-        query = """
-            SELECT 
-                m.*,
-                e.date_taken,
-                e.latitude,
-                e.longitude,
-                e.location_name,
-                e.location_city,
-                e.location_state,
-                e.location_country,
-                e.is_favorited,
-                e.camera_make,
-                e.camera_model
-            FROM media_files m
-            LEFT JOIN exif_data e ON m.id = e.file_id
-            WHERE 1=1
-              AND m.folder NOT LIKE '%/_Junk%'
-              AND m.folder NOT LIKE '%/_Edit%'
+            List of ordered file records with metadata
         """
-        params = []
-        
-        # Exclude new files already selected
-        if exclude_ids:
-            # Ensure only integers are used in exclude_ids
-            safe_exclude_ids = [int(x) for x in exclude_ids if isinstance(x, int) or (isinstance(x, str) and x.isdigit())]
-            if len(safe_exclude_ids) != len(exclude_ids):
-                _LOGGER.warning("Some exclude_ids were not integers and have been ignored: %s", set(exclude_ids) - set(safe_exclude_ids))
-            if safe_exclude_ids:
-                placeholders = ','.join('?' * len(safe_exclude_ids))
-                query += f" AND m.id NOT IN ({placeholders})"
-                params.extend(safe_exclude_ids)
-        
-        if folder:
-            if recursive:
-                # Recursive: match folder and all subfolders (exact OR subpath)
-                query += " AND (LOWER(m.folder) = LOWER(?) OR LOWER(m.folder) LIKE LOWER(?))"
-                params.extend([folder.rstrip('/'), folder.rstrip('/') + '/%'])
-            else:
-                # Non-recursive: exact folder match only
-                query += " AND LOWER(m.folder) = LOWER(?)"
-                params.append(folder)
-        
-        if file_type:
-            query += " AND m.file_type = ?"
-            params.append(file_type.lower())
-        
-        if favorites_only:
-            query += " AND e.is_favorited = 1"
-
-        if auto_select_burst_favorite:
-            query += (
-                " AND NOT (COALESCE(e.burst_count, 0) > 0"
-                " AND COALESCE(e.is_favorited, 0) = 0"
-                " AND e.burst_favorites IS NOT NULL)"
+        return [
+            item
+            async for item in self.iter_ordered_files(
+                count=count,
+                folder=folder,
+                recursive=recursive,
+                file_type=file_type,
+                order_by=order_by,
+                order_direction=order_direction,
+                after_value=after_value,
+                after_id=after_id,
+                date_from=date_from,
+                date_to=date_to,
+                timestamp_from=timestamp_from,
+                timestamp_to=timestamp_to,
             )
-        
-        # Timestamp filtering (takes precedence over date filtering)
-        if timestamp_from is not None:
-            query += " AND COALESCE(e.date_taken, MIN(unixepoch(m.created_time), unixepoch(m.modified_time))) >= ?"
-            params.append(timestamp_from)
-        elif date_from is not None:
-            # Validate date_from is a valid date string
-            try:
-                date_from_str = str(date_from) if not isinstance(date_from, str) else date_from
-                dt = datetime.strptime(date_from_str, "%Y-%m-%d")
-                # Convert to Unix timestamp using server local time (matches how EXIF timestamps are stored)
-                timestamp = int(dt.timestamp())
-                query += " AND COALESCE(e.date_taken, MIN(unixepoch(m.created_time), unixepoch(m.modified_time))) >= ?"
-                params.append(timestamp)
-            except (ValueError, TypeError) as e:
-                _LOGGER.warning("Invalid date_from parameter: %s - %s", date_from, e)
-        
-        if timestamp_to is not None:
-            query += " AND COALESCE(e.date_taken, MIN(unixepoch(m.created_time), unixepoch(m.modified_time))) <= ?"
-            params.append(timestamp_to)
-        elif date_to is not None:
-            # Validate date_to is a valid date string
-            try:
-                date_to_str = str(date_to) if not isinstance(date_to, str) else date_to
-                dt = datetime.strptime(date_to_str, "%Y-%m-%d")
-                # Convert to Unix timestamp using server local time (end of local day = start of next day minus 1)
-                timestamp = int((dt + timedelta(days=1)).timestamp()) - 1
-                query += " AND COALESCE(e.date_taken, MIN(unixepoch(m.created_time), unixepoch(m.modified_time))) <= ?"
-                params.append(timestamp)
-            except (ValueError, TypeError) as e:
-                _LOGGER.warning("Invalid date_to parameter: %s - %s", date_to, e)
-        
-        # Anniversary filtering: Match month/day across years (supports wildcards)
-        if anniversary_month is not None or anniversary_day is not None:
-            ann_conditions = []
-            
-            # Apply window to day if specified
-            if anniversary_day and anniversary_day != "*":
-                try:
-                    day_int = int(anniversary_day)
-                    if anniversary_window_days > 0:
-                        day_min = max(1, day_int - anniversary_window_days)
-                        day_max = min(31, day_int + anniversary_window_days)
-                        ann_conditions.append("CAST(strftime('%d', COALESCE(e.date_taken, MIN(unixepoch(m.created_time), unixepoch(m.modified_time))), 'unixepoch', 'localtime') AS INTEGER) BETWEEN ? AND ?")
-                        params.extend([day_min, day_max])
-                    else:
-                        ann_conditions.append("CAST(strftime('%d', COALESCE(e.date_taken, MIN(unixepoch(m.created_time), unixepoch(m.modified_time))), 'unixepoch', 'localtime') AS INTEGER) = ?")
-                        params.append(day_int)
-                except ValueError:
-                    _LOGGER.warning("Invalid anniversary_day parameter: %s", anniversary_day)
-            
-            # Month matching (no window for month)
-            if anniversary_month and anniversary_month != "*":
-                try:
-                    month_int = int(anniversary_month)
-                    ann_conditions.append("CAST(strftime('%m', COALESCE(e.date_taken, MIN(unixepoch(m.created_time), unixepoch(m.modified_time))), 'unixepoch', 'localtime') AS INTEGER) = ?")
-                    params.append(month_int)
-                except ValueError:
-                    _LOGGER.warning("Invalid anniversary_month parameter: %s", anniversary_month)
-            
-            if ann_conditions:
-                query += " AND (" + " AND ".join(ann_conditions) + ")"
-        
-        query += " ORDER BY RANDOM() LIMIT ?"
-        params.append(int(count))
-        
-        async with self._db.execute(query, tuple(params)) as cursor:
-            rows = await cursor.fetchall()
-        
-        result = []
-        for row in rows:
-            item = dict(row)
-            item['has_coordinates'] = item.get('latitude') is not None and item.get('longitude') is not None
-            item['is_geocoded'] = item.get('location_city') is not None
-            result.append(item)
-        
-        return result
+        ]
     
-    async def get_ordered_files(
+    async def iter_ordered_files(
         self,
         count: int = 50,
         folder: str | None = None,
@@ -1408,10 +2261,12 @@ class CacheManager:
         date_to: str | None = None,
         timestamp_from: int | None = None,
         timestamp_to: int | None = None,
-    ) -> list[dict]:
-        """Get ordered media files with configurable sort field and direction.
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Stream ordered media files with configurable sort field and direction.
         
-        Recursive mode sorts across ALL files regardless of folder boundaries.
+        Rows are pulled _FETCH_CHUNK_SIZE at a time, so a large count never
+        materializes the whole result at once. Recursive mode sorts across ALL
+        files regardless of folder boundaries.
         
         Args:
             count: Maximum number of files to return
@@ -1427,123 +2282,51 @@ class CacheManager:
             timestamp_from: Filter by timestamp >= this value (Unix timestamp in seconds). Takes precedence over date_from.
             timestamp_to: Filter by timestamp <= this value (Unix timestamp in seconds). Takes precedence over date_to.
             
-        Returns:
-            List of ordered file records with metadata
-        """
-        query = """
-            SELECT 
-                m.*,
-                e.date_taken,
-                e.latitude,
-                e.longitude,
-                e.location_name,
-                e.location_city,
-                e.location_state,
-                e.location_country,
-                e.is_favorited,
-                e.camera_make,
-                e.camera_model
-            FROM media_files m
-            LEFT JOIN exif_data e ON m.id = e.file_id
-            WHERE 1=1
-              AND m.folder NOT LIKE '%/_Junk%'
-              AND m.folder NOT LIKE '%/_Edit%'
+        Yields:
+            Ordered file records with metadata
         """
-        params = []
-        
-        if folder:
-            if recursive:
-                # Include subfolders (exact OR subpath)
-                query += " AND (LOWER(m.folder) = LOWER(?) OR LOWER(m.folder) LIKE LOWER(?))"
-                params.extend([folder.rstrip('/'), folder.rstrip('/') + '/%'])
-            else:
-                # Exact folder match only
-                query += " AND LOWER(m.folder) = LOWER(?)"
-                params.append(folder)
-        
-        if file_type:
-            query += " AND m.file_type = ?"
-            params.append(file_type.lower())
-        
         # Date range filtering
-        if timestamp_from is not None:
-            query += " AND COALESCE(e.date_taken, MIN(unixepoch(m.created_time), unixepoch(m.modified_time))) >= ?"
-            params.append(timestamp_from)
-        elif date_from is not None:
-            try:
-                date_from_str = str(date_from) if not isinstance(date_from, str) else date_from
-                dt = datetime.strptime(date_from_str, "%Y-%m-%d")
-                timestamp = int(dt.timestamp())
-                query += " AND COALESCE(e.date_taken, MIN(unixepoch(m.created_time), unixepoch(m.modified_time))) >= ?"
-                params.append(timestamp)
-            except (ValueError, TypeError) as e:
-                _LOGGER.warning("Invalid date_from parameter: %s - %s", date_from, e)
-        
-        if timestamp_to is not None:
-            query += " AND COALESCE(e.date_taken, MIN(unixepoch(m.created_time), unixepoch(m.modified_time))) <= ?"
-            params.append(timestamp_to)
-        elif date_to is not None:
-            try:
-                date_to_str = str(date_to) if not isinstance(date_to, str) else date_to
-                dt = datetime.strptime(date_to_str, "%Y-%m-%d")
-                timestamp = int((dt + timedelta(days=1)).timestamp()) - 1
-                query += " AND COALESCE(e.date_taken, MIN(unixepoch(m.created_time), unixepoch(m.modified_time))) <= ?"
-                params.append(timestamp)
-            except (ValueError, TypeError) as e:
-                _LOGGER.warning("Invalid date_to parameter: %s - %s", date_to, e)
-        
-        # Use explicit whitelist mapping for sort fields and directions
-        allowed_sort_fields = {
-            "date_taken": "COALESCE(e.date_taken, MIN(unixepoch(m.created_time), unixepoch(m.modified_time)))",
-            "filename": "m.filename",
-            "path": "m.folder || '/' || m.filename",
-            "modified_time": "unixepoch(m.modified_time)",
-        }
-        allowed_directions = {
-            "asc": "ASC",
-            "desc": "DESC",
-        }
-        sort_field = allowed_sort_fields.get(order_by, "COALESCE(e.date_taken, MIN(unixepoch(m.created_time), unixepoch(m.modified_time)))")
-        direction = allowed_directions.get(order_direction.lower(), "DESC")
+        ts_from, ts_to = _resolve_time_bounds(timestamp_from, timestamp_to, date_from, date_to)
+        filter_sql, params = _file_filters(folder, recursive, file_type, ts_from, ts_to)
         
-        # v1.5.10: Compound cursor pagination using (sort_field, id)
-        # This handles cases where multiple files have the same date_taken
+        direction = "ASC" if order_direction.lower() == "asc" else "DESC"
+        cursor_mode = None
         if after_value is not None:
             if after_id is not None:
-                # Compound cursor: items where (sort_field < after_value) OR (sort_field = after_value AND id < after_id)
-                # This ensures we skip items we've already seen even with duplicate sort values
-                if direction == "DESC":
-                    query += f" AND (({sort_field} < ?) OR ({sort_field} = ? AND m.id < ?))"
-                    params.extend([after_value, after_value, after_id])
-                else:
-                    query += f" AND (({sort_field} > ?) OR ({sort_field} = ? AND m.id > ?))"
-                    params.extend([after_value, after_value, after_id])
+                cursor_mode = "compound"
+                params.extend([after_value, after_value, after_id])
             else:
-                # Fallback to simple cursor if no after_id provided
-                if direction == "DESC":
-                    query += f" AND {sort_field} < ?"
-                else:
-                    query += f" AND {sort_field} > ?"
+                cursor_mode = "simple"
                 params.append(after_value)
-        
-        # Order by sort_field, then by id for stable ordering
-        query += f" ORDER BY {sort_field} {direction}, m.id {direction} LIMIT ?"
         params.append(int(count))
+        query = _ordered_files_sql(filter_sql, order_by, direction, cursor_mode)
         
         # Debug logging removed to prevent excessive logs during slideshow
         
-        async with self._db.execute(query, tuple(params)) as cursor:
-            rows = await cursor.fetchall()
-        
-        # Convert rows to dicts and add geocoding status
-        result = []
-        for row in rows:
-            item = dict(row)
-            item['has_coordinates'] = item.get('latitude') is not None and item.get('longitude') is not None
-            item['is_geocoded'] = item.get('location_city') is not None
-            result.append(item)
-        
-        return result
+        async with self._reader().execute(query, tuple(params)) as cursor:
+            to_dict = _file_dict_factory(cursor)
+            while rows := await cursor.fetchmany(_FETCH_CHUNK_SIZE):
+                for row in rows:
+                    yield to_dict(row)
+    
+    def _lookup_cache_get(self, key: tuple) -> Tuple[bool, Optional[dict]]:
+        """Return (hit, record) from the lookup cache, clearing it after any write."""
+        if self._db.total_changes != self._lookup_changes:
+            self._lookup_cache.clear()
+            self._lookup_changes = self._db.total_changes
+            return False, None
+        if key not in self._lookup_cache:
+            return False, None
+        self._lookup_cache.move_to_end(key)
+        return True, _copy_record(self._lookup_cache[key])
+    
+    def _lookup_cache_put(self, key: tuple, record: Optional[dict], changes_at_start: int) -> None:
+        """Cache a lookup result unless a write landed while it was being read."""
+        if changes_at_start != self._db.total_changes or changes_at_start != self._lookup_changes:
+            return
+        self._lookup_cache[key] = _copy_record(record)
+        if len(self._lookup_cache) > _LOOKUP_CACHE_SIZE:
+            self._lookup_cache.popitem(last=False)
     
     async def get_file_by_path(self, file_path: str) -> dict | None:
         """Get file metadata by full path.
@@ -1554,30 +2337,26 @@ class CacheManager:
         Returns:
             File record with metadata, or None if not found
         """
-        async with self._db.execute(
-            "SELECT * FROM media_files WHERE path = ?",
-            (file_path,)
-        ) as cursor:
-            row = await cursor.fetchone()
-        
-        if not row:
+        # Slideshows look up the same few files over and over between writes
+        hit, cached = self._lookup_cache_get(('path', file_path))
+        if hit:
+            return cached
+        changes_at_start = self._db.total_changes
+        
+        rows = await self._reader().execute_fetchall(_SELECT_FILE_WITH_EXIF_SQL, (file_path,))
+        if not rows:
+            self._lookup_cache_put(('path', file_path), None, changes_at_start)
             return None
+        row = rows[0]
+        columns = row.keys()
         
-        # Get base file data
-        file_data = dict(row)
-        
-        # Get EXIF data if available (join via file_id)
-        async with self._db.execute(
-            """SELECT e.* FROM exif_data e 
-               JOIN media_files m ON e.file_id = m.id 
-               WHERE m.path = ?""",
-            (file_path,)
-        ) as cursor:
-            exif_row = await cursor.fetchone()
-        
-        if exif_row:
-            file_data['exif'] = dict(exif_row)
+        # Split the joined row at the marker: base file data, then EXIF if present
+        split = columns.index('exif_file_id')
+        file_data = dict(zip(columns[:split], row[:split]))
+        if row[split] is not None:
+            file_data['exif'] = dict(zip(columns[split + 1:], row[split + 1:]))
         
+        self._lookup_cache_put(('path', file_path), file_data, changes_at_start)
         return file_data
 
     async def get_burst_photos_by_burst_id(
@@ -1626,9 +2405,7 @@ class CacheManager:
             WHERE e.burst_id = ?
             ORDER BY e.date_taken {order}
         """
-        async with self._db.execute(query, [reference_date_taken, burst_id]) as cursor:
-            rows = await cursor.fetchall()
-        result = [dict(row) for row in rows]
+        result = _row_dicts(await self._reader().execute_fetchall(query, [reference_date_taken, burst_id]))
         _LOGGER.debug(
             "get_burst_photos_by_burst_id: burst_id=%s, found %d photos", burst_id, len(result)
         )
@@ -1684,7 +2461,7 @@ class CacheManager:
         reference_longitude = exif_data.get('longitude')
         use_location = bool(reference_latitude is not None and reference_longitude is not None and prefer_same_location)
 
-        _LOGGER.info(
+        _LOGGER.debug(
             "Burst detection: ref_date=%s, location_present=%s, window=%ds",
             reference_date_taken, use_location, time_window_seconds
         )
@@ -1714,13 +2491,16 @@ class CacheManager:
                 (e.date_taken - ?) AS seconds_offset
         """
 
+        # Great-circle distance from the reference; its trig terms are bound as
+        # constants (cos/sin of the reference latitude, its longitude in radians)
+        distance_sql = """(6371000 * acos(
+                    ? * cos(radians(e.latitude)) *
+                    cos(radians(e.longitude) - ?) +
+                    ? * sin(radians(e.latitude))
+                ))"""
         if use_location:
-            base_query += """,
-                (6371000 * acos(
-                    cos(radians(?)) * cos(radians(e.latitude)) *
-                    cos(radians(e.longitude) - radians(?)) +
-                    sin(radians(?)) * sin(radians(e.latitude))
-                )) AS distance_meters
+            base_query += f""",
+                {distance_sql} AS distance_meters
             """
 
         base_query += """
@@ -1731,13 +2511,20 @@ class CacheManager:
         """
 
         if use_location:
-            base_query += """
-              AND (6371000 * acos(
-                  cos(radians(?)) * cos(radians(e.latitude)) *
-                  cos(radians(e.longitude) - radians(?)) +
-                  sin(radians(?)) * sin(radians(e.latitude))
-              )) <= ?
+            # The bounding box rejects far-away rows with plain comparisons, so
+            # the trig only runs for photos already within the tolerance square
+            base_query += f"""
+              AND e.latitude BETWEEN ? AND ?
+              AND e.longitude BETWEEN ? AND ?
+              AND {distance_sql} <= ?
             """
+            ref_lat = math.radians(reference_latitude)
+            distance_params = [
+                math.cos(ref_lat), math.radians(reference_longitude), math.sin(ref_lat)
+            ]
+            box_params = _bounding_box(
+                reference_latitude, reference_longitude, location_tolerance_meters
+            )
 
         if sort_order == "time_desc":
             base_query += " ORDER BY e.date_taken DESC"
@@ -1751,30 +2538,27 @@ class CacheManager:
         found_paths: set = set()
         result_rows: list = []
         max_iterations = 20
+        db = self._reader()
 
         for iteration in range(max_iterations):
             # seconds_offset anchor is always the original reference
             params = [reference_date_taken]
             if use_location:
-                params.extend([reference_latitude, reference_longitude, reference_latitude])
+                params.extend(distance_params)
             params.extend([range_min, range_max])
             if use_location:
-                params.extend([
-                    reference_latitude,
-                    reference_longitude,
-                    reference_latitude,
-                    location_tolerance_meters
-                ])
+                params.extend(box_params)
+                params.extend(distance_params)
+                params.append(location_tolerance_meters)
 
             _LOGGER.debug(
                 "Burst query iteration %d: range=[%s, %s]",
                 iteration + 1, range_min, range_max
             )
-            async with self._db.execute(base_query, params) as cursor:
-                rows = await cursor.fetchall()
-
-            row_dicts = [dict(row) for row in rows]
-            new_paths = {r['path'] for r in row_dicts} - found_paths
+            # Rows stay aiosqlite.Row until the search converges; only the
+            # final set is converted to dicts
+            rows = await db.execute_fetchall(base_query, params)
+            new_paths = {r['path'] for r in rows} - found_paths
 
             if not new_paths:
                 _LOGGER.debug(
@@ -1785,9 +2569,9 @@ class CacheManager:
 
             # Absorb the newly found photos and widen the search range
             found_paths |= new_paths
-            result_rows = row_dicts
+            result_rows = rows
 
-            all_times = [r['date_taken'] for r in row_dicts if r.get('date_taken')]
+            all_times = [r['date_taken'] for r in rows if r['date_taken']]
             if all_times:
                 range_min = min(all_times) - time_window_seconds
                 range_max = max(all_times) + time_window_seconds
@@ -1798,7 +2582,7 @@ class CacheManager:
             )
 
         _LOGGER.debug("Burst query returned %d rows (stable)", len(result_rows))
-        return result_rows
+        return _row_dicts(result_rows)
     
     async def get_file_by_id(self, file_id: int) -> dict | None:
         """Get file metadata by database ID.
@@ -1809,13 +2593,18 @@ class CacheManager:
         Returns:
             File record with metadata, or None if not found
         """
-        async with self._db.execute(
-            "SELECT * FROM media_files WHERE id = ?",
-            (file_id,)
-        ) as cursor:
-            row = await cursor.fetchone()
+        hit, cached = self._lookup_cache_get(('id', file_id))
+        if hit:
+            return cached
+        changes_at_start = self._db.total_changes
         
-        return dict(row) if row else None
+        rows = await self._reader().execute_fetchall(
+            f"SELECT {', '.join(_MEDIA_FILE_COLUMNS)} FROM media_files WHERE id = ?",
+            (file_id,)
+        )
+        file_data = dict(rows[0]) if rows else None
+        self._lookup_cache_put(('id', file_id), file_data, changes_at_start)
+        return file_data
 
     async def search_files_by_path(self, path_fragment: str, limit: int = 5) -> list:
         """Find files whose path contains *path_fragment* (case-insensitive LIKE).
@@ -1828,12 +2617,11 @@ class CacheManager:
             List of file records (dicts) matching the fragment.
         """
         pattern = f"%{path_fragment}%"
-        async with self._db.execute(
-            "SELECT * FROM media_files WHERE path LIKE ? COLLATE NOCASE LIMIT ?",
+        return _row_dicts(await self._db.execute_fetchall(
+            f"SELECT {', '.join(_MEDIA_FILE_COLUMNS)} FROM media_files"
+            " WHERE path LIKE ? COLLATE NOCASE LIMIT ?",
             (pattern, limit),
-        ) as cursor:
-            rows = await cursor.fetchall()
-        return [dict(row) for row in rows]
+        ))
 
     async def get_exif_by_file_id(self, file_id: int) -> dict | None:
         """Get EXIF data for a file by ID.
@@ -1844,13 +2632,18 @@ class CacheManager:
         Returns:
             EXIF data dictionary, or None if not found
         """
-        async with self._db.execute(
-            "SELECT * FROM exif_data WHERE file_id = ?",
-            (file_id,)
-        ) as cursor:
-            row = await cursor.fetchone()
+        hit, cached = self._lookup_cache_get(('exif', file_id))
+        if hit:
+            return cached
+        changes_at_start = self._db.total_changes
         
-        return dict(row) if row else None
+        rows = await self._reader().execute_fetchall(
+            _SELECT_EXIF_SQL + " WHERE e.file_id = ?",
+            (file_id,)
+        )
+        exif = dict(rows[0]) if rows else None
+        self._lookup_cache_put(('exif', file_id), exif, changes_at_start)
+        return exif
     
     async def update_favorite(self, file_path: str, is_favorite: bool) -> bool:
         """Update favorite status for a file.
@@ -1865,30 +2658,59 @@ class CacheManager:
         favorite_value = 1 if is_favorite else 0
         rating_value = 5 if is_favorite else 0
         
-        # Update media_files table - set both is_favorited and rating
-        async with self._db.execute(
-            "UPDATE media_files SET is_favorited = ?, rating = ? WHERE path = ?",
-            (favorite_value, rating_value, file_path)
-        ) as cursor:
-            rows_affected = cursor.rowcount
+        async with self._write_lock:
+            # Update media_files table - set both is_favorited and rating.
+            # RETURNING hands back the id so exif_data can be hit by primary key.
+            async with self._db.execute(
+                "UPDATE media_files SET is_favorited = ?, rating = ? WHERE path = ? RETURNING id",
+                (favorite_value, rating_value, file_path)
+            ) as cursor:
+                row = await cursor.fetchone()
+            
+            if row is None:
+                _LOGGER.warning("File not found in database: %s", file_path)
+                return False
         
-        # CRITICAL: Also update exif_data table - this is what get_random_files queries!
-        # exif_data uses file_id (FK to media_files.id), so we need a subquery
-        async with self._db.execute(
-            """UPDATE exif_data 
-               SET is_favorited = ?, rating = ?
-               WHERE file_id = (SELECT id FROM media_files WHERE path = ?)""",
-            (favorite_value, rating_value, file_path)
-        ) as cursor:
-            pass  # Context manager ensures proper cleanup
+            # Keep exif_data in step: burst lookups, burst indexing and duplicate
+            # detection read its is_favorited/rating (file-row queries use media_files)
+            await self._db.execute(
+                "UPDATE exif_data SET is_favorited = ?, rating = ? WHERE file_id = ?",
+                (favorite_value, rating_value, row[0])
+            )
         
-        await self._db.commit()
+            # Inside begin_batch()/commit_batch() this defers to the batch commit
+            await self._commit()
         
-        if rows_affected > 0:
-            return True
-        else:
-            _LOGGER.warning("File not found in database: %s", file_path)
-            return False
+        return True
+    
+    async def update_favorites_bulk(self, updates: List[tuple]) -> None:
+        """Set favorite status for many files at once (same semantics as update_favorite).
+        
+        Used by the scanner so a batch costs one executemany on media_files and
+        one statement on exif_data instead of two statements per file.
+        
+        Args:
+            updates: (file_path, is_favorite) pairs
+        """
+        if not updates:
+            return
+        
+        params = [
+            (1 if is_favorite else 0, 5 if is_favorite else 0, file_path)
+            for file_path, is_favorite in updates
+        ]
+        async with self._write_lock:
+            await self._db.executemany(
+                "UPDATE media_files SET is_favorited = ?, rating = ? WHERE path = ?",
+                params
+            )
+            # exif_data follows by primary key from the rows just updated, rather
+            # than a path lookup per file
+            await self._db.execute(
+                _SYNC_EXIF_FAVORITES_SQL,
+                (json.dumps([file_path for file_path, _ in updates]),)
+            )
+            await self._commit()
     
     async def update_burst_metadata(self, burst_paths: list, favorited_paths: list) -> int:
         """Update burst_favorites and burst_count metadata for all files in a burst group.
@@ -1900,7 +2722,6 @@ class CacheManager:
         Returns:
             Number of files successfully updated
         """
-        import json
         
         # Store favorited filenames (not full paths) for portability
         favorited_filenames = [Path(p).name for p in favorited_paths]
@@ -1909,22 +2730,18 @@ class CacheManager:
         
         updated_count = 0
         
-        for file_path in burst_paths:
+        async with self._write_lock:
             try:
                 # Update exif_data table with burst_favorites JSON and burst_count
                 async with self._db.execute(
-                    """UPDATE exif_data 
-                       SET burst_favorites = ?, burst_count = ?
-                       WHERE file_id = (SELECT id FROM media_files WHERE path = ?)""",
-                    (favorites_json, burst_count, file_path)
+                    _UPDATE_BURST_METADATA_SQL,
+                    (favorites_json, burst_count, json.dumps(list(burst_paths)))
                 ) as cursor:
-                    if cursor.rowcount > 0:
-                        updated_count += 1
-                        
+                    updated_count = max(cursor.rowcount, 0)
             except Exception as e:
-                _LOGGER.warning("Failed to update burst metadata for %s: %s", file_path, e)
-        
-        await self._db.commit()
+                _LOGGER.warning("Failed to update burst metadata for %d files: %s", burst_count, e)
+            
+            await self._commit()
         
         _LOGGER.debug(
             "Updated burst metadata for %d/%d files (burst_count=%d, %d favorited)", 
@@ -1979,8 +2796,6 @@ class CacheManager:
         Returns:
             Dict with keys: groups_found, files_updated, files_skipped, errors
         """
-        import json
-        import math
 
         _LOGGER.info(
             "index_burst_groups: starting (folder=%s, window=%ds, location=%dm, min=%d)",
@@ -2006,11 +2821,12 @@ class CacheManager:
                 clear_where += "  AND (m.folder = ? OR m.folder LIKE ?)"
                 clear_params.extend([folder.rstrip('/'), folder.rstrip('/') + '/%'])
             clear_where += ")"
-            await self._db.execute(
-                f"UPDATE exif_data SET burst_count = NULL, burst_favorites = NULL, burst_id = NULL {clear_where}",
-                clear_params,
-            )
-            await self._db.commit()
+            async with self._write_lock:
+                await self._db.execute(
+                    f"UPDATE exif_data SET burst_count = NULL, burst_favorites = NULL, burst_id = NULL {clear_where}",
+                    clear_params,
+                )
+                await self._commit()
             _LOGGER.debug("index_burst_groups: cleared stale burst data for scope (folder=%s)", folder or "all")
 
         # ------------------------------------------------------------------
@@ -2107,16 +2923,17 @@ class CacheManager:
             nonlocal files_updated, errors
             if not pending_writes:
                 return
-            try:
-                await self._db.executemany(
-                    "UPDATE exif_data SET burst_favorites = ?, burst_count = ?, burst_id = ? WHERE file_id = ?",
-                    pending_writes,
-                )
-                files_updated += len(pending_writes)
-            except Exception as exc:
-                _LOGGER.warning("index_burst_groups: batch update error: %s", exc)
-                errors += len(pending_writes)
-            await self._db.commit()
+            async with self._write_lock:
+                try:
+                    await self._db.executemany(
+                        "UPDATE exif_data SET burst_favorites = ?, burst_count = ?, burst_id = ? WHERE file_id = ?",
+                        pending_writes,
+                    )
+                    files_updated += len(pending_writes)
+                except Exception as exc:
+                    _LOGGER.warning("index_burst_groups: batch update error: %s", exc)
+                    errors += len(pending_writes)
+                await self._commit()
             pending_writes.clear()
 
         async def _commit_group(members):
@@ -2254,7 +3071,6 @@ class CacheManager:
                 ],
             }
         """
-        from collections import defaultdict
 
         # Normalise prefer_folders — strip trailing slashes for consistent matching;
         # filter out entries that reduce to empty (e.g. "/" or whitespace) to avoid
@@ -2308,16 +3124,14 @@ class CacheManager:
             ORDER BY e.burst_id, m.file_size, e.date_taken, m.width, m.height, m.modified_time, m.path
         """
 
-        async with self._db.execute(query, params) as cursor:
-            rows = await cursor.fetchall()
+        rows = _row_dicts(await self._db.execute_fetchall(query, params))
 
         # ------------------------------------------------------------------
         # 1. Group rows into raw duplicate sets
         # ------------------------------------------------------------------
         # Primary pass: exact match on (burst_id, file_size, date_taken, width, height)
         raw_groups: dict[tuple, list[dict]] = defaultdict(list)
-        for raw in rows:
-            row = dict(raw)
+        for row in rows:
             key = (row["burst_id"], row["file_size"], row["date_taken"], row["width"], row["height"])
             raw_groups[key].append(row)
 
@@ -2329,8 +3143,7 @@ class CacheManager:
         _FILE_SIZE_TOLERANCE = 0.01
         already_matched: set[int] = {m["file_id"] for members in exact_sets for m in members}
         fname_groups: dict[tuple, list[dict]] = defaultdict(list)
-        for raw in rows:
-            row = dict(raw)
+        for row in rows:
             if row["file_id"] in already_matched:
                 continue
             fname_key = (row["burst_id"], row["filename"], row["date_taken"], row["width"], row["height"])
@@ -2520,39 +3333,55 @@ class CacheManager:
     async def delete_file(self, file_path: str) -> bool:
         """Delete file record from database.
         
+        exif_data and exif_data_extended rows go with it via ON DELETE CASCADE.
+        
         Args:
             file_path: Full path to the file
             
         Returns:
             True if successful, False if file not found
         """
-        # First get file_id for deleting related records
-        async with self._db.execute(
-            "SELECT id FROM media_files WHERE path = ?",
-            (file_path,)
-        ) as cursor:
-            row = await cursor.fetchone()
+        async with self._write_lock:
+            async with self._db.execute(
+                "DELETE FROM media_files WHERE path = ? RETURNING id",
+                (file_path,)
+            ) as cursor:
+                row = await cursor.fetchone()
+            await self._commit()
         
         if not row:
             _LOGGER.warning("File not found in database: %s", file_path)
             return False
+        return True
+    
+    async def delete_files(self, file_paths: List[str]) -> int:
+        """Delete many file records in a single transaction.
         
-        file_id = row[0]
-        
-        # Delete EXIF data first (foreign key)
-        await self._db.execute(
-            "DELETE FROM exif_data WHERE file_id = ?",
-            (file_id,)
-        )
+        Args:
+            file_paths: Full paths of the files to delete
+            
+        Returns:
+            Number of file records deleted
+        """
+        if not file_paths:
+            return 0
         
-        # Delete file record
-        await self._db.execute(
-            "DELETE FROM media_files WHERE id = ?",
-            (file_id,)
-        )
+        async with self._write_lock:
+            own_batch = not self._in_batch
+            if own_batch:
+                await self.begin_batch()
+            try:
+                cursor = await self._db.executemany(
+                    "DELETE FROM media_files WHERE path = ?",
+                    [(path,) for path in file_paths]
+                )
+                deleted = cursor.rowcount
+                await cursor.close()
+            finally:
+                if own_batch:
+                    await self.commit_batch()
         
-        await self._db.commit()
-        return True
+        return deleted
     
     async def record_file_move(
         self, 
@@ -2567,22 +3396,21 @@ class CacheManager:
             new_path: New file path
             reason: Reason for move (e.g., "edit", "junk")
         """
-        import time
-        
-        await self._db.execute(
-            """INSERT INTO move_history 
-               (original_path, new_path, moved_at, move_reason, restored)
-               VALUES (?, ?, ?, ?, 0)""",
-            (original_path, new_path, int(time.time()), reason)
-        )
-        await self._db.commit()
+        async with self._write_lock:
+            await self._db.execute(
+                """INSERT INTO move_history 
+                   (original_path, new_path, moved_at, move_reason, restored, dest_folder)
+                   VALUES (?, ?, ?, ?, 0, ?)""",
+                (original_path, new_path, int(time.time()), reason, _move_dest_folder(new_path))
+            )
+            await self._commit()
         _LOGGER.debug("Recorded move: %s -> %s (reason: %s)", original_path, new_path, reason)
     
     async def get_pending_restores(self, folder_path: str = None) -> list:
         """Get list of files that can be restored.
         
         Args:
-            folder_path: Optional filter by destination folder (e.g., "_Edit")
+            folder_path: Optional filter by destination folder name (e.g., "_Edit")
             
         Returns:
             List of move history records that haven't been restored
@@ -2590,9 +3418,9 @@ class CacheManager:
         if folder_path:
             query = """SELECT id, original_path, new_path, moved_at, move_reason
                       FROM move_history 
-                      WHERE restored = 0 AND new_path LIKE ?
+                      WHERE restored = 0 AND dest_folder = ?
                       ORDER BY moved_at DESC"""
-            params = (f"%{folder_path}%",)
+            params = (folder_path,)
         else:
             query = """SELECT id, original_path, new_path, moved_at, move_reason
                       FROM move_history 
@@ -2600,8 +3428,7 @@ class CacheManager:
                       ORDER BY moved_at DESC"""
             params = ()
         
-        async with self._db.execute(query, params) as cursor:
-            rows = await cursor.fetchall()
+        rows = await self._reader().execute_fetchall(query, params)
         
         return [
             {
@@ -2620,15 +3447,14 @@ class CacheManager:
         Args:
             move_id: ID of the move_history record
         """
-        import time
-        
-        await self._db.execute(
-            """UPDATE move_history 
-               SET restored = 1, restored_at = ?
-               WHERE id = ?""",
-            (int(time.time()), move_id)
-        )
-        await self._db.commit()
+        async with self._write_lock:
+            await self._db.execute(
+                """UPDATE move_history 
+                   SET restored = 1, restored_at = ?
+                   WHERE id = ?""",
+                (int(time.time()), move_id)
+            )
+            await self._commit()
         _LOGGER.debug("Marked move %d as restored", move_id)
     
     async def cleanup_orphaned_exif(self) -> int:
@@ -2646,23 +3472,65 @@ class CacheManager:
         
         if orphaned_count > 0:
             # Delete orphaned rows
-            await self._db.execute(
-                "DELETE FROM exif_data WHERE file_id NOT IN (SELECT id FROM media_files)"
-            )
-            await self._db.commit()
+            async with self._write_lock:
+                await self._db.execute(
+                    "DELETE FROM exif_data WHERE file_id NOT IN (SELECT id FROM media_files)"
+                )
+                await self._db.execute(
+                    "DELETE FROM exif_data_extended WHERE file_id NOT IN (SELECT id FROM media_files)"
+                )
+                await self._commit()
             _LOGGER.info("Removed %d orphaned exif_data rows", orphaned_count)
         
         return orphaned_count
     
     async def vacuum_database(self) -> None:
-        """Run VACUUM to reclaim space and compact the database."""
-        await self._db.execute("VACUUM")
-        await self._db.commit()
+        """Run VACUUM to reclaim space and compact the database.
+        
+        Skipped while a scan batch is open, since VACUUM can't run inside a
+        transaction.
+        """
+        async with self._write_lock:
+            if self._in_batch:
+                _LOGGER.debug("Skipping VACUUM while a scan batch is open")
+                return
+            await self._db.execute("VACUUM")
+            await self._commit()
+        # VACUUM changes the file size without touching total_changes
+        self._stats_cache = None
         _LOGGER.debug("Database VACUUM completed")
     
+    async def optimize(self) -> None:
+        """Run PRAGMA optimize so the planner statistics stay current.
+        
+        Cheap when nothing changed; SQLite only re-analyzes tables whose
+        queries would benefit.
+        """
+        try:
+            await self._db.execute("PRAGMA optimize")
+        except (aiosqlite.Error, ValueError) as err:
+            # ValueError: connection already closed
+            _LOGGER.debug("PRAGMA optimize failed: %s", err)
+    
+    async def analyze(self) -> None:
+        """Rebuild planner statistics (run after large scans change the data shape)."""
+        async with self._write_lock:
+            await self._db.execute("ANALYZE")
+            await self._commit()
+        _LOGGER.debug("Database ANALYZE completed")
+    
     async def close(self) -> None:
         """Close database connection."""
         if self._db:
+            # Persist lookup counts still held in memory, letting a scheduled
+            # writeback finish first so both land before the final commit
+            if self._geocode_stats_task is not None:
+                await asyncio.gather(self._geocode_stats_task, return_exceptions=True)
+            await self._flush_geocode_stats()
+            # Don't drop writes left in an open batch or under auto_commit=False
+            await self.commit_batch()
+            await self._close_readers()
+            await self.optimize()
             await self._db.close()
             _LOGGER.info("Cache database connection closed")
 
@@ -2685,33 +3553,31 @@ class CacheManager:
         a completely different item after queue extension via lookahead navigation,
         making same-device view-switching restore the wrong image.
         """
-        import json
-        import time
-        await self._db.execute(
-            """
-            INSERT INTO sync_state (sync_group, queue_json, current_index, updated_at, session_override_json, config_fields_json)
-            VALUES (?, ?, ?, ?, ?, ?)
-            ON CONFLICT(sync_group) DO UPDATE SET
-                queue_json = excluded.queue_json,
-                current_index = excluded.current_index,
-                updated_at = excluded.updated_at,
-                session_override_json = excluded.session_override_json,
-                config_fields_json = excluded.config_fields_json
-            """,
-            (
-                sync_group,
-                json.dumps(queue),
-                current_index,
-                int(time.time()),
-                json.dumps(session_override) if session_override is not None else None,
-                json.dumps(config_fields) if config_fields is not None else None,
-            ),
-        )
-        await self._db.commit()
+        async with self._write_lock:
+            await self._db.execute(
+                """
+                INSERT INTO sync_state (sync_group, queue_json, current_index, updated_at, session_override_json, config_fields_json)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT(sync_group) DO UPDATE SET
+                    queue_json = excluded.queue_json,
+                    current_index = excluded.current_index,
+                    updated_at = excluded.updated_at,
+                    session_override_json = excluded.session_override_json,
+                    config_fields_json = excluded.config_fields_json
+                """,
+                (
+                    sync_group,
+                    json.dumps(queue),
+                    current_index,
+                    int(time.time()),
+                    json.dumps(session_override) if session_override is not None else None,
+                    json.dumps(config_fields) if config_fields is not None else None,
+                ),
+            )
+            await self._commit()
 
     async def get_sync_state(self, sync_group: str) -> dict | None:
         """Return sync state for a named sync group, or None if not found."""
-        import json
         async with self._db.execute(
             "SELECT queue_json, current_index, updated_at, session_override_json, config_fields_json FROM sync_state WHERE sync_group = ?",
             (sync_group,),
@@ -94,7 +94,8 @@ DEFAULT_CLEANUP_TIME: Final = "02:00"
 INSTALL_TIMEOUT_APK: Final = 30  # Reduced from 60 to fail faster when internet is down
 INSTALL_TIMEOUT_APT: Final = 60  # Reduced from 120 to fail faster when internet is down
 INSTALL_STARTUP_DELAY: Final = 5
-GEOCODE_STATS_BATCH_SIZE: Final = 100
+SCAN_COMMIT_BATCH_SIZE: Final = 500  # Files written per transaction during a folder scan
+SCAN_ANALYZE_THRESHOLD: Final = 1000  # Files added by one scan before re-running ANALYZE
 
 # Scan schedule options
 SCAN_SCHEDULE_STARTUP_ONLY: Final = "startup_only"
@@ -68,7 +68,7 @@ class GeocodeService:
         
         if time_since_last < RATE_LIMIT_DELAY:
             delay = RATE_LIMIT_DELAY - time_since_last
-            _LOGGER.debug(f"Rate limiting: waiting {delay:.2f}s")
+            _LOGGER.debug("Rate limiting: waiting %.2fs", delay)
             await asyncio.sleep(delay)
         
         self._last_request_time = asyncio.get_event_loop().time()
@@ -100,7 +100,7 @@ class GeocodeService:
         lat = self._round_coordinate(latitude)
         lon = self._round_coordinate(longitude)
         
-        _LOGGER.debug(f"Geocoding ({lat}, {lon})")
+        _LOGGER.debug("Geocoding (%s, %s)", lat, lon)
         
         session = await self._get_session()
         
@@ -145,25 +145,25 @@ class GeocodeService:
                         # Rate limit exceeded
                         wait_time = 2 ** attempt  # Exponential backoff
                         _LOGGER.warning(
-                            f"Nominatim rate limit exceeded, waiting {wait_time}s"
+                            "Nominatim rate limit exceeded, waiting %ss", wait_time
                         )
                         await asyncio.sleep(wait_time)
                         continue
                     else:
                         _LOGGER.warning(
-                            f"Nominatim returned status {response.status}"
+                            "Nominatim returned status %s", response.status
                         )
                         return None
                         
             except asyncio.TimeoutError:
-                _LOGGER.warning(f"Geocoding timeout (attempt {attempt + 1}/{max_retries})")
+                _LOGGER.warning("Geocoding timeout (attempt %d/%d)", attempt + 1, max_retries)
                 if attempt < max_retries - 1:
                     await asyncio.sleep(2 ** attempt)
                     continue
                 return None
                 
             except Exception as e:
-                _LOGGER.error(f"Geocoding error: {e}")
+                _LOGGER.error("Geocoding error: %s", e)
                 return None
         
         return None
@@ -223,6 +223,6 @@ class GeocodeService:
         #     'location_country': sanitize_unicode_to_ascii(location_country.strip() if location_country else '')
         # }
         
-        _LOGGER.debug(f"Geocoded to: {result}")
+        _LOGGER.debug("Geocoded to: %s", result)
         return result
 
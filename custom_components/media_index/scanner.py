@@ -10,6 +10,7 @@ from typing import Optional
 from homeassistant.core import HomeAssistant
 
 from .cache_manager import CacheManager
+from .const import SCAN_ANALYZE_THRESHOLD, SCAN_COMMIT_BATCH_SIZE
 from .exif_parser import ExifParser
 from .video_parser import VideoMetadataParser
 from .geocoding import GeocodeService
@@ -180,6 +181,192 @@ class MediaScanner:
         
         return media_files
     
+    def _record_scan_error(self, file_path: Optional[str], err: Exception) -> None:
+        """Log a per-file scan error, suppressing the flood after the first 10."""
+        self._scan_error_count += 1
+        if self._scan_error_count <= 10:
+            _LOGGER.error("Failed to add file to cache: %s - %s", file_path, err)
+        elif self._scan_error_count == 11:
+            _LOGGER.error(
+                "Too many scan errors (%d so far). Suppressing further error logs for this scan.",
+                self._scan_error_count
+            )
+    
+    async def _flush_batch(self, batch: list) -> int:
+        """Flush one scan batch, logging a failure against the whole batch.
+        
+        A lost database connection is re-raised so the scan aborts; any other
+        error drops the batch (it is not retried) and counts nothing as written.
+        
+        Returns:
+            Number of files actually written
+        """
+        try:
+            return await self._flush_pending(batch)
+        except Exception as err:
+            if "no active connection" in str(err):
+                raise
+            _LOGGER.error(
+                "Failed to write scan batch of %d files (%s ... %s): %s",
+                len(batch), batch[0][0]['path'], batch[-1][0]['path'], err
+            )
+            return 0
+    
+    async def _flush_pending(self, pending: list) -> int:
+        """Write a batch of extracted (metadata, exif_data) pairs to the cache.
+        
+        media_files rows, exif_data rows and favorite flags go in with one
+        executemany each, in one transaction that is committed before any
+        geocoding starts. Reverse-geocoding requests are rate limited, so they
+        run with no transaction open; their results are written afterwards in
+        a second short one.
+        If the bulk write fails, fall back to file-by-file so one bad row doesn't
+        drop the whole batch.
+        
+        Returns:
+            Number of files actually written
+        """
+        if not pending:
+            return 0
+        
+        for metadata, exif_data in pending:
+            if exif_data:
+                _apply_filename_timezone_hint(metadata['path'], exif_data)
+        
+        await self.cache.begin_batch()
+        try:
+            path_to_id = await self._write_pending(pending)
+        finally:
+            await self.cache.commit_batch()
+        
+        _LOGGER.debug("💾 Wrote batch of %d files", len(pending))
+        
+        if self.enable_geocoding and self.geocode_service:
+            await self._geocode_pending(pending, path_to_id)
+        
+        return sum(1 for metadata, _ in pending if path_to_id.get(metadata['path'], 0) > 0)
+    
+    async def _write_pending(self, pending: list) -> dict:
+        """Write the files, EXIF rows and favorite flags of a batch (see _flush_pending).
+        
+        Returns:
+            Dictionary mapping path -> file ID for every file written
+        """
+        try:
+            path_to_id = await self.cache.add_files_bulk([metadata for metadata, _ in pending])
+            await self.cache.add_exif_bulk([
+                (path_to_id[metadata['path']], exif_data)
+                for metadata, exif_data in pending
+                if exif_data and path_to_id.get(metadata['path'])
+            ])
+        except Exception as err:
+            if "no active connection" in str(err):
+                raise
+            _LOGGER.warning(
+                "Bulk write of %d files failed, retrying one at a time: %s", len(pending), err
+            )
+            path_to_id = {}
+            for metadata, exif_data in pending:
+                try:
+                    file_id = await self.cache.add_file(metadata)
+                    if exif_data and file_id > 0:
+                        await self.cache.add_exif_data(file_id, exif_data)
+                    path_to_id[metadata['path']] = file_id
+                except Exception as file_err:
+                    self._record_scan_error(metadata['path'], file_err)
+        
+        # Set is_favorited based on XMP:Rating (5 stars = favorite, < 5 = not favorite)
+        try:
+            await self.cache.update_favorites_bulk([
+                (metadata['path'], (exif_data.get('rating') or 0) >= 5)
+                for metadata, exif_data in pending
+                if exif_data and path_to_id.get(metadata['path'], 0) > 0
+            ])
+        except Exception as err:
+            if "no active connection" in str(err):
+                raise
+            _LOGGER.warning("Favorite sync for batch of %d files failed: %s", len(pending), err)
+        
+        return path_to_id
+    
+    async def _geocode_pending(self, pending: list, path_to_id: dict) -> None:
+        """Reverse-geocode the GPS-tagged files of a written batch (see _flush_pending)."""
+        # Geocode GPS coordinates for files not already geocoded. The
+        # already-geocoded check and the location writes each run once per batch.
+        to_geocode = [
+            (metadata, exif_data, path_to_id[metadata['path']])
+            for metadata, exif_data in pending
+            if exif_data and path_to_id.get(metadata['path'], 0) > 0
+            and exif_data.get('latitude') and exif_data.get('longitude')
+        ]
+        if not to_geocode:
+            return
+        try:
+            geocoded = await self.cache.get_geocoded_file_ids([file_id for _, _, file_id in to_geocode])
+        except Exception as err:
+            if "no active connection" in str(err):
+                raise
+            _LOGGER.warning("Geocoded-location check for batch failed: %s", err)
+            return
+        
+        to_geocode = [entry for entry in to_geocode if entry[2] not in geocoded]
+        if not to_geocode:
+            return
+        
+        # Check geocode cache first, for the whole batch in one lookup
+        try:
+            cached = await self.cache.get_geocode_cache_many([
+                (exif_data['latitude'], exif_data['longitude'])
+                for _, exif_data, _ in to_geocode
+            ])
+        except Exception as err:
+            if "no active connection" in str(err):
+                raise
+            _LOGGER.warning("Geocode cache lookup for batch failed: %s", err)
+            cached = {}
+        
+        location_updates = []
+        # Service results from this batch, by geocode_cache key, so nearby
+        # photos missing from the cache trigger only one request
+        fetched = {}
+        new_cache_entries = []
+        for metadata, exif_data, file_id in to_geocode:
+            try:
+                lat = exif_data['latitude']
+                lon = exif_data['longitude']
+                key = self.cache.geocode_key(lat, lon)
+                
+                cached_location = cached.get((lat, lon)) or fetched.get(key)
+                
+                if cached_location:
+                    location_updates.append((file_id, cached_location))
+                else:
+                    # Fetch from geocoding service
+                    location_data = await self.geocode_service.reverse_geocode(lat, lon)
+                    
+                    if location_data:
+                        new_cache_entries.append((lat, lon, location_data))
+                        fetched[key] = location_data
+                        location_updates.append((file_id, location_data))
+            except Exception as err:
+                if "no active connection" in str(err):
+                    raise
+                self._record_scan_error(metadata['path'], err)
+        
+        if not location_updates:
+            return
+        await self.cache.begin_batch()
+        try:
+            for lat, lon, location_data in new_cache_entries:
+                await self.cache.add_geocode_cache(lat, lon, location_data)
+            await self.cache.update_exif_locations_bulk(location_updates)
+        except Exception as err:
+            if "no active connection" in str(err):
+                raise
+            _LOGGER.warning("Location write for batch of %d files failed: %s", len(location_updates), err)
+        finally:
+            await self.cache.commit_batch()
+    
     async def scan_folder(
         self,
         base_folder: str,
@@ -231,6 +418,10 @@ class MediaScanner:
                 scan_paths = [base_folder]
                 _LOGGER.info("Full scan will cover entire base folder: %s", base_folder)
             
+            # Extracted files are written SCAN_COMMIT_BATCH_SIZE at a time, one
+            # transaction per batch (opened only around the writes, see _flush_pending)
+            pending = []
+            
             # Scan each path (run blocking I/O in executor)
             for scan_path in scan_paths:
                 if not os.path.exists(scan_path):
@@ -248,26 +439,26 @@ class MediaScanner:
                     # Fallback for testing without hass
                     media_files = self._walk_directory(scan_path, max_depth)
                 
+                # What's already indexed under this path, loaded once rather
+                # than looked up per file: path -> (file_id, modified_time, date_taken)
+                scan_index = await self.cache.load_scan_index(scan_path)
+                
                 # Add files to cache
                 for metadata in media_files:
                     try:
                         # Check if file already exists with metadata to avoid unnecessary re-extraction
-                        existing_file = await self.cache.get_file_by_path(metadata['path'])
+                        existing_file = scan_index.get(metadata['path'])
                         should_extract_metadata = True
                         
                         _LOGGER.debug("🔍 Checking file: %s (existing_file: %s, force=%s)", metadata['path'], bool(existing_file), force)
                         
                         if existing_file and not force:
-                            file_id = existing_file.get('id')  # Column name is 'id', not 'file_id'
-                            existing_exif = await self.cache.get_exif_by_file_id(file_id)
+                            file_id, existing_modified, existing_date_taken = existing_file
                             
-                            _LOGGER.debug("🔍   file_id=%s, has_exif=%s, date_taken=%s", 
-                                        file_id, bool(existing_exif), 
-                                        existing_exif.get('date_taken') if existing_exif else None)
+                            _LOGGER.debug("🔍   file_id=%s, date_taken=%s", file_id, existing_date_taken)
                             
                             # Skip extraction if file hasn't been modified and already has metadata
-                            if existing_exif and existing_exif.get('date_taken'):
-                                existing_modified = existing_file.get('modified_time', 0)
+                            if existing_date_taken:
                                 current_modified = metadata.get('modified_time', 0)
                                 
                                 if existing_modified == current_modified:
@@ -281,9 +472,7 @@ class MediaScanner:
                                     )
                             else:
                                 _LOGGER.debug(
-                                    "📝 File exists but missing metadata, will extract: %s (has_exif: %s, has_date: %s)",
-                                    metadata['path'], existing_exif is not None, 
-                                    existing_exif.get('date_taken') if existing_exif else None
+                                    "📝 File exists but missing metadata, will extract: %s", metadata['path']
                                 )
                         else:
                             _LOGGER.debug("✨ New file, will extract: %s", metadata['path'])
@@ -321,70 +510,24 @@ class MediaScanner:
                             
                             # CRITICAL: If extraction failed but file exists, preserve existing metadata
                             if not exif_data and existing_file:
-                                existing_exif = await self.cache.get_exif_by_file_id(existing_file.get('id'))
-                                if existing_exif and existing_exif.get('date_taken'):
+                                if existing_file[2]:
                                     _LOGGER.warning("Video metadata extraction failed, preserving existing: %s", metadata['path'])
                                     continue  # Don't overwrite with empty data
                         
-                        file_id = await self.cache.add_file(metadata)
-                        files_added += 1
-                        
-                        _LOGGER.debug("💾 File added with ID %s: %s", file_id, metadata['path'])
-                        
-                        # Store EXIF data in exif_data table
-                        if exif_data and file_id > 0:
-                            _apply_filename_timezone_hint(metadata['path'], exif_data)
-                            await self.cache.add_exif_data(file_id, exif_data)
-                            _LOGGER.debug("✅ EXIF data saved for file ID %s (has date_taken: %s)", file_id, bool(exif_data.get('date_taken')))
-                            
-                            # Set is_favorited based on XMP:Rating (5 stars = favorite, < 5 = not favorite)
-                            rating = exif_data.get('rating') or 0
-                            is_favorite = rating >= 5
-                            await self.cache.update_favorite(metadata['path'], is_favorite)
-                            # Favorite marking logged in summary only
-                        else:
-                            _LOGGER.debug("⚠️ No EXIF data to save for file ID %s: %s", file_id, metadata['path'])
+                        # Queue for the next bulk write (see _flush_pending); only
+                        # files the write succeeded for count as added
+                        pending.append((metadata, exif_data))
                         
-                        # Geocode GPS coordinates if available, enabled, and not already geocoded
-                        # Only run if we have exif_data (from images or videos)
-                        if exif_data and file_id > 0:
-                            has_coords = exif_data.get('latitude') and exif_data.get('longitude')
-                            
-                            # Check if this file already has geocoded location
-                            already_geocoded = await self.cache.has_geocoded_location(file_id)
-                            
-                            # Debug logging removed to prevent excessive logs during scans
-                            
-                            if (self.enable_geocoding and 
-                                self.geocode_service and 
-                                has_coords and 
-                                not already_geocoded):
-                                
-                                lat = exif_data['latitude']
-                                lon = exif_data['longitude']
-                                
-                                # Check geocode cache first
-                                cached_location = await self.cache.get_geocode_cache(lat, lon)
-                                
-                                if cached_location:
-                                    # Use cached location
-                                    await self.cache.update_exif_location(file_id, cached_location)
-                                else:
-                                    # Fetch from geocoding service
-                                    location_data = await self.geocode_service.reverse_geocode(lat, lon)
-                                    
-                                    if location_data:
-                                        # Cache the result
-                                        await self.cache.add_geocode_cache(lat, lon, location_data)
-                                        # Update EXIF record
-                                        await self.cache.update_exif_location(file_id, location_data)
+                        if len(pending) >= SCAN_COMMIT_BATCH_SIZE:
+                            # Hand the batch over before flushing so a failed write
+                            # is never queued again with the next files
+                            batch, pending = pending, []
+                            files_added += await self._flush_batch(batch)
+                            _LOGGER.info("Scan progress: indexed %d files so far...", files_added)
                         
                         # Yield control back to event loop every 10 files to prevent blocking startup
-                        if files_added % 10 == 0:
+                        if len(pending) % 10 == 0:
                             await asyncio.sleep(0)
-                        
-                        if files_added % 100 == 0:
-                            _LOGGER.info("Scan progress: indexed %d files so far...", files_added)
                     
                     except Exception as err:
                         # Check if database connection was closed (during integration unload/reload)
@@ -404,14 +547,10 @@ class MediaScanner:
                             return files_added
                         
                         # For other errors, log but continue (with rate limiting)
-                        self._scan_error_count += 1
-                        if self._scan_error_count <= 10:
-                            _LOGGER.error("Failed to add file to cache: %s - %s", metadata.get("path"), err)
-                        elif self._scan_error_count == 11:
-                            _LOGGER.error(
-                                "Too many scan errors (%d so far). Suppressing further error logs for this scan.",
-                                self._scan_error_count
-                            )
+                        self._record_scan_error(metadata.get("path"), err)
+            
+            if pending:
+                files_added += await self._flush_batch(pending)
             
             # Update scan record
             await self.cache.update_scan(scan_id, files_added, "completed")
@@ -419,6 +558,11 @@ class MediaScanner:
             # Flush any pending geocoding stats
             await self.cache._flush_geocode_stats()
             
+            # A large scan (e.g. the initial index) changes the table shape enough
+            # that the planner's statistics need a full refresh
+            if files_added > SCAN_ANALYZE_THRESHOLD:
+                await self.cache.analyze()
+            
             scan_duration = (datetime.now() - scan_start_time).total_seconds()
             _LOGGER.info(
                 "Scan complete in %.1fs. Processed %d files (%d updated, %d skipped with existing metadata)",
@@ -476,9 +620,8 @@ class MediaScanner:
             # Check if file already exists in database with metadata
             existing_file = await self.cache.get_file_by_path(file_path)
             if existing_file:
-                file_id = existing_file.get('id')
-                # Check if file already has EXIF/video metadata
-                existing_exif = await self.cache.get_exif_by_file_id(file_id)
+                # Check if file already has EXIF/video metadata (joined in by get_file_by_path)
+                existing_exif = existing_file.get('exif')
                 if existing_exif and existing_exif.get('date_taken'):
                     # File already has metadata - only update if file was actually modified
                     # Compare modification times to avoid unnecessary re-extraction
@@ -518,7 +661,7 @@ class MediaScanner:
                 
                 # CRITICAL: If extraction failed but file already has metadata, preserve existing data
                 if not exif_data and existing_file:
-                    existing_exif = await self.cache.get_exif_by_file_id(existing_file.get('id'))
+                    existing_exif = existing_file.get('exif')
                     if existing_exif and existing_exif.get('date_taken'):
                         _LOGGER.warning("Video metadata extraction failed but preserving existing data: %s", file_path)
                         return True  # Keep existing metadata, don't overwrite with empty/fallback data
@@ -530,8 +673,9 @@ class MediaScanner:
                     metadata['duration'] = exif_data.get('duration')
                     metadata['orientation'] = exif_data.get('orientation')
             
-            # Add to database
-            file_id = await self.cache.add_file(metadata)
+            # Add to database; with EXIF to follow, the file row is committed
+            # together with it by add_exif_data
+            file_id = await self.cache.add_file(metadata, commit=not exif_data)
             if file_id <= 0:
                 _LOGGER.warning("Failed to add file to database: %s", file_path)
                 return False
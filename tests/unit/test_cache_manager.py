@@ -8,6 +8,7 @@ Tests are async (pytest-asyncio with asyncio_mode = auto in pytest.ini).
 
 import asyncio
 import os
+from datetime import datetime
 import pytest
 import pytest_asyncio
 
@@ -102,6 +103,342 @@ class TestSchema:
         assert await mgr.async_setup()
         await mgr.close()
 
+    async def test_setup_enables_wal(self, cache):
+        """The cache database must run in WAL mode with synchronous=NORMAL."""
+        async with cache._db.execute("PRAGMA journal_mode") as cur:
+            assert (await cur.fetchone())[0] == "wal"
+        async with cache._db.execute("PRAGMA synchronous") as cur:
+            assert (await cur.fetchone())[0] == 1  # NORMAL
+        async with cache._db.execute("PRAGMA journal_size_limit") as cur:
+            assert (await cur.fetchone())[0] == 64 * 1024 * 1024
+
+    async def test_reads_use_reader_connections_when_committed(self, cache):
+        """Pure reads go to query_only readers, but see a scan batch's uncommitted rows."""
+        assert len(cache._readers) == 2
+        async with cache._readers[0].execute("PRAGMA query_only") as cur:
+            assert (await cur.fetchone())[0] == 1
+        async with cache._readers[0].execute("PRAGMA cache_size") as cur:
+            assert (await cur.fetchone())[0] == -16000
+
+        await cache.begin_batch()
+        await cache.add_file(_file_data("/media/photo/Test/r1.jpg"))
+        assert cache._reader() is cache._db
+        assert await cache.get_total_files() == 1
+        await cache.commit_batch()
+
+        assert cache._reader() in cache._readers
+        await cache.add_file(_file_data("/media/photo/Test/r2.jpg"))
+        assert await cache.get_total_files() == 2
+        assert len(await cache.get_random_files(count=5)) == 2
+
+    async def test_setup_in_memory(self):
+        """An in-memory database sets up without a directory, WAL, or readers."""
+        mgr = CacheManager(":memory:")
+        assert await mgr.async_setup()
+        async with mgr._db.execute("PRAGMA journal_mode") as cur:
+            assert (await cur.fetchone())[0] == "memory"
+        assert mgr._readers == []
+        fid = await mgr.add_file(_file_data("/media/photo/Test/mem.jpg"))
+        assert (await mgr.get_file_by_id(fid))["filename"] == "mem.jpg"
+        await mgr.close()
+
+    async def test_active_media_index_serves_type_filter(self, cache):
+        """The _Junk/_Edit exclusion plus file_type must use the partial index."""
+        async with cache._db.execute(
+            "EXPLAIN QUERY PLAN SELECT m.id FROM media_files m"
+            " WHERE m.folder_class = 0"
+            " AND m.folder = ? COLLATE NOCASE AND m.file_type = ?",
+            ("/media/photo/Test", "image"),
+        ) as cur:
+            plan = " ".join(row[3] for row in await cur.fetchall())
+        assert "idx_media_active" in plan
+
+    async def test_pending_restores_by_dest_folder(self, cache):
+        """Pending restores filter on the stored dest_folder via the partial index."""
+        await cache.record_file_move("/m/a.jpg", "/m/_Edit/a.jpg", reason="edit")
+        await cache.record_file_move("/m/b.jpg", "/m/_Junk/b.jpg", reason="junk")
+        await cache.record_file_move("/m/c.jpg", "/m/_Edit/c.jpg", reason="edit")
+
+        pending = await cache.get_pending_restores("_Edit")
+        assert {m["original_path"] for m in pending} == {"/m/a.jpg", "/m/c.jpg"}
+        await cache.mark_move_restored(pending[0]["id"])
+        assert len(await cache.get_pending_restores("_Edit")) == 1
+        assert len(await cache.get_pending_restores()) == 2
+
+        async with cache._db.execute(
+            "EXPLAIN QUERY PLAN SELECT id FROM move_history"
+            " WHERE restored = 0 AND dest_folder = ? ORDER BY moved_at DESC",
+            ("_Edit",),
+        ) as cur:
+            plan = " ".join(row[3] for row in await cur.fetchall())
+        assert "idx_pending_restores_folder" in plan
+        assert "TEMP B-TREE" not in plan
+
+    async def test_ordered_sorts_walk_an_index(self, cache):
+        """Unfiltered pages need no sort step, and later pages seek past the cursor."""
+        for order_by, index in (
+            ("m.taken_time", "idx_media_sort_taken"),
+            ("m.filename", "idx_media_sort_filename"),
+            ("m.folder || '/' || m.filename", "idx_media_sort_path"),
+            ("unixepoch(m.modified_time)", "idx_media_sort_modified"),
+        ):
+            async with cache._db.execute(
+                "EXPLAIN QUERY PLAN SELECT m.id FROM media_files m"
+                " LEFT JOIN exif_data e ON m.id = e.file_id"
+                f" WHERE 1=1 AND m.folder_class = 0 ORDER BY {order_by} DESC, m.id DESC LIMIT 10"
+            ) as cur:
+                plan = " ".join(row[3] for row in await cur.fetchall())
+            assert index in plan
+            assert "TEMP B-TREE" not in plan
+
+            async with cache._db.execute(
+                "EXPLAIN QUERY PLAN SELECT m.id FROM media_files m"
+                " LEFT JOIN exif_data e ON m.id = e.file_id"
+                f" WHERE 1=1 AND m.folder_class = 0 AND {order_by} <= ? AND ({order_by}, m.id) < (?, ?)"
+                f" ORDER BY {order_by} DESC, m.id DESC LIMIT 10",
+                (1, 1, 1),
+            ) as cur:
+                plan = " ".join(row[3] for row in await cur.fetchall())
+            assert f"SEARCH m USING INDEX {index}" in plan
+            assert "TEMP B-TREE" not in plan
+
+    async def test_recent_files_seek_without_file_type(self, cache):
+        """The priority-new-files pick seeks on last_scanned with or without file_type."""
+        for extra, params in (
+            ("", (0,)),
+            (" AND m.file_type = ?", ("image", 0)),
+        ):
+            async with cache._db.execute(
+                "EXPLAIN QUERY PLAN SELECT m.id FROM media_files m"
+                f" WHERE m.folder_class = 0{extra} AND m.last_scanned > ?",
+                params,
+            ) as cur:
+                plan = " ".join(row[3] for row in await cur.fetchall())
+            assert "SEARCH m USING" in plan and "last_scanned>?" in plan
+
+    async def test_setup_records_schema_version(self, cache):
+        """Migrations stamp user_version so later setups can skip them."""
+        async with cache._db.execute("PRAGMA user_version") as cur:
+            assert (await cur.fetchone())[0] >= 1
+
+    async def test_migrates_camera_settings_to_extended(self, tmp_path):
+        """Legacy exif_data camera columns move to exif_data_extended on setup."""
+        import sqlite3
+        db_path = str(tmp_path / "legacy_exif.db")
+        conn = sqlite3.connect(db_path)
+        conn.execute("""
+            CREATE TABLE media_files (
+                id INTEGER PRIMARY KEY AUTOINCREMENT, path TEXT UNIQUE NOT NULL,
+                filename TEXT NOT NULL, folder TEXT NOT NULL, file_type TEXT NOT NULL,
+                file_size INTEGER, modified_time TEXT, created_time TEXT,
+                duration REAL, width INTEGER, height INTEGER, orientation TEXT,
+                last_scanned INTEGER NOT NULL, is_favorited INTEGER DEFAULT 0,
+                rating INTEGER DEFAULT 0, rated_at INTEGER
+            )
+        """)
+        conn.execute("""
+            CREATE TABLE exif_data (
+                file_id INTEGER PRIMARY KEY, date_taken INTEGER,
+                latitude REAL, longitude REAL, iso INTEGER, flash TEXT,
+                location_name TEXT, location_city TEXT, location_state TEXT,
+                location_country TEXT, rating INTEGER, is_favorited INTEGER DEFAULT 0,
+                camera_make TEXT, camera_model TEXT
+            )
+        """)
+        conn.execute(
+            "INSERT INTO media_files (path, filename, folder, file_type, last_scanned)"
+            " VALUES ('/m/a.jpg', 'a.jpg', '/m', 'image', 0)"
+        )
+        conn.execute("INSERT INTO exif_data (file_id, iso, flash) VALUES (1, 400, 'Off')")
+        conn.commit()
+        conn.close()
+
+        mgr = CacheManager(db_path)
+        assert await mgr.async_setup()
+        async with mgr._db.execute("PRAGMA table_info(exif_data)") as cur:
+            columns = {row[1] for row in await cur.fetchall()}
+        assert "iso" not in columns and "flash" not in columns
+        exif = await mgr.get_exif_by_file_id(1)
+        assert (exif["iso"], exif["flash"]) == (400, "Off")
+        # media_files gained folder_class, which the slideshow queries filter on
+        assert [r["path"] for r in await mgr.get_random_files(count=5)] == ["/m/a.jpg"]
+        await mgr.close()
+
+    async def test_failed_migration_rolls_back_every_step(self, tmp_path, monkeypatch):
+        """Migrations run in one transaction, so a failing step undoes the earlier ones."""
+        import sqlite3
+        db_path = str(tmp_path / "partial.db")
+        mgr = CacheManager(db_path)
+        assert await mgr.async_setup()
+        await mgr._db.execute("ALTER TABLE exif_data ADD COLUMN iso INTEGER")
+        await mgr._db.execute("PRAGMA user_version = 0")
+        await mgr._db.commit()
+        await mgr.close()
+
+        async def fail(self):
+            raise RuntimeError("boom")
+
+        monkeypatch.setattr(CacheManager, "_migrate_move_history", fail)
+        mgr = CacheManager(db_path)
+        assert not await mgr.async_setup()
+        await mgr._db.close()
+
+        conn = sqlite3.connect(db_path)
+        assert conn.execute("PRAGMA user_version").fetchone()[0] == 0
+        assert "iso" in {row[1] for row in conn.execute("PRAGMA table_info(exif_data)")}
+        conn.close()
+
+    async def test_setup_analyzes_unanalyzed_database(self, tmp_path):
+        """Opening a database without planner statistics runs ANALYZE."""
+        db_path = str(tmp_path / "unanalyzed.db")
+        mgr = CacheManager(db_path)
+        assert await mgr.async_setup()
+        await mgr.add_file(_file_data("/media/photo/Test/a.jpg"))
+        await mgr._db.execute("DROP TABLE sqlite_stat1")
+        await mgr._db.commit()
+        await mgr._close_readers()
+        await mgr._db.close()
+
+        mgr = CacheManager(db_path)
+        assert await mgr.async_setup()
+        async with mgr._db.execute(
+            "SELECT COUNT(*) FROM sqlite_stat1 WHERE tbl = 'media_files'"
+        ) as cur:
+            assert (await cur.fetchone())[0] > 0
+        await mgr.close()
+
+    async def test_analyze_writes_planner_stats(self, cache):
+        """analyze() must populate sqlite_stat1 for the planner."""
+        await cache.add_file(_file_data("/media/photo/Test/a.jpg"))
+        await cache.analyze()
+        async with cache._db.execute(
+            "SELECT COUNT(*) FROM sqlite_stat1 WHERE tbl = 'media_files'"
+        ) as cur:
+            assert (await cur.fetchone())[0] > 0
+
+
+class TestGeocodeCache:
+
+    async def test_add_replaces_same_key(self, cache):
+        """Coordinates are rounded to 3 decimals and the key is upserted."""
+        await cache.add_geocode_cache(35.7112, 139.7961, {"location_city": "Tokio"})
+        await cache.add_geocode_cache(35.7114, 139.7959, {"location_city": "Tokyo"})
+        async with cache._db.execute(
+            "SELECT latitude, longitude, location_city FROM geocode_cache"
+        ) as cur:
+            rows = [tuple(r) for r in await cur.fetchall()]
+        assert rows == [(35.711, 139.796, "Tokyo")]
+        async with cache._db.execute(
+            "SELECT lat_key, lon_key FROM geocode_cache"
+        ) as cur:
+            assert tuple(await cur.fetchone()) == (35711, 139796)
+        assert cache.geocode_key(35.7114, 139.7959) == (35711, 139796)
+        assert cache.geocode_key(-33.8688, 151.2093) == (-33869, 151209)
+
+    async def test_repeat_lookups_served_from_memory(self, cache):
+        """Geocode and geocoded-flag lookups are cached until the next write."""
+        fid = await cache.add_file(_file_data("/media/photo/Test/g0.jpg"))
+        await cache.add_exif_data(fid, _exif_data(latitude=48.857, longitude=2.352))
+        assert await cache.get_geocode_cache(48.857, 2.352) is None
+        assert not await cache.has_geocoded_location(fid)
+        assert ("geocode", 48857, 2352) in cache._lookup_cache
+
+        await cache.add_geocode_cache(48.857, 2.352, {"location_city": "Paris"})
+        await cache.update_exif_location(fid, {"location_city": "Paris"})
+        assert (await cache.get_geocode_cache(48.8571, 2.3519))["location_city"] == "Paris"
+        assert await cache.has_geocoded_location(fid)
+        assert (await cache.get_geocode_cache(48.857, 2.352))["location_city"] == "Paris"
+        assert (cache._geocode_stats_cache_hits, cache._geocode_stats_cache_misses) == (2, 1)
+
+    async def test_get_geocode_cache_many(self, cache):
+        """Bulk lookup maps each passed coordinate to its rounded cache entry."""
+        await cache.add_geocode_cache(48.857, 2.352, {"location_city": "Paris"})
+        await cache.add_geocode_cache(35.711, 139.796, {"location_city": "Tokyo"})
+        coords = [(48.8571, 2.3521), (48.8569, 2.3519), (35.711, 139.796), (0.0, 0.0)]
+
+        result = await cache.get_geocode_cache_many(coords)
+        assert set(result) == set(coords[:3])
+        assert result[(48.8569, 2.3519)]["location_city"] == "Paris"
+        assert result[(35.711, 139.796)]["location_city"] == "Tokyo"
+        assert (cache._geocode_stats_cache_hits, cache._geocode_stats_cache_misses) == (3, 1)
+        assert await cache.get_geocode_cache_many([]) == {}
+
+    async def test_lookup_stats_written_back_off_the_lookup_path(self, tmp_path):
+        """Lookups only count in memory; a background task and close() persist them."""
+        db_path = str(tmp_path / "stats.db")
+        mgr = CacheManager(db_path)
+        await mgr.async_setup()
+
+        async def stored():
+            async with mgr._db.execute(
+                "SELECT cache_hits, cache_misses FROM geocode_stats WHERE id = 1"
+            ) as cur:
+                return tuple(await cur.fetchone())
+
+        await mgr.get_geocode_cache_many([(1.0, float(i)) for i in range(100)])
+        assert mgr._geocode_stats_task is not None
+        assert await stored() == (0, 0)
+        await mgr._geocode_stats_task
+        assert await stored() == (0, 100)
+
+        await mgr.get_geocode_cache(1.0, 2.0)
+        await mgr.close()
+        mgr = CacheManager(db_path)
+        await mgr.async_setup()
+        assert await stored() == (0, 101)
+        await mgr.close()
+
+    async def test_bulk_location_updates(self, cache):
+        """Batch check and write of file locations, as the scanner uses them."""
+        a = await cache.add_file(_file_data("/media/photo/Test/g1.jpg"))
+        b = await cache.add_file(_file_data("/media/photo/Test/g2.jpg"))
+        for fid in (a, b):
+            await cache.add_exif_data(fid, _exif_data(latitude=48.857, longitude=2.352))
+        assert await cache.get_geocoded_file_ids([a, b]) == set()
+
+        await cache.update_exif_locations_bulk([(a, {"location_city": "Paris"})])
+        assert await cache.get_geocoded_file_ids([a, b]) == {a}
+        assert (await cache.get_exif_by_file_id(a))["location_city"] == "Paris"
+
+    async def test_migrates_rowid_layout(self, tmp_path):
+        """A geocode_cache created with the old rowid layout is rebuilt in place."""
+        import sqlite3
+        db_path = str(tmp_path / "legacy.db")
+        conn = sqlite3.connect(db_path)
+        conn.execute("""
+            CREATE TABLE geocode_cache (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                latitude REAL NOT NULL, longitude REAL NOT NULL,
+                precision_level INTEGER NOT NULL,
+                location_name TEXT, location_city TEXT,
+                location_state TEXT, location_country TEXT,
+                cached_at INTEGER NOT NULL,
+                UNIQUE(latitude, longitude, precision_level)
+            )
+        """)
+        conn.execute(
+            "INSERT INTO geocode_cache (latitude, longitude, precision_level, location_city, cached_at)"
+            " VALUES (48.857, 2.352, 3, 'Paris', 0)"
+        )
+        conn.commit()
+        conn.close()
+
+        mgr = CacheManager(db_path)
+        assert await mgr.async_setup()
+        async with mgr._db.execute(
+            "SELECT sql FROM sqlite_master WHERE name = 'geocode_cache'"
+        ) as cur:
+            assert "WITHOUT ROWID" in (await cur.fetchone())[0]
+        async with mgr._db.execute(
+            "SELECT location_city FROM geocode_cache WHERE latitude = 48.857 AND longitude = 2.352"
+        ) as cur:
+            assert (await cur.fetchone())[0] == "Paris"
+        async with mgr._db.execute(
+            "SELECT location_city FROM geocode_cache WHERE lat_key = 48857 AND lon_key = 2352"
+        ) as cur:
+            assert (await cur.fetchone())[0] == "Paris"
+        await mgr.close()
+
 
 # ─── add_file / get_file_by_path ─────────────────────────────────────────────
 
@@ -120,6 +457,13 @@ class TestAddFile:
         assert retrieved["id"] == fid
         assert retrieved["filename"] == "img002.jpg"
         assert retrieved["folder"] == "/media/photo/Test"
+        assert "exif" not in retrieved
+
+        await cache.add_exif_data(fid, _exif_data(rating=3))
+        retrieved = await cache.get_file_by_path("/media/photo/Test/img002.jpg")
+        assert retrieved["exif"]["file_id"] == fid
+        assert retrieved["exif"]["rating"] == 3
+        assert retrieved["rating"] == 0
 
     async def test_add_same_path_is_upsert(self, cache):
         """Re-adding the same path must update, not duplicate."""
@@ -131,6 +475,51 @@ class TestAddFile:
         total = await cache.get_total_files()
         assert total == 1
 
+    async def test_unchanged_mtime_preserves_last_scanned(self, cache):
+        """last_scanned only advances when the file is new or its mtime changed."""
+        path = "/media/photo/Test/img004.jpg"
+        fid = await cache.add_file(_file_data(path))
+        await cache._db.execute("UPDATE media_files SET last_scanned = 1 WHERE id = ?", (fid,))
+        await cache._db.commit()
+
+        await cache.add_file(_file_data(path, file_size=333))
+        assert (await cache.get_file_by_path(path))["last_scanned"] == 1
+
+        await cache.add_file(_file_data(path, modified_time="2024-01-01T00:00:00"))
+        assert (await cache.get_file_by_path(path))["last_scanned"] > 1
+
+    async def test_rescan_preserves_favorite(self, cache):
+        """A rescan reporting no rating must not clear a stored favorite."""
+        path = "/media/photo/Test/img005.jpg"
+        fid = await cache.add_file(_file_data(path))
+        await cache.update_favorite(path, True)
+        assert await cache.add_file(_file_data(path, file_size=444)) == fid
+        row = await cache.get_file_by_path(path)
+        assert (row["is_favorited"], row["rating"]) == (1, 5)
+
+    async def test_file_records_omit_derived_columns(self, cache):
+        """Lookups return the stored file fields, not the internal query helpers."""
+        path = "/media/photo/Test/img007.jpg"
+        fid = await cache.add_file(_file_data(path))
+        for record in (
+            await cache.get_file_by_path(path),
+            await cache.get_file_by_id(fid),
+            (await cache.search_files_by_path("img007"))[0],
+        ):
+            assert record["path"] == path
+            assert not {"folder_class", "taken_month", "taken_day"} & set(record)
+
+    async def test_lookup_cache_invalidated_by_writes(self, cache):
+        """Cached lookups are copies and never outlive a write."""
+        path = "/media/photo/Test/img006.jpg"
+        fid = await cache.add_file(_file_data(path))
+        first = await cache.get_file_by_path(path)
+        first["filename"] = "mutated"
+        assert (await cache.get_file_by_path(path))["filename"] == "img006.jpg"
+        await cache.update_favorite(path, True)
+        assert (await cache.get_file_by_path(path))["is_favorited"] == 1
+        assert (await cache.get_file_by_id(fid))["is_favorited"] == 1
+
     async def test_get_total_files_empty(self, cache):
         assert await cache.get_total_files() == 0
 
@@ -140,6 +529,154 @@ class TestAddFile:
         assert await cache.get_total_files() == 3
 
 
+class TestCacheStats:
+
+    async def test_stats_empty(self, cache):
+        stats = await cache.get_cache_stats()
+        assert stats["total_files"] == 0
+        assert stats["total_images"] == 0
+        assert stats["total_folders"] == 0
+        assert stats["last_scan_time"] is None
+
+    async def test_stats_counts(self, cache):
+        await cache.add_file(_file_data("/media/photo/A/1.jpg", folder="/media/photo/A"))
+        await cache.add_file(_file_data("/media/photo/B/2.jpg", folder="/media/photo/B"))
+        video = _file_data("/media/photo/B/3.mp4", folder="/media/photo/B")
+        video["file_type"] = "video"
+        await cache.add_file(video)
+
+        stats = await cache.get_cache_stats()
+        assert stats["total_files"] == 3
+        assert stats["total_images"] == 2
+        assert stats["total_videos"] == 1
+        assert stats["total_folders"] == 2
+        assert await cache.get_total_by_type("video") == 1
+        assert await cache.get_total_by_type("audio") == 0
+        assert await cache.get_total_folders() == 2
+
+    async def test_stats_cache_invalidated_by_writes(self, cache):
+        """Cached stats are reused between writes and refreshed after one."""
+        first = await cache.get_cache_stats()
+        assert await cache.get_cache_stats() == first
+        await cache.add_file(_file_data("/media/photo/Test/new.jpg"))
+        assert (await cache.get_cache_stats())["total_files"] == first["total_files"] + 1
+
+    async def test_record_scan_returns_row_id(self, cache):
+        """record_scan hands back the new scan_history id; update_scan completes it."""
+        first = await cache.record_scan("/media/photo", "full")
+        second = await cache.record_scan("/media/photo/Test", "incremental")
+        assert second == first + 1
+        await cache.update_scan(second, files_added=1)
+        assert (await cache.get_cache_stats())["last_scan_time"] is not None
+
+
+class TestBatchWrites:
+
+    async def test_batch_defers_commit(self, cache):
+        """Writes inside begin_batch()/commit_batch() share one transaction."""
+        await cache.begin_batch()
+        await cache.add_file(_file_data("/media/photo/Test/b1.jpg"))
+        await cache.add_file(_file_data("/media/photo/Test/b2.jpg"))
+        assert cache._db.in_transaction
+        await cache.commit_batch()
+        assert not cache._db.in_transaction
+        assert await cache.get_total_files() == 2
+
+    async def test_add_file_commit_deferred_to_exif(self, cache):
+        """add_file(commit=False) leaves its row for add_exif_data's commit."""
+        fid = await cache.add_file(_file_data("/media/photo/Test/pair.jpg"), commit=False)
+        assert cache._db.in_transaction
+        await cache.add_exif_data(fid, _exif_data())
+        assert not cache._db.in_transaction
+
+    async def test_load_scan_index(self, cache):
+        """load_scan_index covers the folder and subfolders, not sibling prefixes."""
+        a = await cache.add_file(_file_data("/media/photo/Test/a.jpg"))
+        await cache.add_exif_data(a, _exif_data(date_taken=1_700_000_000))
+        b = await cache.add_file(_file_data(
+            "/media/photo/Test/sub/b.jpg", folder="/media/photo/Test/sub"
+        ))
+        await cache.add_file(_file_data("/media/photo/Test2/c.jpg", folder="/media/photo/Test2"))
+
+        index = await cache.load_scan_index("/media/photo/Test/")
+        assert set(index) == {"/media/photo/Test/a.jpg", "/media/photo/Test/sub/b.jpg"}
+        assert index["/media/photo/Test/a.jpg"] == (a, "2023-06-23T10:00:00", 1_700_000_000)
+        assert index["/media/photo/Test/sub/b.jpg"][0] == b
+        assert index["/media/photo/Test/sub/b.jpg"][2] is None
+
+        async with cache._db.execute(
+            "EXPLAIN QUERY PLAN SELECT m.path, m.id, m.modified_time FROM media_files m"
+            " WHERE m.path >= ? AND m.path < ?",
+            ("/media/photo/Test/", "/media/photo/Test0"),
+        ) as cur:
+            plan = " ".join(row[3] for row in await cur.fetchall())
+        assert "COVERING INDEX idx_media_path_covering" in plan
+
+    async def test_auto_commit_off_defers_to_commit_batch(self, tmp_path):
+        """With auto_commit=False, unbatched writes wait for commit_batch()."""
+        mgr = CacheManager(str(tmp_path / "manual.db"), auto_commit=False)
+        assert await mgr.async_setup()
+        fid = await mgr.add_file(_file_data("/media/photo/Test/m1.jpg"))
+        await mgr.add_exif_data(fid, _exif_data())
+        assert mgr._db.in_transaction
+        await mgr.commit_batch()
+        assert not mgr._db.in_transaction
+        # close() commits whatever is still pending
+        await mgr.add_file(_file_data("/media/photo/Test/m2.jpg"))
+        await mgr.close()
+        mgr = CacheManager(str(tmp_path / "manual.db"))
+        assert await mgr.async_setup()
+        assert await mgr.get_total_files() == 2
+        await mgr.close()
+
+    async def test_add_files_bulk_preserves_ids(self, cache):
+        """add_files_bulk must upsert, keeping existing IDs stable."""
+        fid = await cache.add_file(_file_data("/media/photo/Test/bulk0.jpg"))
+        ids = await cache.add_files_bulk([
+            _file_data("/media/photo/Test/bulk0.jpg", file_size=5),
+            _file_data("/media/photo/Test/bulk1.jpg"),
+        ])
+        assert ids["/media/photo/Test/bulk0.jpg"] == fid
+        assert ids["/media/photo/Test/bulk1.jpg"] != fid
+        assert await cache.get_total_files() == 2
+
+    async def test_concurrent_writes_are_serialized(self, cache):
+        """Concurrent add_file calls must all land without interleaving errors."""
+        await asyncio.gather(*(
+            cache.add_file(_file_data(f"/media/photo/Test/c{i:03d}.jpg"))
+            for i in range(20)
+        ))
+        assert await cache.get_total_files() == 20
+
+    async def test_update_favorites_bulk(self, cache):
+        """update_favorites_bulk sets both tables like update_favorite."""
+        fav = await cache.add_file(_file_data("/media/photo/Test/f1.jpg"))
+        plain = await cache.add_file(_file_data("/media/photo/Test/f2.jpg"))
+        await cache.add_exif_data(fav, _exif_data())
+        await cache.add_exif_data(plain, _exif_data(is_favorited=1, rating=5))
+        await cache.update_favorites_bulk([
+            ("/media/photo/Test/f1.jpg", True),
+            ("/media/photo/Test/f2.jpg", False),
+        ])
+        assert (await cache.get_file_by_id(fav))["is_favorited"] == 1
+        assert (await cache.get_exif_by_file_id(fav))["rating"] == 5
+        assert (await cache.get_exif_by_file_id(plain))["is_favorited"] == 0
+
+    async def test_delete_files_cascades(self, cache):
+        paths = [f"/media/photo/Test/del{i}.jpg" for i in range(3)]
+        for path in paths:
+            fid = await cache.add_file(_file_data(path))
+            await cache.add_exif_data(fid, {**_exif_data(), "iso": 200})
+
+        assert await cache.delete_file(paths[0]) is True
+        assert await cache.delete_file(paths[0]) is False
+        assert await cache.delete_files(paths + ["/media/photo/Test/missing.jpg"]) == 2
+
+        for table in ("media_files", "exif_data", "exif_data_extended"):
+            async with cache._db.execute(f"SELECT COUNT(*) FROM {table}") as cursor:
+                assert (await cursor.fetchone())[0] == 0
+
+
 # ─── add_exif_data ────────────────────────────────────────────────────────────
 
 class TestAddExifData:
@@ -181,6 +718,399 @@ class TestAddExifData:
         assert row[0] == "Tokyo", "geocoded city must survive a rescan"
 
 
+    async def test_rescan_preserves_rating_and_burst(self, cache):
+        """A rescan without a rating keeps the stored rating and burst columns."""
+        fid = await cache.add_file(_file_data("/media/photo/Test/rated.jpg"))
+        await cache.add_exif_data(fid, _exif_data(rating=4, is_favorited=1))
+        await cache._db.execute(
+            "UPDATE exif_data SET burst_id='b1', burst_count=3 WHERE file_id=?", (fid,)
+        )
+        await cache._db.commit()
+        await cache.add_exif_data(fid, {"date_taken": 1, "rating": None, "is_favorited": None})
+
+        exif = await cache.get_exif_by_file_id(fid)
+        assert exif["rating"] == 4
+        assert exif["is_favorited"] == 1
+        assert exif["burst_id"] == "b1"
+        assert exif["burst_count"] == 3
+        assert exif["date_taken"] == 1
+
+    async def test_update_burst_metadata(self, cache):
+        """One statement tags every burst member that has EXIF; unknown paths are skipped."""
+        paths = [f"/media/photo/Test/burst{i}.jpg" for i in range(3)]
+        for path in paths:
+            fid = await cache.add_file(_file_data(path))
+            await cache.add_exif_data(fid, _exif_data())
+        await cache.add_file(_file_data("/media/photo/Test/no_exif.jpg"))
+
+        updated = await cache.update_burst_metadata(
+            paths + ["/media/photo/Test/no_exif.jpg", "/media/photo/Test/missing.jpg"],
+            [paths[1]],
+        )
+        assert updated == 3
+        for path in paths:
+            exif = (await cache.get_file_by_path(path))["exif"]
+            assert exif["burst_count"] == 5
+            assert exif["burst_favorites"] == '["burst1.jpg"]'
+
+    async def test_add_exif_bulk(self, cache):
+        ids = await cache.add_files_bulk([
+            _file_data(f"/media/photo/Test/bulk_exif{i}.jpg") for i in range(3)
+        ])
+        await cache.add_exif_bulk([
+            (fid, _exif_data(date_taken=1_700_000_000 + n))
+            for n, fid in enumerate(ids.values())
+        ])
+        async with cache._db.execute("SELECT COUNT(*) FROM exif_data") as cur:
+            assert (await cur.fetchone())[0] == 3
+
+    async def test_unchanged_rescan_writes_nothing(self, cache):
+        """Re-adding identical EXIF is a no-op; a changed value still lands."""
+        fid = await cache.add_file(_file_data("/media/photo/Test/same.jpg"))
+        exif = {**_exif_data(latitude=1.5, longitude=2.5, rating=3), "iso": 100}
+        await cache.add_exif_data(fid, exif)
+        await cache.update_exif_location(fid, {"location_city": "Paris"})
+
+        before = cache._db.total_changes
+        await cache.add_exif_data(fid, exif)
+        assert cache._db.total_changes == before
+
+        await cache.add_exif_data(fid, {**exif, "iso": 200, "rating": None})
+        stored = await cache.get_exif_by_file_id(fid)
+        assert (stored["iso"], stored["rating"], stored["location_city"]) == (200, 3, "Paris")
+
+    async def test_camera_settings_round_trip(self, cache):
+        """Camera settings are stored in exif_data_extended but read back together."""
+        fid = await cache.add_file(_file_data("/media/photo/Test/camera.jpg"))
+        await cache.add_exif_data(fid, {**_exif_data(), "iso": 200, "aperture": 2.8})
+        exif = await cache.get_exif_by_file_id(fid)
+        assert (exif["iso"], exif["aperture"], exif["date_taken"]) == (200, 2.8, 1_687_514_000)
+        file_data = await cache.get_file_by_path("/media/photo/Test/camera.jpg")
+        assert file_data["exif"]["iso"] == 200
+
+
+class TestBurstLocation:
+
+    async def test_burst_location_filter(self, cache):
+        """Burst members must lie within the tolerance; distance is measured from the reference."""
+        for name, offset, lat in (
+            ("b0", 0, 35.71100), ("b1", 2, 35.71120), ("b2", 4, 35.72000),
+        ):
+            fid = await cache.add_file(_file_data(f"/media/photo/Test/{name}.jpg"))
+            await cache.add_exif_data(
+                fid, _exif_data(date_taken=1_687_514_000 + offset, latitude=lat, longitude=139.796)
+            )
+
+        burst = await cache.get_burst_photos("/media/photo/Test/b0.jpg", location_tolerance_meters=50)
+        assert [r["filename"] for r in burst] == ["b0.jpg", "b1.jpg"]
+        assert burst[0]["distance_meters"] == pytest.approx(0, abs=0.01)
+        assert burst[1]["distance_meters"] == pytest.approx(22.2, abs=0.5)
+        wide = await cache.get_burst_photos("/media/photo/Test/b0.jpg", location_tolerance_meters=2000)
+        assert [r["filename"] for r in wide] == ["b0.jpg", "b1.jpg", "b2.jpg"]
+
+
+class TestFileQueries:
+
+    async def _seed(self, cache):
+        fid = await cache.add_file(_file_data("/media/photo/Test/q1.jpg"))
+        await cache.add_exif_data(fid, _exif_data(latitude=35.711, longitude=139.796))
+        await cache.add_file(_file_data("/media/photo/Test/q2.jpg"))
+        await cache.add_file(_file_data(
+            "/media/photo/Test/_Junk/q3.jpg", folder="/media/photo/Test/_Junk"
+        ))
+        return fid
+
+    async def test_random_files_shape(self, cache):
+        fid = await self._seed(cache)
+        result = await cache.get_random_files(count=10, folder="/media/photo/test")
+        assert {r["path"] for r in result} == {
+            "/media/photo/Test/q1.jpg", "/media/photo/Test/q2.jpg"
+        }
+        by_id = {r["id"]: r for r in result}
+        assert by_id[fid]["has_coordinates"] is True
+        assert by_id[fid]["is_geocoded"] is False
+        assert "is_favorited" in by_id[fid]
+
+    async def test_priority_and_ordered_files(self, cache):
+        await self._seed(cache)
+        priority = await cache.get_random_files(count=1, priority_new_files=True)
+        assert len(priority) == 1
+        priority = await cache.get_random_files(count=2, priority_new_files=True)
+        assert len({r["id"] for r in priority}) == 2
+        ordered = await cache.get_ordered_files(count=10, order_by="filename", order_direction="asc")
+        assert [r["filename"] for r in ordered] == ["q1.jpg", "q2.jpg"]
+
+    async def test_favorites_only_includes_files_without_exif(self, cache):
+        """favorites_only reads media_files, so favorited videos without EXIF count."""
+        await self._seed(cache)
+        await cache.update_favorite("/media/photo/Test/q2.jpg", True)
+        result = await cache.get_random_files(count=10, favorites_only=True)
+        assert [r["filename"] for r in result] == ["q2.jpg"]
+
+    async def test_anniversary_filters(self, cache):
+        await self._seed(cache)
+        june = await cache.get_random_files(
+            count=10, anniversary_month="6", anniversary_day="23", anniversary_window_days=2
+        )
+        assert {r["filename"] for r in june} == {"q1.jpg", "q2.jpg"}
+        assert await cache.get_random_files(count=10, anniversary_month="7") == []
+        # Invalid values are ignored rather than matching nothing
+        assert len(await cache.get_random_files(count=10, anniversary_day="x")) == 2
+
+    async def test_anniversary_follows_date_taken_changes(self, cache):
+        """Stored month/day track EXIF date_taken edits and seek idx_media_taken."""
+        fid = await self._seed(cache)
+        christmas = int(datetime(2020, 12, 25, 12).timestamp())
+        await cache.add_exif_data(fid, _exif_data(date_taken=christmas))
+        result = await cache.get_random_files(count=10, anniversary_month="12", anniversary_day="25")
+        assert [r["filename"] for r in result] == ["q1.jpg"]
+        result = await cache.get_random_files(count=10, anniversary_month="6")
+        assert [r["filename"] for r in result] == ["q2.jpg"]
+
+        async with cache._db.execute(
+            "EXPLAIN QUERY PLAN SELECT m.id FROM media_files m"
+            " WHERE m.folder_class = 0 AND m.taken_month = ? AND m.taken_day BETWEEN ? AND ?",
+            (12, 23, 27),
+        ) as cur:
+            plan = " ".join(row[3] for row in await cur.fetchall())
+        assert "idx_media_taken" in plan
+
+    async def test_day_only_anniversary_seeks_index(self, cache):
+        """Without a month, the day filter still seeks idx_media_taken per month."""
+        await self._seed(cache)
+        result = await cache.get_random_files(count=10, anniversary_day="23", anniversary_window_days=2)
+        assert {r["filename"] for r in result} == {"q1.jpg", "q2.jpg"}
+        async with cache._db.execute(
+            "EXPLAIN QUERY PLAN SELECT m.id FROM media_files m WHERE m.folder_class = 0"
+            " AND (m.taken_day BETWEEN ? AND ? AND m.taken_month IN (1,2,3,4,5,6,7,8,9,10,11,12))",
+            (21, 25),
+        ) as cur:
+            plan = " ".join(row[3] for row in await cur.fetchall())
+        assert "SEARCH m USING INDEX idx_media_taken (taken_month=? AND taken_day>? AND taken_day<?)" in plan
+
+    async def test_date_sort_uses_stored_capture_time(self, cache):
+        """Date filters and date_taken ordering read taken_time, kept in step with EXIF."""
+        fid = await self._seed(cache)
+        q2 = await cache.get_file_by_path("/media/photo/Test/q2.jpg")
+        await cache.add_exif_data(q2["id"], _exif_data(date_taken=1_500_000_000))
+        ordered = await cache.get_ordered_files(count=10, order_by="date_taken", order_direction="asc")
+        assert [r["filename"] for r in ordered] == ["q2.jpg", "q1.jpg"]
+        await cache.add_exif_data(fid, _exif_data(date_taken=1_400_000_000))
+        ordered = await cache.get_ordered_files(count=10, order_by="date_taken", order_direction="asc")
+        assert [r["filename"] for r in ordered] == ["q1.jpg", "q2.jpg"]
+        result = await cache.get_random_files(count=10, timestamp_from=1_450_000_000)
+        assert [r["filename"] for r in result] == ["q2.jpg"]
+
+        async with cache._db.execute(
+            "EXPLAIN QUERY PLAN SELECT m.id FROM media_files m"
+            " WHERE m.folder_class = 0 ORDER BY m.taken_time DESC, m.id DESC LIMIT 5"
+        ) as cur:
+            plan = " ".join(row[3] for row in await cur.fetchall())
+        assert "idx_media_sort_taken" in plan and "TEMP B-TREE" not in plan
+
+    async def test_random_sampling_large_library(self, cache):
+        """Id probing must honour filters and return distinct rows."""
+        await cache.add_files_bulk([
+            _file_data(f"/media/photo/{folder}/r{i:04d}.jpg", folder=f"/media/photo/{folder}")
+            for i in range(600)
+            for folder in ("A", "B")
+        ])
+        result = await cache.get_random_files(count=20, folder="/media/photo/A")
+        assert len({r["id"] for r in result}) == 20
+        assert all(r["folder"] == "/media/photo/A" for r in result)
+        # Larger counts bind the probe ids as one JSON array
+        result = await cache.get_random_files(count=300, folder="/media/photo/A")
+        assert len({r["id"] for r in result}) == 300
+        assert all(r["folder"] == "/media/photo/A" for r in result)
+        # Nothing matches: probing misses, fallback returns nothing
+        assert await cache.get_random_files(count=5, favorites_only=True) == []
+
+    async def test_random_results_bounded_without_date_to(self, cache):
+        """Only date_from set: both random modes still return at most count rows."""
+        await cache.add_files_bulk([
+            _file_data(f"/media/photo/Test/b{i:02d}.jpg") for i in range(30)
+        ])
+        for priority in (False, True):
+            result = await cache.get_random_files(
+                count=5, date_from="2000-01-01", priority_new_files=priority
+            )
+            assert len(result) == 5
+
+    async def test_recursive_folder_filter_is_literal(self, cache):
+        """'_' in a folder filter is a plain character; case still doesn't matter."""
+        for path in (
+            "/media/photo/a_b/1.jpg",
+            "/media/photo/A_B/Sub/2.jpg",
+            "/media/photo/aXb/3.jpg",
+            "/media/photo/a_bc/4.jpg",
+        ):
+            await cache.add_file(_file_data(path, folder=path.rsplit("/", 1)[0]))
+        rows = await cache.get_random_files(count=10, folder="/media/photo/a_b/")
+        assert sorted(r["filename"] for r in rows) == ["1.jpg", "2.jpg"]
+        rows = await cache.get_ordered_files(count=10, folder="/media/photo/a_b", order_by="filename")
+        assert [r["filename"] for r in rows] == ["2.jpg", "1.jpg"]
+
+    async def test_random_fallback_sorts_ids_only(self, cache, monkeypatch):
+        """ORDER BY RANDOM() ranks bare ids; full rows are read for the winners only."""
+        await cache.add_files_bulk([
+            _file_data(f"/media/photo/Test/s{i:02d}.jpg") for i in range(8)
+        ])
+        statements = []
+        execute_fetchall = cache._db.execute_fetchall
+
+        def recording_execute_fetchall(sql, *args):
+            statements.append(sql)
+            return execute_fetchall(sql, *args)
+
+        monkeypatch.setattr(cache._db, "execute_fetchall", recording_execute_fetchall)
+        monkeypatch.setattr(cache, "_readers", [])
+        rows = await cache.get_random_files(count=3, file_type="image")
+        assert len({r["id"] for r in rows}) == 3
+        sampling = next(sql for sql in statements if "RANDOM()" in sql)
+        monkeypatch.undo()
+
+        async with cache._db.execute(
+            "EXPLAIN QUERY PLAN " + sampling, ("image", 3)
+        ) as cur:
+            plan = [(row[1], row[3]) for row in await cur.fetchall()]
+        # The sort runs in the subquery, which never touches exif_data
+        sort_parent = next(parent for parent, detail in plan if "TEMP B-TREE" in detail)
+        assert not any(
+            parent == sort_parent and detail.startswith(("SCAN e", "SEARCH e"))
+            for parent, detail in plan
+        )
+
+    async def test_concurrent_random_requests_share_one_query(self, cache, monkeypatch):
+        """Same-filter requests arriving together are served by one sample."""
+        await cache.add_files_bulk([
+            _file_data(f"/media/photo/Test/c{i:02d}.jpg") for i in range(10)
+        ])
+        calls = []
+        sample = cache._sample_random_files
+
+        async def counting_sample(query, params, count):
+            calls.append(count)
+            return await sample(query, params, count)
+
+        monkeypatch.setattr(cache, "_sample_random_files", counting_sample)
+        first, second = await asyncio.gather(
+            cache.get_random_files(count=4), cache.get_random_files(count=3)
+        )
+        assert calls == [7]
+        assert (len(first), len(second)) == (4, 3)
+        assert not {r["id"] for r in first} & {r["id"] for r in second}
+
+        # More wanted than exist: each caller still gets a full pick of its own
+        first, second = await asyncio.gather(
+            cache.get_random_files(count=8), cache.get_random_files(count=8)
+        )
+        assert (len(first), len(second)) == (8, 8)
+
+    async def test_cancelled_random_batch_cancels_waiters(self, cache, monkeypatch):
+        """Callers of a cancelled batch query are cancelled, not left waiting."""
+        started = asyncio.Event()
+
+        async def hanging_sample(query, params, count):
+            started.set()
+            await asyncio.Event().wait()
+
+        monkeypatch.setattr(cache, "_sample_random_files", hanging_sample)
+        request = asyncio.ensure_future(cache.get_random_files(count=3))
+        await started.wait()
+        for task in list(cache._random_batcher._tasks):
+            task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await request
+
+    async def test_priority_fills_with_older_files(self, cache):
+        """New files come first; the rest of count is filled from older files."""
+        old_id = await self._seed(cache)
+        await cache._db.execute("UPDATE media_files SET last_scanned = 1 WHERE id = ?", (old_id,))
+        await cache._db.commit()
+        result = await cache.get_random_files(count=5, priority_new_files=True)
+        assert [r["filename"] for r in result] == ["q2.jpg", "q1.jpg"]
+
+    async def test_concurrent_priority_fills_share_one_sample(self, cache, monkeypatch):
+        """Priority-mode fills for the same filters are batched like standard mode."""
+        await cache.add_files_bulk([
+            _file_data(f"/media/photo/Test/p{i:02d}.jpg") for i in range(10)
+        ])
+        await cache._db.execute("UPDATE media_files SET last_scanned = 1")
+        await cache._db.commit()
+        calls = []
+        sample = cache._sample_random_files
+
+        async def counting_sample(where, params, count):
+            calls.append(count)
+            return await sample(where, params, count)
+
+        monkeypatch.setattr(cache, "_sample_random_files", counting_sample)
+        # Pin the clock so both calls compute the same recency threshold
+        monkeypatch.setattr("time.time", lambda: 1_700_000_000.0)
+        first, second = await asyncio.gather(
+            cache.get_random_files(count=3, priority_new_files=True),
+            cache.get_random_files(count=4, priority_new_files=True),
+        )
+        assert calls == [7]
+        assert not {r["id"] for r in first} & {r["id"] for r in second}
+
+    async def test_date_filters(self, cache):
+        await self._seed(cache)
+        await cache.add_file(_file_data(
+            "/media/photo/Test/old.jpg", modified_time="2019-01-05T10:00:00"
+        ))
+        result = await cache.get_ordered_files(
+            count=10, order_by="filename", date_from="2023-01-01", date_to="2023-12-31"
+        )
+        assert "old.jpg" not in {r["filename"] for r in result}
+        result = await cache.get_random_files(count=10, date_to="2019-01-05")
+        assert [r["filename"] for r in result] == ["old.jpg"]
+        # Invalid dates are ignored rather than filtering everything out
+        unfiltered = await cache.get_random_files(count=10)
+        result = await cache.get_random_files(count=10, date_from="2023-13-45")
+        assert len(result) == len(unfiltered)
+        result = await cache.get_random_files(count=10, date_to="last week")
+        assert len(result) == len(unfiltered)
+
+
+    async def test_ordered_files_cursor_pagination(self, cache):
+        """after_value/after_id continue a page in either direction, ties broken by id."""
+        for name in ("a.jpg", "b.jpg", "c.jpg"):
+            await cache.add_file(_file_data(f"/media/photo/Test/{name}"))
+        await cache.add_file(_file_data("/media/photo/Other/b.jpg", folder="/media/photo/Other"))
+
+        page = await cache.get_ordered_files(count=2, order_by="filename", order_direction="asc")
+        last = page[-1]
+        assert [r["filename"] for r in page] == ["a.jpg", "b.jpg"]
+        rest = await cache.get_ordered_files(
+            count=5, order_by="filename", order_direction="asc",
+            after_value=last["filename"], after_id=last["id"],
+        )
+        assert [r["filename"] for r in rest] == ["b.jpg", "c.jpg"]
+        assert rest[0]["id"] > last["id"]
+        rest = await cache.get_ordered_files(
+            count=5, order_by="filename", order_direction="desc", after_value="b.jpg",
+        )
+        assert [r["filename"] for r in rest] == ["a.jpg"]
+
+    async def test_iter_ordered_files_streams_past_one_chunk(self, cache):
+        """iter_ordered_files yields every row, in order, across fetchmany chunks."""
+        await cache.add_files_bulk([
+            _file_data(f"/media/photo/Test/s{i:03d}.jpg") for i in range(300)
+        ])
+        names = [
+            item["filename"]
+            async for item in cache.iter_ordered_files(
+                count=300, order_by="filename", order_direction="asc"
+            )
+        ]
+        assert names == [f"s{i:03d}.jpg" for i in range(300)]
+        assert all(
+            isinstance(r["has_coordinates"], bool)
+            for r in await cache.get_ordered_files(count=5)
+        )
+
+
 # ─── find_duplicate_files ─────────────────────────────────────────────────────
 
 class TestFindDuplicateFiles: